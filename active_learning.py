@@ -0,0 +1,182 @@
+"""
+Fila de rotulagem por incerteza (aprendizado ativo).
+
+Em vez de rotular as fotos na ordem da pasta (muitos quadros quase iguais
+de peças boas), as fotos não rotuladas são pontuadas pelo modelo atual e
+apresentadas da mais para a menos informativa. A pontuação combina:
+- confiança baixa: nenhuma detecção segura na imagem;
+- caixa na fronteira: confiança perto de 0.5 (Aprovado x Reprovado indeciso);
+- discordância: predições da imagem original e espelhada não batem
+  (caixas que somem ou trocam de classe).
+
+A pontuação roda em segundo plano, no mesmo pool de processos da
+pré-rotulagem (prelabel.py), e só para as fotos que ainda não têm nota do
+modelo atual. Enquanto novos rótulos chegam, a ordem é recalculada na hora:
+vizinhas (quadros próximos na pasta) de fotos recém-rotuladas perdem
+prioridade, e um novo modelo treinado provoca nova pontuação, começando
+pelas fotos que eram mais incertas.
+"""
+import os
+import json
+import bisect
+from concurrent.futures import as_completed
+
+from prelabel import BATCH_SIZE
+from model_manager import inference_pool, worker_model
+
+SCORE_CONF = 0.05           # Confiança mínima usada na pontuação (vê também as caixas fracas)
+MATCH_IOU = 0.5             # IoU para considerar que duas caixas são a mesma
+WEIGHTS = {"baixa_confianca": 0.3, "fronteira": 0.4, "discordancia": 0.3}
+NEIGHBOR_WINDOW = 5         # Quadros vizinhos afetados por uma foto rotulada
+NEIGHBOR_PENALTY = 0.5      # Redução máxima da nota de uma vizinha imediata
+SAVE_EVERY = 5              # Lotes entre gravações do arquivo de ranking
+
+
+def ranking_path(store):
+    """Arquivo do ranking, ao lado do diário de anotações da pasta."""
+    return os.path.splitext(store.path)[0] + ".ranking.json"
+
+
+def model_key(model_path):
+    """Identifica a versão do modelo (caminho + mtime): best.pt novo invalida as notas."""
+    return f"{os.path.abspath(model_path)}:{os.stat(model_path).st_mtime_ns}"
+
+
+def _iou(a, b):
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _disagreement(boxes, flipped):
+    """Fração das caixas sem par (mesma classe, IoU >= MATCH_IOU) na outra predição."""
+    if not boxes and not flipped:
+        return 0.0
+    unmatched = list(flipped)
+    matched = 0
+    for cls, conf, xyxy in boxes:
+        for other in unmatched:
+            if other[0] == cls and _iou(xyxy, other[2]) >= MATCH_IOU:
+                unmatched.remove(other)
+                matched += 1
+                break
+    return 1.0 - matched / max(len(boxes), len(flipped))
+
+
+def uncertainty_score(boxes, flipped):
+    """
+    Nota de incerteza em [0, 1] a partir das predições da imagem original e
+    espelhada: listas de (classe, confiança, (x1, y1, x2, y2)) normalizados.
+    """
+    top = max((conf for _, conf, _ in boxes), default=0.0)
+    borderline = max((1.0 - abs(2.0 * conf - 1.0) for _, conf, _ in boxes), default=0.0)
+    return round(WEIGHTS["baixa_confianca"] * (1.0 - top)
+                 + WEIGHTS["fronteira"] * borderline
+                 + WEIGHTS["discordancia"] * _disagreement(boxes, flipped), 4)
+
+
+def _score_batch(paths):
+    """Pontua um lote: original e espelhada vão juntas numa única chamada de predict."""
+    import cv2
+    images, valid = [], []
+    for p in paths:
+        img = cv2.imread(p)
+        if img is not None:
+            images.extend((img, cv2.flip(img, 1)))
+            valid.append(p)
+    if not valid:
+        return []
+    results = worker_model().predict(images, conf=SCORE_CONF, verbose=False)
+    out = []
+    for i, path in enumerate(valid):
+        preds = []
+        for r, mirrored in ((results[2 * i], False), (results[2 * i + 1], True)):
+            boxes = []
+            for (x1, y1, x2, y2), cls, conf in zip(r.boxes.xyxyn.tolist(), r.boxes.cls.tolist(),
+                                                   r.boxes.conf.tolist()):
+                if mirrored:  # Desfaz o espelhamento para comparar com a original
+                    x1, x2 = 1.0 - x2, 1.0 - x1
+                boxes.append((int(cls), conf, (x1, y1, x2, y2)))
+            preds.append(boxes)
+        out.append((path, uncertainty_score(*preds)))
+    return out
+
+
+class ActiveLearningQueue:
+    """
+    Notas de incerteza por foto, persistidas em disco, e a ordem de
+    rotulagem derivada delas. 'scores' mapeia caminho -> [nota, modelo].
+    """
+    def __init__(self, store):
+        self.store = store
+        self.path = ranking_path(store)
+        self.scores = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.scores = json.load(f).get("scores", {})
+            except (OSError, json.JSONDecodeError):
+                self.scores = {}
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"scores": self.scores}, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def pending(self, photo_paths, key):
+        """Fotos não rotuladas sem nota do modelo atual; as mais incertas antes."""
+        todo = [p for p in photo_paths
+                if not self.store.is_labeled(p) and self.scores.get(p, [0, None])[1] != key]
+        return sorted(todo, key=lambda p: -self.scores.get(p, [1.0])[0])
+
+    def score(self, model_path, photo_paths, workers=None, batch_size=BATCH_SIZE, progress_callback=None):
+        """
+        Pontua em lote as fotos pendentes. progress_callback(feitas, total) é
+        chamado a cada lote, para a interface reordenar a fila aos poucos.
+        Retorna o número de fotos pontuadas.
+        """
+        key = model_key(model_path)
+        pending = self.pending(photo_paths, key)
+        if not pending:
+            return 0
+        batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+        done = 0
+        with inference_pool(model_path, workers) as pool:
+            futures = {pool.submit(_score_batch, batch): len(batch) for batch in batches}
+            for n, future in enumerate(as_completed(futures), 1):
+                for path, value in future.result():
+                    self.scores[path] = [value, key]
+                done += futures[future]
+                if n % SAVE_EVERY == 0:
+                    self.save()
+                if progress_callback:
+                    progress_callback(done, len(pending))
+        self.save()
+        return done
+
+    def ranked(self, photo_paths):
+        """
+        Fotos não rotuladas, da mais para a menos informativa. As vizinhas de
+        fotos já rotuladas (na ordem dos nomes, i.e. quadros próximos) perdem
+        prioridade; fotos ainda sem nota ficam no fim, na ordem original.
+        """
+        by_name = sorted(photo_paths)
+        labeled = [i for i, p in enumerate(by_name) if self.store.is_labeled(p)]
+        position = {p: i for i, p in enumerate(by_name)}
+
+        def adjusted(path):
+            value = self.scores[path][0]
+            i = position[path]
+            k = bisect.bisect_left(labeled, i)
+            distance = min((abs(labeled[j] - i) for j in (k - 1, k) if 0 <= j < len(labeled)),
+                           default=NEIGHBOR_WINDOW + 1)
+            if distance <= NEIGHBOR_WINDOW:
+                value *= 1.0 - NEIGHBOR_PENALTY * (1.0 - (distance - 1) / NEIGHBOR_WINDOW)
+            return value
+
+        unlabeled = [p for p in photo_paths if not self.store.is_labeled(p)]
+        scored = sorted((p for p in unlabeled if p in self.scores), key=adjusted, reverse=True)
+        return scored + [p for p in unlabeled if p not in self.scores]
@@ -0,0 +1,162 @@
+"""
+Armazenamento persistente das anotações de rotulagem.
+
+Cada save_annotation vira uma linha num diário (journal) append-only em
+JSON Lines, gravada com flush + fsync. Ao reabrir a mesma pasta de fotos,
+o estado é reconstruído relendo apenas o diário (tempo proporcional ao
+número de anotações, não ao número de imagens da pasta), e a sessão
+continua de onde parou mesmo após uma queda do aplicativo.
+
+Há um diário por pasta de fotos em ANNOTATIONS_DIR. Registros:
+    {"op": "session", "photo_dir": ..., "classes": [...], "ts": ...}
+    {"op": "save", "image": caminho, "base_name": ..., "content": txt YOLO, "ts": ...}
+    {"op": "delete", "image": caminho, "ts": ...}
+    {"op": "proposal", "image": caminho, "boxes": [[classe, xc, yc, w, h, conf], ...],
+     "model": caminho do best.pt, "ts": ...}
+
+Propostas (pré-rotulagem pelo modelo) não contam como rotulagem: só viram
+anotação quando o rotulador salva a foto.
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+
+ANNOTATIONS_DIR = os.path.join(os.getcwd(), "annotations")
+COMPACT_RATIO = 3       # Compacta quando o diário tem 3x mais registros que anotações vivas
+
+
+def journal_path(photo_dir, root=ANNOTATIONS_DIR):
+    """Arquivo do diário de uma pasta: nome legível + hash do caminho absoluto."""
+    absolute = os.path.abspath(photo_dir)
+    digest = hashlib.sha1(absolute.encode("utf-8")).hexdigest()[:10]
+    name = os.path.basename(absolute.rstrip("\\/")) or "fotos"
+    return os.path.join(root, f"{name}-{digest}.jsonl")
+
+
+class AnnotationStore:
+    """
+    Diário append-only com índice em memória por imagem.
+    'annotations' mapeia caminho da imagem -> último registro 'save'.
+    """
+    def __init__(self, photo_dir, root=ANNOTATIONS_DIR):
+        self.photo_dir = photo_dir
+        self.path = journal_path(photo_dir, root)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.annotations = {}
+        self.proposals = {}             # caminho -> último registro 'proposal'
+        self.classes = []
+        self.records = 0
+        self.lock = threading.Lock()
+        self._load()
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    # ---------- Reconstrução ----------
+    def _apply(self, record):
+        op = record.get("op")
+        if op == "save":
+            self.annotations[record["image"]] = record
+            self.proposals.pop(record["image"], None)
+        elif op == "proposal":
+            self.proposals[record["image"]] = record
+        elif op == "delete":
+            self.annotations.pop(record["image"], None)
+        elif op == "session":
+            self.classes = record.get("classes", [])
+
+    def _load(self):
+        """
+        Relê o diário. Uma última linha incompleta (queda durante a escrita) é
+        descartada do arquivo, para que o próximo registro comece numa linha nova.
+        """
+        if not os.path.exists(self.path):
+            return
+        valid_size = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                valid_size += len(line)
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                self._apply(record)
+                self.records += 1
+        if valid_size < os.path.getsize(self.path):
+            with open(self.path, "r+b") as f:
+                f.truncate(valid_size)
+
+    # ---------- Escrita ----------
+    def _append(self, record):
+        record["ts"] = time.time()
+        with self.lock:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._apply(record)
+            self.records += 1
+
+    def compatible_classes(self, classes):
+        """
+        True se 'classes' preserva os índices gravados no diário (mesma lista,
+        ou novas classes acrescentadas no fim). As anotações guardam o índice
+        da classe: reordenar ou trocar a lista mudaria o rótulo das caixas salvas.
+        """
+        if not (self.annotations or self.proposals) or not self.classes:
+            return True
+        return list(classes[:len(self.classes)]) == self.classes
+
+    def start_session(self, classes):
+        self._append({"op": "session", "photo_dir": os.path.abspath(self.photo_dir), "classes": list(classes)})
+
+    def save(self, image_path, content):
+        base_name = os.path.splitext(os.path.basename(image_path))[0]
+        self._append({"op": "save", "image": image_path, "base_name": base_name, "content": content})
+        if self.records > COMPACT_RATIO * max(len(self.annotations) + len(self.proposals), 100):
+            self.compact()
+
+    def delete(self, image_path):
+        self._append({"op": "delete", "image": image_path})
+
+    def save_proposal(self, image_path, boxes, model_path):
+        self._append({"op": "proposal", "image": image_path, "boxes": [list(b) for b in boxes],
+                      "model": model_path})
+
+    def compact(self):
+        """Reescreve o diário só com o estado atual (tmp + rename atômico)."""
+        with self.lock:
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(json.dumps({"op": "session", "photo_dir": os.path.abspath(self.photo_dir),
+                                    "classes": self.classes, "ts": time.time()}, ensure_ascii=False) + "\n")
+                for record in list(self.annotations.values()) + list(self.proposals.values()):
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._file.close()
+            os.replace(tmp, self.path)
+            self._file = open(self.path, "a", encoding="utf-8")
+            self.records = len(self.annotations) + len(self.proposals) + 1
+
+    # ---------- Consulta ----------
+    def is_labeled(self, image_path):
+        return image_path in self.annotations
+
+    def get_proposals(self, image_path):
+        """Caixas propostas pelo modelo para a imagem: [(classe, xc, yc, w, h, conf), ...]."""
+        record = self.proposals.get(image_path)
+        return [tuple(b) for b in record["boxes"]] if record else []
+
+    def labeled_annotations(self):
+        """Formato usado pelo LabelingApp: <nome_base> -> conteúdo do TXT YOLO."""
+        return {r["base_name"]: r["content"] for r in self.annotations.values()}
+
+    def labeled_image_paths(self):
+        with self.lock:     # Também chamado de threads de fundo (calibração INT8)
+            return list(self.annotations.keys())
+
+    def close(self):
+        with self.lock:
+            self._file.close()
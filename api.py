@@ -1,7 +1,19 @@
-from fastapi import FastAPI, HTTPException
+from datetime import datetime
+from typing import Optional
+import json
+import asyncio
+import threading
+import pytz
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from pymongo import MongoClient
 from bson import ObjectId
 from fastapi.middleware.cors import CORSMiddleware
+from mongo_indexes import ensure_indexes_safe
+from event_store import find_events, ItemCatalog, expand_event, event_query, class_name, CLASS_EXPR
+from counters import current_totals
+from api_cache import ResponseCache, cached_response
+from event_stream import EventBroadcaster, HEARTBEAT_SECONDS
 
 app = FastAPI(title="TDC Workshop API")
 
@@ -19,33 +31,144 @@ mongo_client = MongoClient("mongodb://localhost:27017/")
 db = mongo_client["tdc_workshop"]
 collection = db["event_logs"]
 
-def convert_id(event):
-    event["_id"] = str(event["_id"])
-    return event
+# Catálogo de itens: o banco guarda o evento compacto, a API devolve o formato legível
+catalogo = ItemCatalog(db)
+
+def traduzir(doc):
+    """Documento compacto do banco -> evento público (classe, nome_item, codigo, data_hora, ...)."""
+    return expand_event(doc, catalogo)
+
+# Cache de respostas (invalidado a cada novo evento inserido)
+cache = ResponseCache()
+
+# Feed ao vivo: uma única leitura do MongoDB distribuída a todos os clientes
+broadcaster = EventBroadcaster(collection, translate=traduzir)
+broadcaster.add_listener(lambda evento: cache.invalidate())
+
+@app.on_event("startup")
+def criar_indices():
+    """Garante os índices usados pelas consultas da API (em segundo plano: um MongoDB fora não trava a subida)."""
+    threading.Thread(target=ensure_indexes_safe, args=(mongo_client,), daemon=True).start()
+
+@app.on_event("startup")
+def iniciar_feed_eventos():
+    """Inicia a observação de novos eventos (feed ao vivo e invalidação do cache)."""
+    broadcaster.start()
+
+@app.on_event("shutdown")
+def parar_feed_eventos():
+    broadcaster.stop()
+
+def eventos(classe=None, inicio=None, fim=None):
+    return [traduzir(doc) for doc in find_events(collection, classe=classe, inicio=inicio, fim=fim)]
 
 @app.get("/eventos")
-def get_eventos():
+def get_eventos(request: Request, inicio: Optional[datetime] = None, fim: Optional[datetime] = None):
     """
     Retorna todos os eventos.
+    Com 'inicio' (e opcionalmente 'fim') inclui os dias já arquivados.
     """
-    eventos = list(collection.find())
-    eventos = [convert_id(e) for e in eventos]
-    return eventos
+    return cached_response(cache, request, lambda: eventos(inicio=inicio, fim=fim))
 
 @app.get("/eventos/reprovados")
-def get_reprovados():
+def get_reprovados(request: Request, inicio: Optional[datetime] = None, fim: Optional[datetime] = None):
     """
     Retorna apenas os eventos com classe 'Reprovado'.
     """
-    eventos = list(collection.find({"classe": "Reprovado"}))
-    eventos = [convert_id(e) for e in eventos]
-    return eventos
+    return cached_response(cache, request,
+                           lambda: eventos(classe="Reprovado", inicio=inicio, fim=fim))
 
 @app.get("/eventos/aprovados")
-def get_aprovados():
+def get_aprovados(request: Request, inicio: Optional[datetime] = None, fim: Optional[datetime] = None):
     """
     Retorna apenas os eventos com classe 'Aprovado'.
     """
-    eventos = list(collection.find({"classe": "Aprovado"}))
-    eventos = [convert_id(e) for e in eventos]
-    return eventos
+    return cached_response(cache, request,
+                           lambda: eventos(classe="Aprovado", inicio=inicio, fim=fim))
+
+def kpis_do_dia():
+    """Conta aprovados/reprovados desde a meia-noite (horário de Brasília)."""
+    fuso_br = pytz.timezone("America/Sao_Paulo")
+    inicio_dia = datetime.now(fuso_br).replace(hour=0, minute=0, second=0, microsecond=0)
+    contagem = {"Aprovado": 0, "Reprovado": 0}
+    for grupo in collection.aggregate([
+        {"$match": event_query(inicio=inicio_dia)},
+        {"$group": {"_id": CLASS_EXPR, "total": {"$sum": 1}}},
+    ]):
+        classe = class_name(grupo["_id"])
+        contagem[classe] = contagem.get(classe, 0) + grupo["total"]
+    return {"data": inicio_dia.date().isoformat(), **contagem}
+
+@app.get("/kpis/hoje")
+def get_kpis_hoje(request: Request):
+    """
+    Retorna o total de peças aprovadas e reprovadas no dia corrente.
+    """
+    return cached_response(cache, request, kpis_do_dia)
+
+@app.get("/contadores")
+def get_contadores(request: Request, data: Optional[str] = None, linha: Optional[str] = None):
+    """
+    Totais por linha, item e turno (compartilhados por todos os copilots).
+    'data' no formato AAAA-MM-DD (padrão: hoje).
+    """
+    return cached_response(cache, request, lambda: current_totals(db, data=data, linha=linha))
+
+@app.get("/eventos/stream")
+async def stream_eventos_sse(request: Request, classe: Optional[str] = None, linha: Optional[str] = None):
+    """
+    Envia novos eventos e deltas de KPI via Server-Sent Events.
+    Filtros opcionais por 'classe' e 'linha'. Clientes lentos são desconectados.
+    """
+    sub = broadcaster.subscribe(classe=classe, linha=linha)
+
+    async def gerar():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    message = await asyncio.wait_for(sub.queue.get(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if message is None:
+                    yield "event: desconectado\ndata: consumidor lento\n\n"
+                    break
+                yield f"event: {message['tipo']}\ndata: {json.dumps(message, ensure_ascii=False)}\n\n"
+        finally:
+            broadcaster.unsubscribe(sub)
+
+    return StreamingResponse(gerar(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.websocket("/eventos/stream")
+async def stream_eventos_ws(websocket: WebSocket, classe: Optional[str] = None, linha: Optional[str] = None):
+    """
+    Mesmo feed do SSE via WebSocket, com os mesmos filtros.
+    Um ping a cada HEARTBEAT_SECONDS e a leitura do socket detectam clientes
+    que saíram, mesmo com filtros que quase não recebem eventos.
+    """
+    await websocket.accept()
+    sub = broadcaster.subscribe(classe=classe, linha=linha)
+
+    async def receber():
+        # Descarta o que o cliente enviar; termina quando ele desconecta
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    receptor = asyncio.create_task(receber())
+    try:
+        while not receptor.done():
+            try:
+                message = await asyncio.wait_for(sub.queue.get(), timeout=HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                await websocket.send_json({"tipo": "ping"})
+                continue
+            if message is None:
+                await websocket.close(code=1008, reason="consumidor lento")
+                break
+            await websocket.send_json(message)
+    except (WebSocketDisconnect, RuntimeError):
+        pass    # Envio para um socket já fechado
+    finally:
+        receptor.cancel()
+        broadcaster.unsubscribe(sub)
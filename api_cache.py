@@ -0,0 +1,82 @@
+"""
+Cache de respostas da API (TTL + LRU) com ETag e invalidação por inserção.
+
+- Cada resposta é serializada uma única vez e guardada com seu ETag.
+- Requisições com If-None-Match igual ao ETag recebem 304 sem corpo.
+- Novos eventos invalidam o cache: o feed de eventos (event_stream.py)
+  chama invalidate() a cada inserção observada no MongoDB.
+- O TTL é o limite máximo de defasagem: mesmo que uma invalidação se
+  perca, nenhuma resposta em cache é mais antiga que MAX_STALENESS_SECONDS.
+"""
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+
+MAX_STALENESS_SECONDS = 5.0     # Defasagem máxima aceitável de uma resposta em cache
+MAX_ENTRIES = 256               # Limite de entradas (LRU)
+
+
+class ResponseCache:
+    """
+    Cache em memória, seguro entre threads, com expiração por TTL e
+    descarte da entrada menos usada quando MAX_ENTRIES é atingido.
+    """
+    def __init__(self, ttl=MAX_STALENESS_SECONDS, max_entries=MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # chave -> (expira_em, etag, corpo)
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def set(self, key, etag, body):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, etag, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        """Descarta todas as respostas (chamado quando um novo evento chega)."""
+        with self._lock:
+            self._entries.clear()
+
+
+def cache_key(request):
+    """Chave da resposta: caminho + parâmetros de consulta ordenados."""
+    params = sorted(request.query_params.multi_items())
+    return request.url.path + "?" + "&".join(f"{k}={v}" for k, v in params)
+
+
+def cached_response(cache, request, producer):
+    """
+    Retorna a resposta em cache para a requisição ou calcula com producer().
+    Responde 304 quando o cliente já tem a versão atual (If-None-Match).
+    """
+    key = cache_key(request)
+    entry = cache.get(key)
+    if entry is None:
+        body = json.dumps(jsonable_encoder(producer()), ensure_ascii=False).encode("utf-8")
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        cache.set(key, etag, body)
+    else:
+        etag, body = entry
+    headers = {"ETag": etag, "Cache-Control": f"max-age={int(cache.ttl)}"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
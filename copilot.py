@@ -10,9 +10,11 @@ import pytz                 # Para trabalhar com fusos horários
 import tkinter as tk        # Biblioteca para criar interfaces gráficas (janelas)
 from tkinter import filedialog, messagebox  # Diálogos para escolher arquivos e exibir mensagens
 from PIL import Image, ImageTk  # Biblioteca para trabalhar com imagens e exibi-las na interface
-import cv2                  # Biblioteca OpenCV para processamento de vídeo/imagem
-from pymongo import MongoClient  # Conecta ao MongoDB, um banco de dados
-from ultralytics import YOLO  # Biblioteca para usar o modelo YOLO de detecção de objetos
+from event_store import make_count_event, archive_expired, expand_event, ItemCatalog, EventTail  # Formato e retenção dos eventos
+from model_manager import MODELS, ModelSlot  # Modelos carregados uma vez, aquecidos e trocados a quente
+from startup import StartupLoader, import_heavy, connect_mongo  # cv2, MongoDB etc. carregados em segundo plano
+from multi_stream import MultiStreamProcessor, STREAM_DEFAULTS, load_streams_config  # Várias câmeras/linhas
+from counters import CounterService  # Totais por linha/item/turno compartilhados entre instâncias ($inc)
 
 # ========================================================
 # ## 1. AGENTES - Integração com a interface via callback de log
@@ -31,12 +33,17 @@ class BaseAgent(threading.Thread):
 
     def run(self):
         self.running = True
+        self.connect()
         if self.log_callback:
             self.log_callback(f"[{self.name}] Iniciado.")
         while self.running:
             self.listen()
             time.sleep(1)
 
+    def connect(self):
+        """Conexões do agente, abertas já na thread dele (não atrasam a janela)."""
+        pass
+
     def listen(self):
         raise NotImplementedError("Subclasse deve implementar listen().")
 
@@ -74,24 +81,55 @@ class EventMonitorAgent(BaseAgent):
     """
     def __init__(self, callback, log_callback=None):
         super().__init__("Monitor", log_callback)
+        self.tail = None
+        self.callback = callback
+
+    def connect(self):
+        from pymongo import MongoClient
         self.mongo = MongoClient("mongodb://localhost:27017/")
         self.db = self.mongo["tdc_workshop"]
         self.collection = self.db["event_logs"]
-        self.last_check = datetime.utcnow()
-        self.callback = callback
+        self.catalog = ItemCatalog(self.db)     # Traduz o documento compacto para o formato legível
+        # Acompanha pela inserção (_id), com janela de sobreposição: os eventos chegam
+        # em lotes, depois da data_hora deles, e de vários hosts
+        self.tail = EventTail(self.collection).start()
 
     def listen(self):
-        novos = list(self.collection.find({"data_hora": {"$gt": self.last_check}}))
-        if novos:
-            self.last_check = datetime.utcnow()
-            for e in novos:
-                msg = f"[Monitor] Novo evento detectado: {e}"
-                if self.log_callback:
-                    self.log_callback(msg)
-                else:
-                    print(msg)
-                if self.callback:
-                    self.callback(e)
+        for e in (expand_event(doc, self.catalog) for doc in self.tail.poll()):
+            msg = f"[Monitor] Novo evento detectado: {e}"
+            if self.log_callback:
+                self.log_callback(msg)
+            else:
+                print(msg)
+            if self.callback:
+                self.callback(e)
+
+
+class ArchiveAgent(BaseAgent):
+    """
+    Agente de Arquivamento: periodicamente move os eventos mais antigos que a
+    retenção configurada para arquivos compactados por dia, mantendo a
+    coleção 'event_logs' e seus índices pequenos.
+    """
+    def __init__(self, log_callback=None, interval=3600):
+        super().__init__("Arquivo", log_callback)
+        self.interval = interval
+        self.last_run = 0
+
+    def connect(self):
+        from pymongo import MongoClient
+        self.mongo = MongoClient("mongodb://localhost:27017/")
+        self.collection = self.mongo["tdc_workshop"]["event_logs"]
+
+    def listen(self):
+        if time.time() - self.last_run < self.interval:
+            return
+        self.last_run = time.time()
+        try:
+            archive_expired(self.collection, log_callback=self.log_callback)
+        except Exception as e:
+            if self.log_callback:
+                self.log_callback(f"[Arquivo] Falha no arquivamento: {e}")
 
 # ========================================================
 # ## 2. APLICATIVO DE VÍDEO COM INTEGRAÇÃO DOS AGENTES
@@ -126,18 +164,21 @@ class VideoApp(tk.Tk):
         self.piece_count = 0
         self.video_path = None
         self.model_path = None
+        self.model_slot = None      # Modelo ativo da detecção em andamento (troca a quente)
+        self.streams_config = []    # Câmeras/linhas carregadas de um streams.json (vazio: vídeo único)
+        self.processor = None       # Laço de detecção em andamento (MultiStreamProcessor)
+        # Envio em lote dos eventos e contadores atômicos; conecta quando o MongoDB estiver disponível
+        self.counter_service = CounterService(connect=self.counter_db, log_callback=self.log).start()
+        self.video_grid = (1, 1)    # Colunas x linhas da grade de vídeos
         self.loop_video = tk.BooleanVar(value=False)
 
         # ============================
-        # Conexão com o MongoDB
+        # Conexão com o MongoDB (em segundo plano, ver start_background_loading)
         # ============================
-        try:
-            self.mongo_client = MongoClient("mongodb://localhost:27017/")
-            self.db = self.mongo_client["tdc_workshop"]
-            self.logs_collection = self.db["event_logs"]
-            self.log("Conectado ao MongoDB com sucesso.")
-        except Exception as e:
-            self.log(f"Erro ao conectar ao MongoDB: {e}")
+        self.mongo_client = None
+        self.db = None
+        self.logs_collection = None
+        self.mongo_failed = False   # A conexão da inicialização falhou (o CounterService tenta de novo)
 
         # ============================
         # Configuração da Interface Principal
@@ -178,6 +219,11 @@ class VideoApp(tk.Tk):
                                       bg="#3e3e3e", fg="red", font=("Arial", 10))
         self.monitor_label.pack(side=tk.LEFT)
 
+        # Andamento da inicialização (bibliotecas e MongoDB carregados em segundo plano)
+        self.startup_label = tk.Label(self.status_frame, text="Carregando...", bg="#3e3e3e",
+                                      fg="orange", font=("Arial", 10))
+        self.startup_label.pack(anchor="w", pady=2)
+
         # Inicia a atualização dos status dos agentes
         self.update_agent_status()
 
@@ -213,6 +259,16 @@ class VideoApp(tk.Tk):
                                           bg="#3e3e3e", fg="white", activebackground="#5a5a5a")
         self.btn_select_video.pack(side=tk.LEFT, padx=5)
 
+        self.frame_streams = tk.Frame(self.menu_frame, bg="#3e3e3e")
+        self.frame_streams.pack(pady=10, fill=tk.X, padx=20)
+        self.streams_ok_label = tk.Label(self.frame_streams, text="", bg="#3e3e3e",
+                                         fg="lime", font=("Arial", 14))
+        self.streams_ok_label.pack(side=tk.LEFT)
+        self.btn_select_streams = tk.Button(self.frame_streams, text="Configurar Linhas",
+                                            command=self.select_streams,
+                                            bg="#3e3e3e", fg="white", activebackground="#5a5a5a")
+        self.btn_select_streams.pack(side=tk.LEFT, padx=5)
+
         self.chk_loop = tk.Checkbutton(
             self.menu_frame,
             text="Loop do Vídeo",
@@ -237,8 +293,7 @@ class VideoApp(tk.Tk):
 
         self.video_frame = tk.Frame(self.content_frame, bg='black')
         self.video_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        self.video_label = tk.Label(self.video_frame, bg='black')
-        self.video_label.pack(fill=tk.BOTH, expand=True)
+        self.build_video_tiles(1)
 
         self.terminal_frame = tk.Frame(self.content_frame, bg='black', width=300)
         self.terminal_frame.pack(side=tk.RIGHT, fill=tk.Y)
@@ -262,8 +317,45 @@ class VideoApp(tk.Tk):
                                                 alert_callback=self.show_critical_alert)
         self.monitor_agent = EventMonitorAgent(callback=self.supervisor_agent.process_event,
                                                 log_callback=self.log)
+        self.archive_agent = ArchiveAgent(log_callback=self.log)
         self.supervisor_agent.start()
         self.monitor_agent.start()
+        self.archive_agent.start()
+        self.start_background_loading()
+
+    def start_background_loading(self):
+        """cv2/numpy e a conexão com o MongoDB carregam em paralelo, com a janela já aberta."""
+        loader = StartupLoader(lambda text: self.after(0, lambda: self.startup_label.config(
+            text=text, fg="orange" if text.startswith("Carregando") else "lime")))
+        loader.add("bibliotecas", import_heavy)
+        loader.add("MongoDB", self.connect_mongo, self.mongo_connected)
+
+    def connect_mongo(self):
+        from mongo_indexes import ensure_indexes_safe
+        client = connect_mongo()
+        ensure_indexes_safe(client, self.log)
+        return client
+
+    def mongo_connected(self, client, error):
+        if error is not None:
+            self.mongo_failed = True
+            self.log(f"Erro ao conectar ao MongoDB: {error}")
+            return
+        self.db = client["tdc_workshop"]
+        self.logs_collection = self.db["event_logs"]
+        self.mongo_client = client
+        self.log("Conectado ao MongoDB com sucesso.")
+
+    def counter_db(self):
+        """
+        Banco do CounterService (chamado pela thread dele até funcionar): a conexão
+        da inicialização ou, se ela falhou, uma nova tentativa.
+        """
+        if self.db is None:
+            if not self.mongo_failed:
+                raise RuntimeError("MongoDB ainda não conectado")
+            self.mongo_connected(self.connect_mongo(), None)
+        return self.db
 
     # ========================================================
     # ## 3. Métodos de Atualização e Logs
@@ -292,6 +384,8 @@ class VideoApp(tk.Tk):
     def print_loop_state(self):
         """Exibe no console se o loop do vídeo está habilitado ou não."""
         print("Loop habilitado:", self.loop_video.get())
+        if self.processor is not None and not self.streams_config:
+            self.processor.streams[0].cfg["loop"] = self.loop_video.get()  # Vale para o vídeo em andamento
 
     def log(self, message):
         """
@@ -336,9 +430,10 @@ class VideoApp(tk.Tk):
         """
         try:
             while True:
-                imgtk = self.video_queue.get_nowait()
-                self.video_label.configure(image=imgtk)
-                self.video_label.imgtk = imgtk
+                index, imgtk = self.video_queue.get_nowait()
+                if index < len(self.video_labels):
+                    self.video_labels[index].configure(image=imgtk)
+                    self.video_labels[index].imgtk = imgtk
         except queue.Empty:
             pass
         self.after(30, self.update_video)
@@ -347,13 +442,17 @@ class VideoApp(tk.Tk):
     # ## 4. Métodos de Seleção e Execução
     # ========================================================
     def select_model(self):
-        """Permite que o usuário escolha um arquivo de modelo YOLO (.pt)."""
+        """Permite que o usuário escolha um arquivo de modelo YOLO (.pt ou .onnx exportado)."""
         path = filedialog.askopenfilename(title="Selecione o Modelo YOLO",
-                                          filetypes=[("Arquivos .pt", "*.pt")])
+                                          filetypes=[("Arquivos .pt", "*.pt"), ("Modelos ONNX", "*.onnx")])
         if path:
             self.model_path = path
             self.model_ok_label.config(text="✔")
             self.log(f"Modelo selecionado: {os.path.basename(path)}")
+            if self.model_slot is not None:
+                self.model_slot.swap(path)  # Detecção em andamento: troca sem parar o vídeo
+            else:
+                MODELS.preload(path)        # Carrega e aquece enquanto o vídeo é escolhido
 
     def select_video(self):
         """Permite que o usuário escolha um vídeo para processamento."""
@@ -364,121 +463,113 @@ class VideoApp(tk.Tk):
             self.video_ok_label.config(text="✔")
             self.log(f"Vídeo selecionado: {os.path.basename(path)}")
 
+    def select_streams(self):
+        """Carrega a configuração de várias câmeras/linhas (streams.json); substitui o vídeo único."""
+        path = filedialog.askopenfilename(title="Selecione a Configuração das Linhas",
+                                          filetypes=[("Configuração JSON", "*.json")])
+        if not path:
+            return
+        try:
+            self.streams_config = load_streams_config(path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Erro", f"Configuração inválida: {e}")
+            return
+        self.streams_ok_label.config(text="✔")
+        for cfg in self.streams_config:
+            self.log(f"Câmera {cfg['camera']} ({cfg['linha']}): {cfg['fonte']}")
+
     def run_detection(self):
         """Inicia o processo de detecção de objetos no vídeo usando o modelo YOLO."""
-        if not self.model_path or not self.video_path:
-            messagebox.showerror("Erro", "Selecione o modelo e o vídeo primeiro.")
+        if not self.model_path or not (self.video_path or self.streams_config):
+            messagebox.showerror("Erro", "Selecione o modelo e o vídeo (ou as linhas) primeiro.")
+            return
+        if self.model_slot is not None:
+            self.log("A detecção já está em andamento; um novo modelo selecionado é trocado a quente.")
             return
         self.log("Iniciando detecção de objetos...")
+        self.build_video_tiles(len(self.active_streams()))
         threading.Thread(target=self.detect_objects, daemon=True).start()
 
     def detect_objects(self):
         """
-        Realiza a detecção de objetos utilizando o modelo YOLO.
-        Atualiza a interface com os resultados e registra os eventos no MongoDB.
+        Realiza a detecção de objetos utilizando o modelo YOLO, em uma ou várias câmeras.
+        Um só modelo atende todas as fontes (inferência em lote); cada fonte tem
+        rastreador, linha de contagem e contadores próprios. Atualiza a interface
+        com os resultados e registra os eventos no MongoDB.
         """
-        model = YOLO(self.model_path)
-        cap = cv2.VideoCapture(self.video_path)
-        objetos = {}
-        next_id = 0
-        tolerancia = 60
-        max_lost = 5
-
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                if self.loop_video.get():
-                    cap.release()
-                    cap = cv2.VideoCapture(self.video_path)
-                    continue
-                else:
-                    break
-
-            h_frame, w_frame = frame.shape[:2]
-            linha_meio = h_frame // 2
-            results = model.predict(frame, verbose=False)
-            deteccoes = []
-            for r in results:
-                for box in r.boxes:
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])
-                    cls = int(box.cls[0])
-                    classe = "Aprovado" if cls == 0 else "Reprovado"
-                    cx = (x1 + x2) // 2
-                    cy = (y1 + y2) // 2
-                    deteccoes.append(((cx, cy), classe))
-                    cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                    cv2.putText(frame, classe, (x1, y1 - 10),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
-                    cv2.circle(frame, (cx, cy), 4, (255, 0, 0), -1)
-                    percent = ((cy - linha_meio) / h_frame) * 100
-                    percent_int = int(round(percent))
-                    cv2.putText(frame, f"{percent_int}%", (cx + 5, cy - 5),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 0), 2)
-            for obj in objetos.values():
-                obj["prev_pos"] = obj["pos"]
-            ids_atualizados = set()
-            for (cx, cy), classe in deteccoes:
-                melhor_id, melhor_dist = None, tolerancia + 1
-                for obj_id, obj in objetos.items():
-                    dist = math.hypot(cx - obj["pos"][0], cy - obj["pos"][1])
-                    if dist < tolerancia and dist < melhor_dist:
-                        melhor_dist = dist
-                        melhor_id = obj_id
-                if melhor_id is not None:
-                    objetos[melhor_id]["pos"] = (cx, cy)
-                    objetos[melhor_id]["classe"] = classe
-                    objetos[melhor_id]["lost"] = 0
-                    ids_atualizados.add(melhor_id)
-                else:
-                    objetos[next_id] = {
-                        "pos": (cx, cy),
-                        "prev_pos": (cx, cy),
-                        "contado": False,
-                        "classe": classe,
-                        "lost": 0
-                    }
-                    ids_atualizados.add(next_id)
-                    next_id += 1
-            for obj_id in list(objetos.keys()):
-                if obj_id not in ids_atualizados:
-                    objetos[obj_id]["lost"] += 1
-                    if objetos[obj_id]["lost"] > max_lost:
-                        del objetos[obj_id]
-            for obj in objetos.values():
-                y_prev = obj["prev_pos"][1]
-                y_atual = obj["pos"][1]
-                percent_prev = ((y_prev - linha_meio) / h_frame) * 100
-                percent_atual = ((y_atual - linha_meio) / h_frame) * 100
-                percent_atual_int = int(round(percent_atual))
-                print(f"Objeto {obj['classe']} - Prev: {percent_prev:.2f}%, Atual: {percent_atual:.2f}%")
-                if not obj["contado"] and percent_atual_int == 0:
-                    obj["contado"] = True
-                    self.piece_count += 1
-                    fuso_br = pytz.timezone("America/Sao_Paulo")
-                    agora_br = datetime.now(fuso_br)
-                    data_hora_str = agora_br.strftime("%d/%m/%Y %H:%M:%S")
-                    self.log(f"{obj['classe']}, Placa Sextavada, 1318, {data_hora_str} | Total: {self.piece_count}")
-                    self.logs_collection.insert_one({
-                        "classe": obj["classe"],
-                        "nome_item": "Placa Sextavada",
-                        "codigo": "1318",
-                        "data_hora": agora_br,
-                        "total": self.piece_count
-                    })
-            cv2.line(frame, (0, linha_meio), (w_frame, linha_meio), (0, 0, 255), 2)
-            self.video_frame.update_idletasks()
-            w_cont = self.video_frame.winfo_width()
-            h_cont = self.video_frame.winfo_height()
-            escala = min(w_cont / w_frame, h_cont / h_frame)
-            novo_w = int(w_frame * escala)
-            novo_h = int(h_frame * escala)
-            frame_resized = cv2.resize(frame, (novo_w, novo_h), interpolation=cv2.INTER_AREA)
-            rgb = cv2.cvtColor(frame_resized, cv2.COLOR_BGR2RGB)
-            img = Image.fromarray(rgb)
-            imgtk = ImageTk.PhotoImage(image=img)
-            self.video_queue.put(imgtk)
-        cap.release()
-        self.log("Processamento finalizado.")
+        try:
+            slot = self.model_slot = ModelSlot(self.model_path, log_callback=self.log)
+            self.log(f"Backend de inferência: {slot.model.name}")
+            self.processor = MultiStreamProcessor(self.active_streams(), slot, self.show_stream_frame,
+                                                  self.register_count, log_callback=self.log)
+            self.processor.run()
+            self.log("Processamento finalizado.")
+        except Exception as e:
+            self.log(f"Erro na detecção: {e}")
+        finally:
+            # Libera o início de uma nova detecção mesmo após erro
+            if self.processor is not None:
+                self.processor.stop()
+            self.processor = None
+            self.model_slot = None
+
+    def active_streams(self):
+        """Câmeras configuradas (streams.json) ou, sem configuração, o vídeo selecionado."""
+        if self.streams_config:
+            return self.streams_config
+        return [dict(STREAM_DEFAULTS, fonte=self.video_path, loop=self.loop_video.get())]
+
+    def build_video_tiles(self, count):
+        """Um quadro de vídeo por câmera, em grade."""
+        for widget in self.video_frame.winfo_children():
+            widget.destroy()
+        cols = math.ceil(math.sqrt(count))
+        self.video_grid = (cols, math.ceil(count / cols))
+        self.video_labels = []
+        for i in range(count):
+            label = tk.Label(self.video_frame, bg='black')
+            label.grid(row=i // cols, column=i % cols, sticky="nsew", padx=1, pady=1)
+            self.video_labels.append(label)
+        for c in range(cols):
+            self.video_frame.columnconfigure(c, weight=1, uniform="video")
+        for r in range(self.video_grid[1]):
+            self.video_frame.rowconfigure(r, weight=1, uniform="video")
+        self.video_label = self.video_labels[0]
+
+    def show_stream_frame(self, stream, frame):
+        """Redimensiona o quadro anotado para o espaço da câmera e o envia para a interface."""
+        import cv2
+        h_frame, w_frame = frame.shape[:2]
+        cols, rows = self.video_grid
+        w_cont = max(self.video_frame.winfo_width() // cols, 1)
+        h_cont = max(self.video_frame.winfo_height() // rows, 1)
+        escala = min(w_cont / w_frame, h_cont / h_frame)
+        novo_w = max(int(w_frame * escala), 1)
+        novo_h = max(int(h_frame * escala), 1)
+        frame_resized = cv2.resize(frame, (novo_w, novo_h), interpolation=cv2.INTER_AREA)
+        rgb = cv2.cvtColor(frame_resized, cv2.COLOR_BGR2RGB)
+        imgtk = ImageTk.PhotoImage(image=Image.fromarray(rgb))
+        self.video_queue.put((stream.index, imgtk))
+
+    def register_count(self, stream, obj):
+        """Peça contada numa câmera: log e evento com a linha e a câmera de origem."""
+        cfg = stream.cfg
+        self.piece_count += 1
+        fuso_br = pytz.timezone("America/Sao_Paulo")
+        agora_br = datetime.now(fuso_br)
+        data_hora_str = agora_br.strftime("%d/%m/%Y %H:%M:%S")
+        # Só enfileira: o total definitivo vem do $inc no MongoDB, feito em lote pelo serviço
+        total_turno = self.counter_service.record(make_count_event(
+            classe=obj["classe"],
+            nome_item=cfg["nome_item"],
+            codigo=cfg["codigo"],
+            data_hora=agora_br,
+            total=None,
+            linha=cfg["linha"],
+            camera=cfg["camera"]
+        ))
+        self.log(f"[{stream.label}] {obj['classe']}, {cfg['nome_item']}, {cfg['codigo']}, {data_hora_str} "
+                 f"| Linha: {stream.total} | Total: {self.piece_count} | Turno: {total_turno}")
 
     # ========================================================
     # ## 5. Métodos de Interface: Ocultar/Restaurar e Alerta Crítico
@@ -539,8 +630,12 @@ class VideoApp(tk.Tk):
     # ========================================================
     def on_close(self):
         """Para os agentes em execução e encerra a aplicação."""
+        if self.processor is not None:
+            self.processor.stop()
+        self.counter_service.stop()     # Envia os eventos ainda na fila
         self.monitor_agent.stop()
         self.supervisor_agent.stop()
+        self.archive_agent.stop()
         self.destroy()
 
 
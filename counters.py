@@ -0,0 +1,240 @@
+"""
+Contadores de produção compartilhados (MongoDB, $inc atômico).
+
+Um documento por linha, item e turno na coleção 'counters':
+    {"_id": "linha_1|1318|2025-03-27|T1", "linha": "linha_1", "codigo": "1318",
+     "data": "2025-03-27", "turno": "T1", "total": 812,
+     "por_classe": {"Aprovado": 790, "Reprovado": 22},
+     "lotes": [{"id": "9f1c...", "total": 812}, ...]}
+
+Vários copilots (e reinícios) somam no mesmo documento, então o 'total' de
+cada evento é o acumulado real da linha no turno, e não um contador do
+processo.
+
+A detecção não espera o banco: CounterService.record() só enfileira o
+evento. Uma thread agrupa os eventos a cada FLUSH_INTERVAL segundos e faz,
+por contador, um único find_one_and_update que soma a quantidade do lote.
+O valor devolvido numera as peças do lote (T-k+1 .. T), e os eventos são
+gravados juntos com insert_many, já no esquema compacto (event_store).
+
+Cada lote tem um id, gravado em 'lotes' junto com o total resultante, e o
+filtro da atualização exclui documentos que já têm esse id. Se o MongoDB
+estiver fora (ou a resposta se perder depois de a soma ser aplicada), o
+mesmo lote é reenviado no ciclo seguinte e não é somado de novo: a
+numeração vem do total registrado no próprio lote. Enquanto houver lote
+sem confirmação, nenhum lote novo é montado: com o MongoDB fora, a fila
+cresce só até MAX_PENDING eventos no total.
+"""
+import uuid
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+
+from event_store import ItemCatalog, compact_event
+
+COUNTERS_COLLECTION = "counters"
+FLUSH_INTERVAL = 1.0        # Segundos entre envios ao MongoDB
+MAX_PENDING = 100_000       # Eventos retidos no total com o MongoDB fora (os mais antigos ainda não enviados são descartados)
+TURNOS = (("T1", 6, 14), ("T2", 14, 22), ("T3", 22, 6))   # (nome, hora inicial, hora final)
+LOTES_MANTIDOS = 100        # Ids de lote guardados por contador (reenvios acontecem no ciclo seguinte)
+FUSO_PADRAO = "America/Sao_Paulo"
+
+
+def shift_of(dt):
+    """(data do início do turno, nome do turno) no horário local de dt; T3 atravessa a meia-noite."""
+    for nome, inicio, fim in TURNOS:
+        if inicio < fim and inicio <= dt.hour < fim:
+            return dt.date().isoformat(), nome
+        if inicio > fim and (dt.hour >= inicio or dt.hour < fim):
+            dia = dt.date() - timedelta(days=1) if dt.hour < fim else dt.date()
+            return dia.isoformat(), nome
+    return dt.date().isoformat(), TURNOS[0][0]
+
+
+def counter_key(linha, codigo, dt):
+    data, turno = shift_of(dt)
+    return f"{linha}|{codigo}|{data}|{turno}"
+
+
+def batch_update(key, batch_id, events):
+    """
+    Atualização (pipeline) que soma o lote ao contador e registra o id do
+    lote com o total resultante. Só deve ser aplicada com o filtro
+    {"_id": key, "lotes.id": {"$ne": batch_id}}.
+    """
+    linha, codigo, data, turno = key.split("|")
+    por_classe = {}
+    for event in events:
+        por_classe[event["classe"]] = por_classe.get(event["classe"], 0) + 1
+    soma = {"total": {"$add": [{"$ifNull": ["$total", 0]}, len(events)]}}
+    for classe, n in por_classe.items():
+        soma[f"por_classe.{classe}"] = {"$add": [{"$ifNull": [f"$por_classe.{classe}", 0]}, n]}
+    return [
+        {"$set": dict(soma, linha={"$literal": linha}, codigo={"$literal": codigo},
+                      data={"$literal": data}, turno={"$literal": turno})},
+        {"$set": {"lotes": {"$slice": [{"$concatArrays": [{"$ifNull": ["$lotes", []]},
+                                                          [{"id": batch_id, "total": "$total"}]]},
+                                       -LOTES_MANTIDOS]}}},
+    ]
+
+
+def batch_total(doc, batch_id):
+    """Total registrado para o lote no documento do contador (None se não estiver lá)."""
+    for lote in (doc or {}).get("lotes", []):
+        if lote["id"] == batch_id:
+            return lote["total"]
+    return None
+
+
+def number_events(events, total):
+    """Numera as peças do lote que levou o contador a 'total' (total-k+1 .. total)."""
+    first = total - len(events) + 1
+    return [dict(event, total=first + i) for i, event in enumerate(events)]
+
+
+class CounterService:
+    """
+    Fila de eventos de contagem com envio em lote e totais atômicos por linha/item/turno.
+    Sem 'db', connect() é chamado pela thread de envio até devolver o banco:
+    os eventos contados antes da conexão ficam na fila em vez de se perderem.
+    """
+    def __init__(self, db=None, events_collection="event_logs", interval=FLUSH_INTERVAL, log_callback=print,
+                 connect=None):
+        self.events_collection = events_collection
+        self.connect = connect
+        self.counters = self.events = self.catalog = None
+        if db is not None:
+            self._bind(db)
+        self.interval = interval
+        self.log_callback = log_callback
+        self.pending = deque()          # Eventos ainda não agrupados em lotes (ordem de contagem)
+        self.inflight = []              # Lotes (chave, id, eventos) ainda não confirmados pelo banco
+        self.ready = []                 # Documentos compactos já numerados pelo $inc, aguardando o insert_many
+        self.known = {}                 # Chave do contador -> último total confirmado pelo banco
+        self.queued = {}                # Chave do contador -> eventos em pending/inflight (ainda não somados)
+        self.size = 0                   # Eventos retidos em pending, inflight e ready
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.failing = False
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+
+    def _bind(self, db):
+        self.counters = db[COUNTERS_COLLECTION]
+        self.events = db[self.events_collection]
+        self.catalog = ItemCatalog(db)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def record(self, event):
+        """Enfileira um evento de contagem (sem 'total'); retorna o total estimado do contador."""
+        key = counter_key(event["linha"], event["codigo"], event["data_hora"])
+        with self.lock:
+            self.pending.append((key, event))
+            self.queued[key] = self.queued.get(key, 0) + 1
+            self.size += 1
+            while self.size > MAX_PENDING and self.pending:
+                old_key, _ = self.pending.popleft()
+                self.queued[old_key] -= 1
+                self.size -= 1
+            return self.known.get(key, 0) + self.queued.get(key, 0)
+
+    def _loop(self):
+        while not self.stop_event.wait(self.interval):
+            self.flush()
+        self.flush()
+
+    def _take_pending(self):
+        """Agrupa a fila em lotes novos por contador (só com os lotes anteriores confirmados)."""
+        with self.lock:
+            if self.inflight or self.ready or not self.pending:
+                return
+            batch, self.pending = self.pending, deque()
+            groups = {}
+            for key, event in batch:
+                groups.setdefault(key, []).append(event)
+            self.inflight.extend((key, uuid.uuid4().hex, events) for key, events in groups.items())
+
+    def flush(self):
+        with self.lock:
+            if not (self.pending or self.inflight or self.ready):
+                return
+        try:
+            if self.counters is None:
+                self._bind(self.connect())
+            self._increment()           # Primeiro os lotes de um envio que falhou
+            self._insert_ready()
+            self._take_pending()
+            self._increment()
+            self._insert_ready()
+            if self.failing:
+                self.failing = False
+                self.log_callback("[Contadores] Conexão com o MongoDB restabelecida.")
+        except Exception as e:
+            if not self.failing:
+                self.failing = True
+                self.log_callback(f"[Contadores] Falha ao gravar contadores (tentando de novo): {e}")
+
+    def _apply(self, key, batch_id, events):
+        """Soma o lote ao contador (uma única vez) e retorna o total após o lote."""
+        from pymongo import ReturnDocument
+        from pymongo.errors import DuplicateKeyError
+        for _ in range(2):
+            try:
+                doc = self.counters.find_one_and_update(
+                    {"_id": key, "lotes.id": {"$ne": batch_id}}, batch_update(key, batch_id, events),
+                    upsert=True, return_document=ReturnDocument.AFTER)
+                return batch_total(doc, batch_id)
+            except DuplicateKeyError:
+                # O filtro não casou com o documento existente: ou o lote já foi
+                # aplicado (resposta perdida), ou outra instância criou o contador agora
+                total = batch_total(self.counters.find_one({"_id": key}), batch_id)
+                if total is not None:
+                    return total
+        raise RuntimeError(f"Contador {key} não pôde ser atualizado.")
+
+    def _increment(self):
+        """Aplica os lotes pendentes em ordem; os eventos numerados vão para self.ready."""
+        while self.inflight:
+            key, batch_id, events = self.inflight[0]
+            codigo = key.split("|")[1]
+            item_id = self.catalog.item_id(codigo, events[0]["nome_item"])
+            total = self._apply(key, batch_id, events)
+            with self.lock:
+                self.ready.extend(compact_event(event, item_id) for event in number_events(events, total))
+                self.known[key] = total
+                self.queued[key] -= len(events)
+                self.inflight.pop(0)
+
+    def _insert_ready(self):
+        """Grava os eventos já numerados; reenvios não duplicam (o _id é atribuído na primeira tentativa)."""
+        from pymongo.errors import BulkWriteError
+        if not self.ready:
+            return
+        try:
+            self.events.insert_many(self.ready, ordered=False)
+        except BulkWriteError as e:
+            if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+                raise
+        with self.lock:
+            self.size -= len(self.ready)
+            self.ready = []
+
+    def stop(self):
+        """Envia o que restou na fila e encerra a thread."""
+        self.stop_event.set()
+        if self.thread.is_alive():
+            self.thread.join(timeout=5)
+
+
+def current_totals(db, data=None, linha=None, fuso=FUSO_PADRAO):
+    """
+    Contadores de um dia de turno, opcionalmente de uma linha. O padrão é o
+    dia do turno atual no fuso da fábrica: de madrugada, o do T3 em andamento.
+    """
+    import pytz
+    query = {"data": data or shift_of(datetime.now(pytz.timezone(fuso)))[0]}
+    if linha:
+        query["linha"] = linha
+    return list(db[COUNTERS_COLLECTION].find(query, {"_id": 0, "lotes": 0}).sort([("linha", 1), ("turno", 1)]))
@@ -0,0 +1,216 @@
+"""
+Materialização incremental do dataset de treino (output/train|val|test).
+
+Em vez de recopiar todas as imagens a cada treinamento, um manifesto
+(output/manifest.json) guarda o que já foi materializado:
+- imagens entram por hardlink (ou symlink, ou cópia como último recurso) e
+  só são refeitas se a origem mudar (mtime/tamanho);
+- arquivos .txt de rótulo só são regravados se o hash do conteúdo mudar;
+- arquivos que não pertencem mais ao dataset são removidos.
+
+A divisão entre train/val/test é estável: imagens já distribuídas mantêm o
+split anterior e as novas vão para o split mais abaixo da sua proporção,
+de modo que rotular mais dez imagens não embaralha o dataset inteiro.
+Quando os grupos de quase duplicadas (dedup.py) são informados, as imagens
+novas de um grupo seguem o split do grupo, e grupos que ainda assim ficaram
+em mais de um split são apontados como vazamento.
+"""
+import os
+import json
+import shutil
+import hashlib
+
+SPLITS = ("train", "val", "test")
+MANIFEST_NAME = "manifest.json"
+
+
+def _sha1(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            pass
+    return {"images": {}}
+
+
+def _save_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+
+def load_splits(output_dir):
+    """<nome_base> -> split, segundo o manifesto atual."""
+    return {b: e.get("split") for b, e in _load_manifest(output_dir).get("images", {}).items()}
+
+
+def split_image_paths(output_dir):
+    """<nome_base> -> (split, caminho da imagem materializada), segundo o manifesto atual."""
+    out = {}
+    for base_name, entry in _load_manifest(output_dir).get("images", {}).items():
+        split = entry.get("split")
+        if split in SPLITS and entry.get("src"):
+            out[base_name] = (split, os.path.join(output_dir, split, os.path.basename(entry["src"])))
+    return out
+
+
+def manifest_hash(output_dir):
+    """Hash do manifesto atual (identifica a versão do dataset)."""
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def assign_splits(base_names, previous, groups=None):
+    """
+    Distribui as imagens em train/val/test (1/3 cada, como antes), mantendo
+    o split das que já estavam no manifesto anterior. groups (<nome_base> ->
+    id do grupo de quase duplicadas) faz as imagens novas de um grupo irem
+    para o split em que o grupo já está.
+    """
+    groups = groups or {}
+    assignment = {b: previous[b] for b in base_names if previous.get(b) in SPLITS}
+    counts = {s: 0 for s in SPLITS}
+    group_split = {}
+    for base_name, split in assignment.items():
+        counts[split] += 1
+        if base_name in groups:
+            group_split.setdefault(groups[base_name], split)
+    for base_name in base_names:
+        if base_name in assignment:
+            continue
+        split = group_split.get(groups.get(base_name))
+        if split is None:
+            # Split mais abaixo da meta; o teste fica com o que sobrar (como no n_test original)
+            split = min(SPLITS, key=lambda s: (counts[s], SPLITS.index(s)))
+            if base_name in groups:
+                group_split[groups[base_name]] = split
+        assignment[base_name] = split
+        counts[split] += 1
+    return assignment
+
+
+def _link_or_copy(src, dst):
+    """Hardlink; se não der (outro volume), symlink; se não der (permissão), cópia."""
+    try:
+        os.link(src, dst)
+        return "hardlink"
+    except OSError:
+        pass
+    try:
+        os.symlink(os.path.abspath(src), dst)
+        return "symlink"
+    except OSError:
+        shutil.copy2(src, dst)
+        return "copia"
+
+
+def _remove(path):
+    if os.path.lexists(path):
+        os.remove(path)
+
+
+def build_dataset(annotations, image_paths, output_dir, log_callback=print, groups=None):
+    """
+    Sincroniza output_dir com as anotações.
+    annotations: <nome_base> -> conteúdo do TXT YOLO
+    image_paths: caminhos das imagens rotuladas
+    groups: opcional, <nome_base> -> id do grupo de quase duplicadas
+    Retorna (dirs, estatísticas), onde dirs mapeia split -> diretório.
+    """
+    path_by_base = {os.path.splitext(os.path.basename(p))[0]: p for p in image_paths}
+    base_names = [b for b in annotations if b in path_by_base]
+
+    manifest = _load_manifest(output_dir)
+    old_images = manifest.get("images", {})
+    assignment = assign_splits(base_names, {b: e.get("split") for b, e in old_images.items()}, groups)
+
+    dirs = {s: os.path.join(output_dir, s) for s in SPLITS}
+    for d in dirs.values():
+        os.makedirs(d, exist_ok=True)
+
+    stats = {"imagens": 0, "rotulos": 0, "removidos": 0, "inalterados": 0, "vazamentos": 0}
+    new_images = {}
+    expected = {s: set() for s in SPLITS}
+    for base_name in base_names:
+        src = path_by_base[base_name]
+        split = assignment[base_name]
+        st = os.stat(src)
+        img_name = os.path.basename(src)
+        img_dst = os.path.join(dirs[split], img_name)
+        txt_dst = os.path.join(dirs[split], base_name + ".txt")
+        expected[split].update((img_name, base_name + ".txt"))
+        label_hash = _sha1(annotations[base_name])
+        entry = {"split": split, "src": os.path.abspath(src), "mtime_ns": st.st_mtime_ns,
+                 "size": st.st_size, "label_sha1": label_hash}
+        old = old_images.get(base_name, {})
+
+        same_image = all(old.get(k) == entry[k] for k in ("split", "src", "mtime_ns", "size"))
+        if not (same_image and os.path.lexists(img_dst)):
+            _remove(img_dst)
+            entry["modo"] = _link_or_copy(src, img_dst)
+            stats["imagens"] += 1
+        else:
+            entry["modo"] = old.get("modo")
+
+        same_label = old.get("split") == split and old.get("label_sha1") == label_hash
+        if not (same_label and os.path.exists(txt_dst)):
+            with open(txt_dst, "w") as f:
+                f.write(annotations[base_name])
+            stats["rotulos"] += 1
+        if same_image and same_label:
+            stats["inalterados"] += 1
+        new_images[base_name] = entry
+
+    # Remove o que não pertence mais a cada split (imagens movidas ou descartadas)
+    for split, d in dirs.items():
+        with os.scandir(d) as it:
+            for e in it:
+                if e.name not in expected[split]:
+                    _remove(e.path)
+                    stats["removidos"] += 1
+
+    _save_manifest(output_dir, {"images": new_images})
+    if groups:
+        from dedup import find_split_leakage
+        leaks = find_split_leakage(assignment, groups)
+        stats["vazamentos"] = len(leaks)
+        if leaks and log_callback:
+            log_callback(f"Aviso: {len(leaks)} grupos de fotos quase iguais estão em mais de um split "
+                         "(vazamento entre treino e teste): "
+                         + "; ".join(f"{g}: " + ", ".join(sorted(s)) for g, s in list(leaks.items())[:10]))
+    if log_callback:
+        log_callback(f"Dataset sincronizado: {stats['imagens']} imagens vinculadas, "
+                     f"{stats['rotulos']} rótulos gravados, {stats['removidos']} removidos, "
+                     f"{stats['inalterados']} inalterados.")
+    return dirs, stats
+
+
+def write_data_yaml(output_dir, dirs, classes, train=None, name="data.yaml"):
+    """
+    Grava o data.yaml somente se o conteúdo mudou (preserva o mtime e os caches).
+    train substitui o diretório de treino (ex.: um .txt com a lista de imagens).
+    """
+    data_yaml_path = os.path.join(output_dir, name)
+    content = (f"train: {train or dirs['train']}\n"
+               f"val: {dirs['val']}\n"
+               f"test: {dirs['test']}\n"
+               f"nc: {len(classes)}\n"
+               "names: " + str(classes) + "\n")
+    if os.path.exists(data_yaml_path):
+        with open(data_yaml_path, "r") as f:
+            if f.read() == content:
+                return data_yaml_path
+    with open(data_yaml_path, "w") as f:
+        f.write(content)
+    return data_yaml_path
@@ -0,0 +1,249 @@
+"""
+Detecção de fotos quase duplicadas (rajadas da mesma peça, ex.: 1318-1.jpg ... 1318-59.jpg).
+
+- Cada foto recebe um hash perceptual de 64 bits (dHash), calculado em
+  paralelo com decodificação reduzida (modo draft do Pillow) e guardado
+  num índice SQLite chaveado por caminho, mtime e tamanho.
+- Os hashes vão para uma BK-tree, que responde "quais fotos estão a até
+  N bits de distância (Hamming)" sem comparar todos os pares.
+- Fotos ligadas por distância <= HAMMING_RADIUS formam um grupo; de cada
+  grupo fica um representante para rotular, e o grupo inteiro vai para o
+  mesmo split do dataset.
+- find_split_leakage aponta grupos que já estão espalhados entre
+  train/val/test (vazamento: o teste "vê" quadros do treino).
+
+Uso pela linha de comando:
+    python dedup.py <pasta_de_fotos> [--raio 6] [--dataset output]
+"""
+import os
+import sqlite3
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+
+from thumbnail_browser import THUMB_DB, scan_photo_dir
+
+HASH_SIZE = 8               # dHash 8x8 = 64 bits
+HAMMING_RADIUS = 6          # Distância máxima para considerar duas fotos quase iguais
+CHUNK_SIZE = 32             # Fotos por tarefa enviada ao pool
+
+
+def dhash(path):
+    """Hash de diferença (dHash) de 64 bits da imagem."""
+    img = Image.open(path)
+    img.draft("L", (HASH_SIZE * 8, HASH_SIZE * 8))  # Decodificação reduzida (só JPEG)
+    img = img.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.BILINEAR)
+    px = list(img.getdata())
+    value = 0
+    for row in range(HASH_SIZE):
+        for col in range(HASH_SIZE):
+            left = px[row * (HASH_SIZE + 1) + col]
+            right = px[row * (HASH_SIZE + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def _hash_entry(entry):
+    path, mtime_ns, size = entry
+    try:
+        return path, mtime_ns, size, dhash(path)
+    except Exception:
+        return path, mtime_ns, size, None
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class HashIndex:
+    """Cache persistente dos hashes perceptuais (mesmo banco das miniaturas)."""
+    def __init__(self, db_path=THUMB_DB):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS phashes ("
+                " path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, hash TEXT)")
+            self.conn.commit()
+
+    def get(self, path, mtime_ns, size):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT hash FROM phashes WHERE path = ? AND mtime_ns = ? AND size = ?",
+                (path, mtime_ns, size)).fetchone()
+        return int(row[0], 16) if row else None
+
+    def put_many(self, rows):
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO phashes VALUES (?, ?, ?, ?)",
+                                  [(p, m, s, f"{h:016x}") for p, m, s, h in rows])
+            self.conn.commit()
+
+
+def compute_hashes(entries, index=None, workers=None, progress_callback=None):
+    """
+    Hash de cada (caminho, mtime_ns, tamanho). Os que já estão no índice não
+    são recalculados; os demais são calculados num pool de processos.
+    Retorna caminho -> hash (fotos ilegíveis ficam de fora).
+    """
+    index = index or HashIndex()
+    hashes, missing = {}, []
+    for entry in entries:
+        cached = index.get(*entry)
+        if cached is None:
+            missing.append(entry)
+        else:
+            hashes[entry[0]] = cached
+    if missing:
+        rows = []
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for n, (path, mtime_ns, size, value) in enumerate(
+                    pool.map(_hash_entry, missing, chunksize=CHUNK_SIZE), 1):
+                if value is not None:
+                    hashes[path] = value
+                    rows.append((path, mtime_ns, size, value))
+                if progress_callback and n % CHUNK_SIZE == 0:
+                    progress_callback(n, len(missing))
+        index.put_many(rows)
+    return hashes
+
+
+class BKTree:
+    """Árvore BK sobre a distância de Hamming: busca por raio sem varrer todos os hashes."""
+    def __init__(self):
+        self.root = None        # [hash, [caminhos], {distância: filho}]
+
+    def add(self, value, path):
+        if self.root is None:
+            self.root = [value, [path], {}]
+            return
+        node = self.root
+        while True:
+            d = hamming(value, node[0])
+            if d == 0:
+                node[1].append(path)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [value, [path], {}]
+                return
+            node = child
+
+    def search(self, value, radius):
+        """Caminhos cujo hash está a até 'radius' bits de 'value'."""
+        found = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            d = hamming(value, node[0])
+            if d <= radius:
+                found.extend(node[1])
+            for dist, child in node[2].items():
+                if d - radius <= dist <= d + radius:
+                    stack.append(child)
+        return found
+
+
+def find_clusters(hashes, radius=HAMMING_RADIUS):
+    """
+    Agrupa as fotos quase iguais (fecho transitivo das vizinhanças).
+    Retorna a lista de grupos (listas de caminhos ordenadas), só com 2+ fotos.
+    """
+    tree = BKTree()
+    for path, value in hashes.items():
+        tree.add(value, path)
+    parent = {p: p for p in hashes}
+
+    def find(p):
+        while parent[p] != p:
+            parent[p] = parent[parent[p]]
+            p = parent[p]
+        return p
+
+    for path, value in hashes.items():
+        for other in tree.search(value, radius):
+            a, b = find(path), find(other)
+            if a != b:
+                parent[b] = a
+    groups = {}
+    for path in hashes:
+        groups.setdefault(find(path), []).append(path)
+    return [sorted(g) for g in groups.values() if len(g) > 1]
+
+
+def cluster_ids(clusters):
+    """caminho -> id do grupo (o primeiro caminho do grupo)."""
+    return {path: group[0] for group in clusters for path in group}
+
+
+def representative(group):
+    """Foto mantida de cada grupo: o maior arquivo (mais detalhe, menos desfoque no JPEG)."""
+    return max(group, key=lambda p: (os.path.getsize(p), p))
+
+
+def collapse(photo_paths, clusters, keep=()):
+    """
+    Remove de photo_paths as duplicatas de cada grupo, mantendo o
+    representante e qualquer foto em 'keep' (ex.: já rotuladas).
+    """
+    keep = set(keep)
+    drop = set()
+    for group in clusters:
+        chosen = representative(group)
+        drop.update(p for p in group if p != chosen and p not in keep)
+    return [p for p in photo_paths if p not in drop]
+
+
+def group_photos(photo_paths, radius=HAMMING_RADIUS, progress_callback=None):
+    """Atalho para uma lista de caminhos: hash (com cache) + agrupamento."""
+    entries = []
+    for path in photo_paths:
+        st = os.stat(path)
+        entries.append((path, st.st_mtime_ns, st.st_size))
+    return find_clusters(compute_hashes(entries, progress_callback=progress_callback), radius)
+
+
+def find_split_leakage(splits, groups):
+    """
+    splits: <nome_base> -> split; groups: <nome_base> -> id do grupo.
+    Retorna {id do grupo: {split: [nomes_base]}} para grupos em mais de um split.
+    """
+    by_group = {}
+    for base_name, split in splits.items():
+        group = groups.get(base_name)
+        if group is not None:
+            by_group.setdefault(group, {}).setdefault(split, []).append(base_name)
+    return {g: s for g, s in by_group.items() if len(s) > 1}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detecta fotos quase duplicadas numa pasta.")
+    parser.add_argument("pasta", help="Pasta de fotos")
+    parser.add_argument("--raio", type=int, default=HAMMING_RADIUS, help="Distância de Hamming máxima")
+    parser.add_argument("--dataset", help="Diretório do dataset (output) para checar vazamento entre splits")
+    args = parser.parse_args()
+
+    hashes = compute_hashes(list(scan_photo_dir(args.pasta)),
+                            progress_callback=lambda n, t: print(f"  hashes: {n}/{t}"))
+    clusters = find_clusters(hashes, args.raio)
+    redundant = sum(len(g) - 1 for g in clusters)
+    print(f"{len(hashes)} fotos, {len(clusters)} grupos de quase duplicadas, "
+          f"{redundant} fotos redundantes.")
+    for group in sorted(clusters, key=len, reverse=True)[:20]:
+        print(f"  {len(group):4d}  {os.path.basename(representative(group))}  "
+              f"({os.path.basename(group[0])} ... {os.path.basename(group[-1])})")
+
+    if args.dataset:
+        from dataset_builder import load_splits
+        groups = {os.path.splitext(os.path.basename(p))[0]: os.path.splitext(os.path.basename(g))[0]
+                  for p, g in cluster_ids(clusters).items()}
+        leaks = find_split_leakage(load_splits(args.dataset), groups)
+        print(f"{len(leaks)} grupos com fotos em mais de um split.")
+        for group, splits in leaks.items():
+            print(f"  {group}: " + ", ".join(f"{s}={len(b)}" for s, b in sorted(splits.items())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,439 @@
+"""
+Armazenamento dos eventos de contagem (event_logs).
+
+- Esquema compacto: nomes de campo curtos, classe como inteiro, o item como
+  um id pequeno da coleção 'catalog' e o instante em epoch-milissegundos.
+  make_count_event() monta o evento legível (usado pelo copilot);
+  compact_event()/expand_event() convertem entre ele e o documento gravado.
+  Documentos ainda no formato antigo (data_hora/classe/codigo, antes de
+  migrate_events.py) continuam sendo lidos e consultados normalmente.
+- Opcionalmente cria 'event_logs' como coleção time-series do MongoDB,
+  com 't' como campo de tempo e linha/item como metadados ('m'). Uma
+  time-series no formato antigo (campo de tempo 'data_hora') é recusada com
+  EventLayoutError até ser convertida por migrate_events.py.
+- Retenção configurável: eventos mais antigos que RETENTION_DAYS são
+  exportados para arquivos NDJSON compactados (gzip), particionados por dia
+  (UTC), e só depois removidos da coleção "quente".
+- Consulta transparente: find_events() junta a coleção e os dias arquivados.
+- Novos eventos sem change stream: EventTail (consulta incremental por _id
+  com janela de sobreposição).
+
+Uso pela linha de comando:
+    python event_store.py --archive    # arquiva e remove os dias expirados
+"""
+import os
+import sys
+import gzip
+import json
+import time
+import threading
+from datetime import datetime, timedelta, timezone
+
+MONGO_URI = "mongodb://localhost:27017/"
+
+# ========================================================
+# ## 1. Configuração
+# ========================================================
+TIMESERIES_ENABLED = False          # True: cria event_logs como coleção time-series
+RETENTION_DAYS = 30                 # Dias mantidos na coleção quente
+TTL_GRACE_DAYS = 2                  # Folga do TTL nativo (o arquivamento roda antes)
+ARCHIVE_DIR = os.path.join(os.getcwd(), "archive", "event_logs")
+ARCHIVE_DELETE_BATCH = 10_000       # _id por delete_many ao remover um dia arquivado
+POLL_OVERLAP = timedelta(minutes=2)  # Janela relida a cada consulta incremental (EventTail)
+LINHA_PADRAO = "linha_1"            # Identificação da linha quando não informada
+CATALOG_COLLECTION = "catalog"      # Itens produzidos: {"_id": 1, "codigo": "1318", "nome_item": "..."}
+CLASSES = ("Aprovado", "Reprovado")  # Classe gravada como índice nesta tupla (campo 'c')
+
+# Documento compacto em event_logs:
+#   t: instante (epoch em ms, UTC; data BSON em coleção time-series)
+#   c: classe (índice em CLASSES)     n: total acumulado (counters.py)
+#   m: metadados {l: linha, i: id do item no catálogo}    k: câmera (opcional)
+EVENT_TIMESERIES = {"timeField": "t", "metaField": "m", "granularity": "seconds"}
+
+
+class EventLayoutError(RuntimeError):
+    """A coleção de eventos existe em um formato que os aplicativos não conseguem gravar."""
+
+
+def _utc(dt):
+    """Normaliza um datetime para UTC com tzinfo (o PyMongo devolve datetimes ingênuos em UTC)."""
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+# ========================================================
+# ## 2. Criação da coleção e formato do documento
+# ========================================================
+def timeseries_options(db, name):
+    """Opções 'timeseries' da coleção, ou None se ela não existir ou for uma coleção comum."""
+    info = next(iter(db.list_collections(filter={"name": name})), None)
+    if info and info.get("type") == "timeseries":
+        return info.get("options", {}).get("timeseries", {})
+    return None
+
+
+def check_event_collection(db, name="event_logs"):
+    """
+    Recusa uma coleção time-series em que os eventos compactos não podem ser
+    gravados: formato antigo (campo de tempo 'data_hora', metadados 'meta')
+    ou TIMESERIES_ENABLED desligado ('t' seria gravado como número).
+    """
+    options = timeseries_options(db, name)
+    if options is None:
+        return
+    layout = (options.get("timeField"), options.get("metaField"))
+    if layout != (EVENT_TIMESERIES["timeField"], EVENT_TIMESERIES["metaField"]):
+        raise EventLayoutError(
+            f"{db.name}.{name} é uma time-series no formato antigo (campo de tempo '{layout[0]}', "
+            f"metadados '{layout[1]}'). Pare os aplicativos e execute migrate_events.py.")
+    if not TIMESERIES_ENABLED:
+        raise EventLayoutError(
+            f"{db.name}.{name} é uma time-series, mas TIMESERIES_ENABLED está desligado em event_store.py.")
+
+
+def ensure_event_collection(db, name="event_logs"):
+    """
+    Cria a coleção de eventos como time-series, se habilitado e se ela ainda
+    não existir. O TTL nativo fica com uma folga sobre a retenção para que o
+    arquivamento sempre aconteça antes da expiração. Uma coleção existente
+    em formato incompatível gera EventLayoutError (check_event_collection).
+    """
+    check_event_collection(db, name)
+    if not TIMESERIES_ENABLED or name in db.list_collection_names():
+        return db[name]
+    db.create_collection(
+        name,
+        timeseries=EVENT_TIMESERIES,
+        expireAfterSeconds=(RETENTION_DAYS + TTL_GRACE_DAYS) * 86400,
+    )
+    return db[name]
+
+
+def make_count_event(classe, nome_item, codigo, data_hora, total, linha=LINHA_PADRAO, camera=None):
+    """Evento de contagem legível de detect_objects ('total' é preenchido por counters.py)."""
+    doc = {
+        "classe": classe,
+        "nome_item": nome_item,
+        "codigo": codigo,
+        "data_hora": data_hora,
+        "total": total,
+        "linha": linha,
+    }
+    if camera is not None:
+        doc["camera"] = camera
+    return doc
+
+
+def to_t(dt):
+    """Valor do campo 't' para um datetime (também usado nos filtros de consulta)."""
+    if TIMESERIES_ENABLED:
+        return _utc(dt)     # O campo de tempo de uma time-series precisa ser uma data BSON
+    return int(_utc(dt).timestamp() * 1000)
+
+
+def from_t(value):
+    if isinstance(value, datetime):
+        return _utc(value)
+    if isinstance(value, str):
+        return _utc(datetime.fromisoformat(value))
+    return datetime.fromtimestamp(value / 1000, tz=timezone.utc)
+
+
+def event_time(doc):
+    """Instante (UTC) de um documento compacto ou no formato antigo."""
+    return from_t(doc["t"] if "t" in doc else doc["data_hora"])
+
+
+def event_query(classe=None, inicio=None, fim=None):
+    """
+    Filtro de event_logs que casa os documentos compactos e os antigos
+    (ainda não migrados). Cada ramo do $or usa o seu índice; o dos antigos é
+    um índice parcial que fica vazio depois da migração.
+    """
+    if not (classe or inicio or fim):
+        return {}
+    compact, legacy = {}, {"data_hora": {"$exists": True}}
+    if classe:
+        compact["c"] = class_code(classe)
+        legacy["classe"] = classe
+    if inicio or fim:
+        compact["t"] = {}
+        if inicio:
+            compact["t"]["$gte"] = to_t(inicio)
+            legacy["data_hora"]["$gte"] = _utc(inicio)
+        if fim:
+            compact["t"]["$lt"] = to_t(fim)
+            legacy["data_hora"]["$lt"] = _utc(fim)
+    return {"$or": [compact, legacy]}
+
+
+# Expressões de agregação equivalentes para os dois formatos
+CLASS_EXPR = {"$ifNull": ["$c", "$classe"]}
+LINE_EXPR = {"$ifNull": ["$m.l", {"$ifNull": ["$linha", {"$ifNull": ["$meta.linha", LINHA_PADRAO]}]}]}
+
+
+def class_code(classe):
+    return CLASSES.index(classe) if classe in CLASSES else classe
+
+
+def class_name(code):
+    return CLASSES[code] if isinstance(code, int) and 0 <= code < len(CLASSES) else code
+
+
+def compact_event(event, item_id):
+    """Documento gravado em event_logs a partir do evento legível."""
+    doc = {"t": to_t(event["data_hora"]), "c": class_code(event["classe"]), "n": event["total"],
+           "m": {"l": event.get("linha") or LINHA_PADRAO, "i": item_id}}
+    if event.get("camera") is not None:
+        doc["k"] = event["camera"]
+    if "_id" in event:
+        doc["_id"] = event["_id"]
+    return doc
+
+
+def expand_event(doc, catalog):
+    """Evento legível (formato público da API) a partir do documento compacto ou antigo."""
+    if "t" not in doc:
+        event = {
+            "_id": str(doc["_id"]) if "_id" in doc else None,
+            "classe": doc.get("classe"),
+            "nome_item": doc.get("nome_item"),
+            "codigo": doc.get("codigo"),
+            "data_hora": event_time(doc),
+            "total": doc.get("total"),
+            "linha": doc.get("linha") or doc.get("meta", {}).get("linha") or LINHA_PADRAO,
+        }
+        if "camera" in doc:
+            event["camera"] = doc["camera"]
+        return event
+    meta = doc.get("m", {})
+    item = catalog.item(meta.get("i"))
+    event = {
+        "_id": str(doc["_id"]) if "_id" in doc else None,
+        "classe": class_name(doc.get("c")),
+        "nome_item": item.get("nome_item"),
+        "codigo": item.get("codigo"),
+        "data_hora": from_t(doc["t"]),
+        "total": doc.get("n"),
+        "linha": meta.get("l") or LINHA_PADRAO,
+    }
+    if "k" in doc:
+        event["camera"] = doc["k"]
+    return event
+
+
+class ItemCatalog:
+    """Coleção 'catalog' (id pequeno <-> código e nome do item), com cache em memória."""
+    def __init__(self, db):
+        self.collection = db[CATALOG_COLLECTION]
+        self.by_id = {}
+        self.by_code = {}
+        self.lock = threading.Lock()
+
+    def _remember(self, doc):
+        with self.lock:
+            self.by_id[doc["_id"]] = doc
+            self.by_code[doc["codigo"]] = doc["_id"]
+        return doc
+
+    def item_id(self, codigo, nome_item):
+        """Id do item, criando a entrada no catálogo na primeira vez (índice único em 'codigo')."""
+        from pymongo.errors import DuplicateKeyError
+        if codigo in self.by_code:
+            return self.by_code[codigo]
+        doc = self.collection.find_one({"codigo": codigo})
+        while doc is None:
+            last = self.collection.find_one(sort=[("_id", -1)])
+            doc = {"_id": (last["_id"] + 1) if last else 1, "codigo": codigo, "nome_item": nome_item}
+            try:
+                self.collection.insert_one(doc)
+            except DuplicateKeyError:   # Outra instância criou o item (ou o id) ao mesmo tempo
+                doc = self.collection.find_one({"codigo": codigo})
+        return self._remember(doc)["_id"]
+
+    def item(self, item_id):
+        if item_id not in self.by_id:
+            doc = self.collection.find_one({"_id": item_id})
+            if doc is None:
+                return {}
+            self._remember(doc)
+        return self.by_id[item_id]
+
+
+# ========================================================
+# ## 3. Arquivamento frio particionado por dia
+# ========================================================
+def _day_dir(day):
+    return os.path.join(ARCHIVE_DIR, day.strftime("%Y-%m-%d"))
+
+
+def _to_json(doc):
+    out = dict(doc)
+    out["_id"] = str(out["_id"])
+    for key, value in out.items():
+        if isinstance(value, datetime):
+            out[key] = _utc(value).isoformat()
+    return out
+
+
+def _oldest_before(collection, cutoff):
+    """Instante do evento mais antigo anterior a cutoff (compacto ou antigo), ou None."""
+    found = [collection.find_one({"t": {"$lt": to_t(cutoff)}}, sort=[("t", 1)]),
+             collection.find_one({"data_hora": {"$lt": cutoff}}, sort=[("data_hora", 1)])]
+    times = [event_time(doc) for doc in found if doc]
+    return min(times) if times else None
+
+
+def _write_partition(day, cursor):
+    """
+    Grava um novo arquivo (parte) do dia de forma atômica: tmp + rename.
+    Os documentos são lidos do cursor em fluxo, sem carregar o dia na memória
+    (só os _id gravados são guardados). Retorna (caminho, _ids); nada é
+    gravado se o cursor estiver vazio.
+    """
+    os.makedirs(_day_dir(day), exist_ok=True)
+    part = os.path.join(_day_dir(day), f"part-{time.time_ns()}.ndjson.gz")
+    tmp = part + ".tmp"
+    ids = []
+    with gzip.open(tmp, "wt", encoding="utf-8") as f:
+        for doc in cursor:
+            f.write(json.dumps(_to_json(doc), ensure_ascii=False) + "\n")
+            ids.append(doc["_id"])
+    if not ids:
+        os.remove(tmp)
+        return None, ids
+    os.replace(tmp, part)
+    return part, ids
+
+
+def archive_expired(collection, now=None, log_callback=None):
+    """
+    Exporta para ARCHIVE_DIR todos os dias completos mais antigos que
+    RETENTION_DAYS e os remove da coleção. Cada dia é gravado antes de ser
+    apagado, e só os _id gravados são apagados: um evento atrasado que chegue
+    durante a exportação fica para a próxima execução. Se o processo cair
+    entre as duas etapas, a próxima execução grava uma nova parte e a
+    leitura descarta os _id duplicados.
+    Em coleções time-series, delete_many pelo campo de tempo exige MongoDB 7.0;
+    em versões anteriores a remoção fica a cargo do TTL nativo.
+    Retorna o número de eventos arquivados.
+    """
+    now = _utc(now or datetime.now(timezone.utc))
+    cutoff = (now - timedelta(days=RETENTION_DAYS)).replace(hour=0, minute=0, second=0, microsecond=0)
+    oldest = _oldest_before(collection, cutoff)
+    archived = 0
+    if not oldest:
+        return archived
+    day = oldest.replace(hour=0, minute=0, second=0, microsecond=0)
+    while day < cutoff:
+        next_day = day + timedelta(days=1)
+        day_filter = event_query(inicio=day, fim=next_day)
+        path, ids = _write_partition(day, collection.find(day_filter))
+        count = len(ids)
+        if count:
+            for start in range(0, count, ARCHIVE_DELETE_BATCH):
+                collection.delete_many({"_id": {"$in": ids[start:start + ARCHIVE_DELETE_BATCH]}})
+            archived += count
+            if log_callback:
+                log_callback(f"[Arquivo] {count} eventos de {day:%Y-%m-%d} -> {path}")
+        day = next_day
+    return archived
+
+
+def _read_day(day):
+    """Lê todas as partes arquivadas de um dia."""
+    day_dir = _day_dir(day)
+    if not os.path.isdir(day_dir):
+        return
+    for name in sorted(os.listdir(day_dir)):
+        if not name.endswith(".ndjson.gz"):
+            continue
+        with gzip.open(os.path.join(day_dir, name), "rt", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+
+
+# ========================================================
+# ## 4. Consulta transparente (coleção quente + arquivo)
+# ========================================================
+def find_events(collection, classe=None, inicio=None, fim=None):
+    """
+    Retorna os documentos (com _id em texto) que atendem aos filtros, em
+    ordem de tempo. Sem 'inicio' a consulta fica restrita à coleção quente,
+    como antes; com 'inicio' os dias arquivados do intervalo também são
+    lidos. O formato legível é montado por expand_event (api.py).
+    """
+    eventos = {}
+    for e in collection.find(event_query(classe, inicio, fim)):
+        e["_id"] = str(e["_id"])
+        eventos[e["_id"]] = e
+
+    if inicio:
+        day = _utc(inicio).replace(hour=0, minute=0, second=0, microsecond=0)
+        end = _utc(fim) if fim else datetime.now(timezone.utc)
+        while day < end:
+            for e in _read_day(day):
+                if classe and class_name(e.get("c", e.get("classe"))) != classe:
+                    continue
+                when = event_time(e)
+                if when < _utc(inicio) or (fim and when >= _utc(fim)):
+                    continue
+                eventos.setdefault(e["_id"], e)
+            day += timedelta(days=1)
+
+    return sorted(eventos.values(), key=event_time)
+
+
+# ========================================================
+# ## 5. Consulta incremental de novos eventos
+# ========================================================
+class EventTail:
+    """
+    Entrega os eventos inseridos desde a última consulta, para quando o
+    MongoDB não tem change stream. O _id (ObjectId) carrega o instante da
+    inserção, gerado por quem grava: um lote atrasado recebe o _id ao ser
+    enviado, mas entre hosts a ordem não é garantida (mesmo segundo, relógios
+    diferentes). Por isso cada consulta relê os _id dos últimos POLL_OVERLAP
+    antes do maior já entregue (só o índice de _id) e busca apenas os novos.
+    """
+    def __init__(self, collection, overlap=POLL_OVERLAP):
+        self.collection = collection
+        self.overlap = overlap
+        self.newest = None      # Maior _id já entregue
+        self.seen = set()       # _id já entregues dentro da janela
+
+    def _window(self):
+        from bson import ObjectId
+        if self.newest is None:
+            return {}
+        return {"_id": {"$gte": ObjectId.from_datetime(self.newest.generation_time - self.overlap)}}
+
+    def start(self):
+        """Começa do fim da coleção: os eventos já gravados não são entregues."""
+        last = self.collection.find_one(sort=[("_id", -1)])
+        self.newest = last["_id"] if last else None
+        self.seen = {doc["_id"] for doc in self.collection.find(self._window(), {"_id": 1})}
+        return self
+
+    def poll(self):
+        """Documentos novos, em ordem de _id."""
+        ids = [doc["_id"] for doc in self.collection.find(self._window(), {"_id": 1})
+               if doc["_id"] not in self.seen]
+        if not ids:
+            return []
+        novos = list(self.collection.find({"_id": {"$in": ids}}).sort("_id", 1))
+        self.seen.update(ids)
+        self.newest = max(ids) if self.newest is None else max(self.newest, *ids)
+        oldest = self._window()["_id"]["$gte"]
+        self.seen = {_id for _id in self.seen if _id >= oldest}
+        return novos
+
+
+if __name__ == "__main__":
+    from pymongo import MongoClient
+    client = MongoClient(MONGO_URI)
+    collection = ensure_event_collection(client["tdc_workshop"])
+    if "--archive" in sys.argv:
+        total = archive_expired(collection, log_callback=print)
+        print(f"{total} eventos arquivados em {ARCHIVE_DIR}.")
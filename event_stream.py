@@ -0,0 +1,175 @@
+"""
+Feed ao vivo dos eventos de contagem para a API (SSE e WebSocket).
+
+Um único EventBroadcaster observa 'event_logs' (change stream, ou consulta
+incremental com event_store.EventTail quando o MongoDB não tem replica set) e distribui cada
+novo evento para todos os clientes conectados. Assim centenas de telas de
+andon acompanham a linha com uma só leitura no banco. Os documentos
+compactos do banco são traduzidos (translate, ex.: expand_event) antes de
+chegar aos clientes.
+
+Cada cliente tem uma fila limitada; se ela encher (consumidor lento), o
+cliente é desconectado em vez de atrasar os demais ou acumular memória.
+"""
+import time
+import asyncio
+import threading
+from datetime import datetime
+import pytz
+from fastapi.encoders import jsonable_encoder
+from event_store import LINHA_PADRAO, EventTail, event_query, class_name, CLASS_EXPR, LINE_EXPR
+
+CLIENT_BUFFER = 100         # Mensagens pendentes por cliente antes de desconectar
+POLL_INTERVAL = 1.0         # Intervalo da consulta incremental (sem change stream)
+HEARTBEAT_SECONDS = 15      # Intervalo dos comentários de keep-alive no SSE
+
+
+def event_line(evento):
+    """Linha de um evento (traduzido ou compacto; documentos antigos não têm o campo)."""
+    return evento.get("linha") or evento.get("m", {}).get("l") or LINHA_PADRAO
+
+
+class Subscriber:
+    """Cliente conectado ao feed, com filtros e fila própria."""
+    def __init__(self, loop, classe=None, linha=None, maxsize=CLIENT_BUFFER):
+        self.loop = loop
+        self.classe = classe
+        self.linha = linha
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = False
+
+    def accepts(self, message):
+        if self.classe and message.get("classe") != self.classe:
+            return False
+        if self.linha and message.get("linha") != self.linha:
+            return False
+        return True
+
+    def push(self, message):
+        """Executado no loop do cliente. Fila cheia = consumidor lento: desconecta."""
+        if self.dropped:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.dropped = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+class EventBroadcaster:
+    """
+    Observa a coleção de eventos em uma thread e repassa cada novo evento
+    (e o delta de KPI correspondente) aos assinantes e aos listeners.
+    """
+    def __init__(self, collection, translate=None, log_callback=print):
+        self.collection = collection
+        self.translate = translate      # Documento do banco -> evento publicado
+        self.log_callback = log_callback
+        self.subscribers = set()
+        self.listeners = []             # Funções chamadas a cada novo evento (ex.: invalidar cache)
+        self.lock = threading.Lock()
+        self.kpis = {}                  # (linha, classe) -> total do dia
+        self.kpi_day = None
+        self.tail = None                # Consulta incremental (mantida entre falhas para não perder eventos)
+        self.running = False
+
+    # ---------- Assinaturas ----------
+    def subscribe(self, classe=None, linha=None):
+        sub = Subscriber(asyncio.get_running_loop(), classe, linha)
+        with self.lock:
+            self.subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self.lock:
+            self.subscribers.discard(sub)
+
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+
+    # ---------- KPIs do dia ----------
+    def _today(self):
+        return datetime.now(pytz.timezone("America/Sao_Paulo")).replace(
+            hour=0, minute=0, second=0, microsecond=0)
+
+    def _load_kpis(self):
+        """Carrega os totais do dia uma vez (e a cada virada de dia)."""
+        today = self._today()
+        kpis = {}
+        for grupo in self.collection.aggregate([
+            {"$match": event_query(inicio=today)},
+            {"$group": {"_id": {"linha": LINE_EXPR, "classe": CLASS_EXPR}, "total": {"$sum": 1}}},
+        ]):
+            key = (grupo["_id"]["linha"], class_name(grupo["_id"]["classe"]))
+            kpis[key] = kpis.get(key, 0) + grupo["total"]
+        with self.lock:
+            self.kpis = kpis
+            self.kpi_day = today
+
+    # ---------- Distribuição ----------
+    def publish(self, evento):
+        if self.translate:
+            evento = self.translate(evento)
+        linha = event_line(evento)
+        classe = evento.get("classe")
+        key = (linha, classe)
+        if self._today() != self.kpi_day:
+            self._load_kpis()       # A releitura já conta este evento (gravado antes de ser publicado)
+            with self.lock:
+                total_dia = self.kpis.get(key, 0)
+        else:
+            with self.lock:
+                self.kpis[key] = total_dia = self.kpis.get(key, 0) + 1
+        evento = dict(evento, _id=str(evento["_id"]))
+        evento = jsonable_encoder(evento)
+        messages = [
+            {"tipo": "evento", "linha": linha, "classe": classe, "evento": evento},
+            {"tipo": "kpi", "linha": linha, "classe": classe, "delta": 1, "total_dia": total_dia},
+        ]
+        for callback in self.listeners:
+            callback(evento)
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for sub in subscribers:
+            for message in messages:
+                if sub.accepts(message):
+                    sub.loop.call_soon_threadsafe(sub.push, message)
+
+    def _watch_change_stream(self):
+        with self.collection.watch([{"$match": {"operationType": "insert"}}]) as stream:
+            for change in stream:
+                if not self.running:
+                    break
+                self.publish(change["fullDocument"])
+
+    def _poll(self):
+        if self.tail is None:
+            self.tail = EventTail(self.collection).start()
+        while self.running:
+            for evento in self.tail.poll():
+                self.publish(evento)
+            time.sleep(POLL_INTERVAL)
+
+    def _run(self):
+        try:
+            self._load_kpis()
+            self._watch_change_stream()
+        except Exception as e:
+            if self.log_callback:
+                self.log_callback(f"Change stream indisponível, usando consulta incremental: {e}")
+            while self.running:
+                try:
+                    self._poll()
+                except Exception as e:
+                    if self.log_callback:
+                        self.log_callback(f"Falha ao consultar novos eventos: {e}")
+                    time.sleep(POLL_INTERVAL)
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def stop(self):
+        self.running = False
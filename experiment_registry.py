@@ -0,0 +1,207 @@
+"""
+Registro indexado dos experimentos de treino (SQLite).
+
+Substitui a varredura de runs/detect e runs/train por mtime: cada treino
+concluído grava uma linha com o diretório do experimento, o hash dos
+pesos, os hiperparâmetros, o hash do manifesto do dataset, as métricas
+finais e a latência de inferência medida na CPU. Consultas como "último
+treino" ou "melhor mAP com até 20 ms por quadro" usam índices, sem tocar
+no sistema de arquivos.
+
+Experimentos anteriores ao registro são importados uma vez, a partir do
+results.csv de cada diretório (sem latência).
+
+Uso pela linha de comando:
+    python experiment_registry.py [--max-ms 20] [--limite 10]
+"""
+import os
+import csv
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+
+REGISTRY_DB = os.path.join(os.getcwd(), "runs", "registry.sqlite")
+RUNS_DIRS = (os.path.join(os.getcwd(), "runs", "detect"), os.path.join(os.getcwd(), "runs", "train"))
+METRIC_KEYS = {"map50": "metrics/mAP50(B)", "map5095": "metrics/mAP50-95(B)",
+               "precisao": "metrics/precision(B)", "recall": "metrics/recall(B)"}
+LATENCY_BUDGET_MS = 20      # Orçamento por quadro usado na sugestão do seletor de modelos
+LATENCY_RUNS = 20           # Inferências cronometradas na medição de latência
+LATENCY_WARMUP = 3
+
+COLUMNS = ("run_dir", "weights", "weights_sha1", "criado_em", "modo", "modelo_base", "epocas", "imgsz",
+           "dataset_hash", "map50", "map5095", "precisao", "recall", "latencia_ms", "hiperparametros", "metricas")
+
+
+def sha1_file(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def measure_cpu_latency(weights_path, imgsz=640, runs=LATENCY_RUNS, warmup=LATENCY_WARMUP, model=None):
+    """Mediana (ms) de uma inferência na CPU com um quadro do tamanho de treino."""
+    import numpy as np
+    from ultralytics import YOLO
+    model = model or YOLO(weights_path)
+    frame = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+    for _ in range(warmup):
+        model.predict(frame, imgsz=imgsz, device="cpu", verbose=False)
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        model.predict(frame, imgsz=imgsz, device="cpu", verbose=False)
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return round(times[len(times) // 2], 2)
+
+
+def _read_results_csv(run_dir):
+    """Última linha do results.csv do ultralytics (métricas da última época)."""
+    path = os.path.join(run_dir, "results.csv")
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", newline="") as f:
+        rows = list(csv.DictReader(f))
+    if not rows:
+        return {}
+    out = {}
+    for k, v in rows[-1].items():
+        try:
+            out[k.strip()] = float(v)
+        except (TypeError, ValueError):
+            pass
+    return out
+
+
+class ExperimentRegistry:
+    """Tabela 'experimentos' com índices por data, mAP e latência."""
+    def __init__(self, db_path=REGISTRY_DB):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+        with self.lock:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS experimentos ("
+                " id INTEGER PRIMARY KEY, run_dir TEXT UNIQUE, weights TEXT, weights_sha1 TEXT,"
+                " criado_em REAL, modo TEXT, modelo_base TEXT, epocas INTEGER, imgsz INTEGER,"
+                " dataset_hash TEXT, map50 REAL, map5095 REAL, precisao REAL, recall REAL,"
+                " latencia_ms REAL, hiperparametros TEXT, metricas TEXT)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_exp_criado ON experimentos (criado_em)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_exp_map ON experimentos (map5095)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_exp_latencia ON experimentos (latencia_ms, map5095)")
+            self.conn.commit()
+        if self.count() == 0:
+            self.import_existing_runs()
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM experimentos").fetchone()[0]
+
+    def register(self, run_dir, weights, hyperparams=None, dataset_hash=None, metrics=None,
+                 latency_ms=None, mode=None, base_model=None, created_at=None):
+        """Grava (ou substitui) o experimento de run_dir."""
+        metrics = metrics or {}
+        hyperparams = hyperparams or {}
+        row = {
+            "run_dir": os.path.abspath(run_dir),
+            "weights": os.path.abspath(weights),
+            "weights_sha1": sha1_file(weights) if os.path.exists(weights) else None,
+            "criado_em": created_at or time.time(),
+            "modo": mode,
+            "modelo_base": base_model,
+            "epocas": hyperparams.get("epochs"),
+            "imgsz": hyperparams.get("imgsz"),
+            "dataset_hash": dataset_hash,
+            "latencia_ms": latency_ms,
+            "hiperparametros": json.dumps(hyperparams, ensure_ascii=False),
+            "metricas": json.dumps(metrics, ensure_ascii=False),
+        }
+        for column, key in METRIC_KEYS.items():
+            row[column] = metrics.get(key)
+        with self.lock:
+            self.conn.execute(
+                f"INSERT OR REPLACE INTO experimentos ({', '.join(COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(COLUMNS))})", [row[c] for c in COLUMNS])
+            self.conn.commit()
+        return row
+
+    def import_existing_runs(self, runs_dirs=RUNS_DIRS):
+        """Importa os diretórios de runs/ que têm best.pt (uma vez, quando o registro está vazio)."""
+        for base_dir in runs_dirs:
+            if not os.path.isdir(base_dir):
+                continue
+            with os.scandir(base_dir) as it:
+                for entry in it:
+                    weights = os.path.join(entry.path, "weights", "best.pt")
+                    if entry.is_dir() and os.path.exists(weights):
+                        self.register(entry.path, weights, metrics=_read_results_csv(entry.path),
+                                      mode="importado", created_at=os.path.getmtime(weights))
+
+    # ---------- Consultas ----------
+    def _query(self, sql, params=()):
+        with self.lock:
+            return [dict(r) for r in self.conn.execute(sql, params).fetchall()]
+
+    def latest(self, exclude_modes=("sweep",)):
+        """Último treino; por padrão ignora os experimentos de varredura (sweep.py)."""
+        marks = ", ".join("?" * len(exclude_modes))
+        where = f"WHERE modo IS NULL OR modo NOT IN ({marks}) " if exclude_modes else ""
+        rows = self._query(f"SELECT * FROM experimentos {where}ORDER BY criado_em DESC LIMIT 1",
+                           tuple(exclude_modes))
+        return rows[0] if rows else None
+
+    def best(self, max_latency_ms=None, metric="map5095"):
+        """Melhor experimento pela métrica, opcionalmente com latência até max_latency_ms."""
+        if metric not in METRIC_KEYS:
+            raise ValueError(f"Métrica desconhecida: {metric}")
+        if max_latency_ms is None:
+            rows = self._query(f"SELECT * FROM experimentos WHERE {metric} IS NOT NULL "
+                               f"ORDER BY {metric} DESC LIMIT 1")
+        else:
+            rows = self._query(f"SELECT * FROM experimentos WHERE latencia_ms <= ? AND {metric} IS NOT NULL "
+                               f"ORDER BY {metric} DESC LIMIT 1", (max_latency_ms,))
+        return rows[0] if rows else None
+
+    def recent(self, limit=10):
+        return self._query("SELECT * FROM experimentos ORDER BY criado_em DESC LIMIT ?", (limit,))
+
+    def get(self, run_dir):
+        rows = self._query("SELECT * FROM experimentos WHERE run_dir = ?", (os.path.abspath(run_dir),))
+        return rows[0] if rows else None
+
+
+def describe(exp):
+    """Resumo de uma linha para listas de seleção."""
+    name = os.path.basename(exp["run_dir"])
+    parts = [name]
+    if exp.get("map5095") is not None:
+        parts.append(f"mAP50-95 {exp['map5095']:.3f}")
+    if exp.get("latencia_ms") is not None:
+        parts.append(f"{exp['latencia_ms']:.1f} ms/quadro")
+    if exp.get("modo"):
+        parts.append(exp["modo"])
+    return " | ".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consulta o registro de experimentos de treino.")
+    parser.add_argument("--max-ms", type=float, help="Latência máxima na CPU (ms por quadro)")
+    parser.add_argument("--limite", type=int, default=10, help="Quantos experimentos recentes listar")
+    args = parser.parse_args()
+    registry = ExperimentRegistry()
+    for exp in registry.recent(args.limite):
+        print(describe(exp))
+    best = registry.best(args.max_ms)
+    if best:
+        limit = f" com até {args.max_ms:g} ms/quadro" if args.max_ms is not None else ""
+        print(f"\nMelhor mAP50-95{limit}: {describe(best)}\n  {best['weights']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Pré-carregamento de imagens para a tela de rotulagem.
+
+Decodifica e reduz em segundo plano as próximas (e anteriores) N fotos da
+lista, guardando o resultado num cache LRU limitado. Para JPEG usa o modo
+draft do Pillow, que decodifica diretamente em 1/2, 1/4 ou 1/8 da resolução,
+evitando decodificar os 20 MP inteiros só para exibir no canvas.
+
+O PhotoImage continua sendo criado na thread do Tk (ImageTk não é seguro
+entre threads); aqui só se produz o PIL.Image já no tamanho de exibição.
+"""
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+PREFETCH_RADIUS = 3     # Quantas fotos à frente/atrás pré-carregar
+CACHE_SIZE = 16         # Máximo de imagens decodificadas no cache
+
+
+def decode_for_display(path, max_height=None):
+    """
+    Abre a imagem e retorna (imagem_de_exibição, (largura, altura) original).
+    Se max_height for informado e a imagem for mais alta, ela é reduzida
+    proporcionalmente para caber nessa altura.
+    """
+    img = Image.open(path)
+    original_size = img.size
+    w, h = original_size
+    if max_height and h > max_height:
+        scale = max_height / h
+        target = (max(1, int(w * scale)), max(1, int(h * scale)))
+        img.draft("RGB", target)        # Decodificação reduzida (só JPEG)
+        img = img.resize(target, Image.Resampling.LANCZOS)
+    else:
+        img.load()
+    return img, original_size
+
+
+class ImagePrefetcher:
+    """
+    Cache LRU de imagens prontas para exibição, alimentado por um pool de
+    threads. Chaves: (caminho, altura máxima).
+    """
+    def __init__(self, max_items=CACHE_SIZE, workers=2, radius=PREFETCH_RADIUS):
+        self.max_items = max_items
+        self.radius = radius
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self.cache = OrderedDict()      # chave -> (imagem, tamanho original)
+        self.pending = {}               # chave -> Future
+        self.lock = threading.Lock()
+
+    def _store(self, key, future):
+        try:
+            result = future.result()
+        except Exception:
+            result = None
+        with self.lock:
+            self.pending.pop(key, None)
+            if result is not None:
+                self.cache[key] = result
+                self.cache.move_to_end(key)
+                while len(self.cache) > self.max_items:
+                    self.cache.popitem(last=False)
+
+    def _schedule(self, path, max_height):
+        key = (path, max_height)
+        with self.lock:
+            if key in self.cache or key in self.pending:
+                return
+            future = self.executor.submit(decode_for_display, path, max_height)
+            self.pending[key] = future
+        future.add_done_callback(lambda f: self._store(key, f))
+
+    def get(self, path, max_height=None):
+        """
+        Retorna (imagem, tamanho original). Se a imagem já estiver no cache a
+        resposta é imediata; se estiver sendo decodificada, aguarda; senão
+        decodifica agora.
+        """
+        key = (path, max_height)
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+            future = self.pending.get(key)
+        if future is not None:
+            try:
+                return future.result()
+            except Exception:
+                pass
+        return decode_for_display(path, max_height)
+
+    def prefetch_around(self, paths, index, max_height=None):
+        """Agenda as próximas e as anteriores 'radius' fotos a partir de 'index'."""
+        for offset in range(1, self.radius + 1):
+            for i in (index + offset, index - offset):
+                if 0 <= i < len(paths):
+                    self._schedule(paths[i], max_height)
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
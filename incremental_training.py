@@ -0,0 +1,105 @@
+"""
+Treino incremental (ajuste fino) a partir do best.pt anterior.
+
+Depois de rotular algumas fotos novas não é preciso treinar do zero
+(yolov8n.pt, 150 épocas). No modo incremental:
+- os pesos de partida são o best.pt do último experimento;
+- o treino usa as imagens novas (ou com rótulo alterado) desde aquele
+  experimento mais uma amostra de reprodução ("replay") das antigas, para
+  o modelo não esquecer o que já sabia; validação e teste continuam
+  completos;
+- a parada antecipada (patience) encerra o treino quando o mAP estabiliza.
+
+Cada experimento guarda em <run>/treino.json os rótulos usados, o modo e
+o tempo gasto, o que permite saber o que é novo no próximo treino e
+estimar quanto tempo um treino completo levaria.
+"""
+import os
+import json
+import random
+import hashlib
+
+from dataset_builder import split_image_paths, write_data_yaml
+
+META_NAME = "treino.json"
+REPLAY_FACTOR = 3           # Imagens antigas reproduzidas por imagem nova
+REPLAY_MIN = 50             # Mínimo de imagens antigas na reprodução
+INCREMENTAL_PATIENCE = 10   # Épocas sem melhora antes de parar
+TRAIN_LIST_NAME = "train_incremental.txt"
+DATA_YAML_NAME = "data_incremental.yaml"
+
+
+def label_hashes(annotations):
+    """<nome_base> -> SHA-1 do conteúdo do TXT YOLO."""
+    return {b: hashlib.sha1(c.encode("utf-8")).hexdigest() for b, c in annotations.items()}
+
+
+def run_dir_of(weights_path):
+    """runs/detect/trainN/weights/best.pt -> runs/detect/trainN"""
+    return os.path.dirname(os.path.dirname(os.path.abspath(weights_path)))
+
+
+def load_run_meta(run_dir):
+    path = os.path.join(run_dir, META_NAME)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def save_run_meta(run_dir, meta):
+    path = os.path.join(run_dir, META_NAME)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=1)
+
+
+def plan_incremental(annotations, train_bases, previous_labels, seed=0):
+    """
+    Separa as imagens de treino em novas (sem registro no experimento
+    anterior ou com rótulo alterado) e a amostra de reprodução das antigas.
+    Retorna (novas, reprodução), listas de nomes base.
+    """
+    current = label_hashes({b: annotations[b] for b in train_bases})
+    new = sorted(b for b, h in current.items() if previous_labels.get(b) != h)
+    old = sorted(b for b in current if b not in set(new))
+    k = min(len(old), max(REPLAY_MIN, REPLAY_FACTOR * len(new)))
+    replay = random.Random(seed).sample(old, k)
+    return new, replay
+
+
+def prepare_incremental(annotations, output_dir, dirs, classes, previous_meta):
+    """
+    Grava a lista de imagens de treino (novas + reprodução) e o
+    data_incremental.yaml. Retorna (caminho do yaml, novas, reprodução),
+    ou None se não houver nada novo para treinar.
+    """
+    images = split_image_paths(output_dir)
+    train_bases = [b for b, (split, _) in images.items() if split == "train" and b in annotations]
+    new, replay = plan_incremental(annotations, train_bases, previous_meta.get("rotulos", {}))
+    if not new:
+        return None
+    list_path = os.path.join(output_dir, TRAIN_LIST_NAME)
+    with open(list_path, "w", encoding="utf-8") as f:
+        for b in new + replay:
+            f.write(images[b][1] + "\n")
+    data_yaml = write_data_yaml(output_dir, dirs, classes, train=list_path, name=DATA_YAML_NAME)
+    return data_yaml, new, replay
+
+
+def seconds_per_epoch_image(meta):
+    """Custo de referência de um treino completo (herdado pelos incrementais)."""
+    if not meta:
+        return None
+    if meta.get("modo") == "completo" and meta.get("epocas") and meta.get("imagens_treino"):
+        return meta["tempo_treino"] / (meta["epocas"] * meta["imagens_treino"])
+    return meta.get("segundos_por_epoca_imagem")
+
+
+def estimate_full_retrain(reference, train_images, epochs):
+    """Tempo estimado (s) de um treino completo com o dataset atual."""
+    if not reference:
+        return None
+    return reference * train_images * epochs
@@ -0,0 +1,237 @@
+"""
+Backends de inferência para os pesos treinados.
+
+Todos expõem a mesma interface usada em detect_objects e no vídeo teste:
+    backend.detect(frame_bgr) -> [Detection(x1, y1, x2, y2, cls, conf), ...]
+    backend.detect_batch([frame_bgr, ...]) -> uma lista de detecções por quadro
+com coordenadas em pixels do quadro original.
+
+- OnnxBackend: roda o modelo exportado (.onnx) no ONNX Runtime, na CPU,
+  com o número de threads configurado. Não importa torch nem ultralytics.
+- UltralyticsBackend: caminho PyTorch original (YOLO.predict).
+
+load_backend(caminho) escolhe o ONNX quando existe um .onnx ao lado do .pt
+(best.onnx, gerado por export_onnx ao fim do treino) e o onnxruntime está
+instalado; caso contrário usa o ultralytics. Se houver um best.int8.onnx
+aprovado (quantization.py), ele tem preferência sobre o FP32.
+
+Verificação de paridade (caixas e classes) e comparação de velocidade:
+    python inference_backend.py best.pt --clipe video.mp4 [--quadros 100]
+"""
+import os
+import ast
+import sys
+import time
+import argparse
+from collections import namedtuple
+
+Detection = namedtuple("Detection", "x1 y1 x2 y2 cls conf")
+
+DEFAULT_BACKEND = os.environ.get("TDC_BACKEND", "onnx")  # "onnx" ou "torch"
+CONF_THRESHOLD = 0.25       # Mesmos limiares padrão do YOLO.predict
+IOU_THRESHOLD = 0.7
+PARITY_IOU = 0.9            # IoU mínimo para duas caixas serem "a mesma"
+PARITY_MIN_MATCH = 0.98     # Fração mínima de caixas pareadas para aprovar a paridade
+
+
+def onnx_path_for(weights_path):
+    return os.path.splitext(weights_path)[0] + ".onnx"
+
+
+def export_onnx(weights_path, imgsz=640):
+    """Exporta o .pt para .onnx (ao lado dele). Reaproveita o .onnx se já for mais novo que o .pt."""
+    target = onnx_path_for(weights_path)
+    if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(weights_path):
+        return target
+    from ultralytics import YOLO
+    return YOLO(weights_path).export(format="onnx", imgsz=imgsz, dynamic=False, simplify=True)
+
+
+class UltralyticsBackend:
+    """Caminho PyTorch (ultralytics.YOLO)."""
+    name = "torch"
+
+    def __init__(self, weights_path):
+        from ultralytics import YOLO
+        self.model = YOLO(weights_path)
+        self.names = self.model.names
+
+    def detect(self, frame):
+        return self.detect_batch([frame])[0]
+
+    def detect_batch(self, frames):
+        """Uma única chamada ao predict para todos os quadros (várias câmeras)."""
+        batch = []
+        for r in self.model.predict(list(frames), verbose=False):
+            batch.append([Detection(x1, y1, x2, y2, int(cls), conf) for (x1, y1, x2, y2), cls, conf
+                          in zip(r.boxes.xyxy.tolist(), r.boxes.cls.tolist(), r.boxes.conf.tolist())])
+        return batch
+
+
+class OnnxBackend:
+    """YOLOv8 exportado em ONNX rodando no ONNX Runtime (CPU)."""
+    name = "onnx"
+
+    def __init__(self, onnx_path, threads=None, conf=CONF_THRESHOLD, iou=IOU_THRESHOLD):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads or os.cpu_count() or 1
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(onnx_path, sess_options=options, providers=["CPUExecutionProvider"])
+        inp = self.session.get_inputs()[0]
+        self.input_name = inp.name
+        self.imgsz = (int(inp.shape[2]), int(inp.shape[3]))
+        self.dynamic_batch = not isinstance(inp.shape[0], int)  # Exportado com dynamic=True
+        meta = self.session.get_modelmeta().custom_metadata_map
+        self.names = ast.literal_eval(meta["names"]) if "names" in meta else {}
+        self.conf = conf
+        self.iou = iou
+
+    def _letterbox(self, frame):
+        """Redimensiona mantendo a proporção e completa com cinza (114), como o ultralytics."""
+        import cv2
+        import numpy as np
+        h, w = frame.shape[:2]
+        th, tw = self.imgsz
+        r = min(th / h, tw / w)
+        nw, nh = int(round(w * r)), int(round(h * r))
+        pad_x, pad_y = (tw - nw) / 2, (th - nh) / 2
+        resized = cv2.resize(frame, (nw, nh), interpolation=cv2.INTER_LINEAR) if (nw, nh) != (w, h) else frame
+        top, left = int(round(pad_y - 0.1)), int(round(pad_x - 0.1))
+        canvas = np.full((th, tw, 3), 114, dtype=np.uint8)
+        canvas[top:top + nh, left:left + nw] = resized
+        blob = canvas[:, :, ::-1].transpose(2, 0, 1)[None].astype(np.float32) / 255.0
+        return np.ascontiguousarray(blob), r, left, top
+
+    def detect(self, frame):
+        blob, r, left, top = self._letterbox(frame)
+        pred = self.session.run(None, {self.input_name: blob})[0][0]
+        return self._postprocess(pred, frame, r, left, top)
+
+    def detect_batch(self, frames):
+        """Lote numa só execução se o modelo aceitar lote dinâmico; senão, quadro a quadro."""
+        if not self.dynamic_batch or len(frames) == 1:
+            return [self.detect(frame) for frame in frames]
+        import numpy as np
+        prepared = [self._letterbox(frame) for frame in frames]
+        preds = self.session.run(None, {self.input_name: np.concatenate([p[0] for p in prepared])})[0]
+        return [self._postprocess(pred, frame, r, left, top)
+                for pred, frame, (_, r, left, top) in zip(preds, frames, prepared)]
+
+    def _postprocess(self, pred, frame, r, left, top):
+        import cv2
+        import numpy as np
+        pred = pred.T   # (N, 4 + nc)
+        scores = pred[:, 4:]
+        cls = scores.argmax(axis=1)
+        conf = scores[np.arange(len(cls)), cls]
+        keep = conf > self.conf
+        if not keep.any():
+            return []
+        boxes, cls, conf = pred[keep, :4], cls[keep], conf[keep]
+        # xywh (centro) -> xywh (canto) para o NMS por classe do OpenCV
+        xywh = np.column_stack((boxes[:, 0] - boxes[:, 2] / 2, boxes[:, 1] - boxes[:, 3] / 2,
+                                boxes[:, 2], boxes[:, 3]))
+        idx = cv2.dnn.NMSBoxesBatched(xywh.tolist(), conf.tolist(), cls.tolist(), self.conf, self.iou)
+        h, w = frame.shape[:2]
+        out = []
+        for i in np.array(idx).reshape(-1):
+            x, y, bw, bh = xywh[i]
+            x1 = min(max((x - left) / r, 0), w)
+            y1 = min(max((y - top) / r, 0), h)
+            x2 = min(max((x + bw - left) / r, 0), w)
+            y2 = min(max((y + bh - top) / r, 0), h)
+            out.append(Detection(float(x1), float(y1), float(x2), float(y2), int(cls[i]), float(conf[i])))
+        out.sort(key=lambda d: -d.conf)
+        return out
+
+
+def load_backend(weights_path, prefer=DEFAULT_BACKEND, threads=None):
+    """Backend para os pesos: ONNX se disponível (ou se o caminho já for .onnx), senão PyTorch."""
+    if weights_path.endswith(".onnx"):
+        return OnnxBackend(weights_path, threads=threads)
+    onnx_path = onnx_path_for(weights_path)
+    if prefer == "onnx" and os.path.exists(onnx_path) and os.path.getmtime(onnx_path) >= os.path.getmtime(weights_path):
+        from quantization import int8_path_for, int8_approved
+        try:
+            if int8_approved(weights_path):
+                backend = OnnxBackend(int8_path_for(weights_path), threads=threads)
+                backend.name = "onnx-int8"
+                return backend
+            return OnnxBackend(onnx_path, threads=threads)
+        except ImportError:
+            print("onnxruntime não instalado; usando o backend PyTorch.")
+    return UltralyticsBackend(weights_path)
+
+
+# ========================================================
+# Paridade e velocidade (linha de comando)
+# ========================================================
+def _iou(a, b):
+    ix = max(0.0, min(a.x2, b.x2) - max(a.x1, b.x1))
+    iy = max(0.0, min(a.y2, b.y2) - max(a.y1, b.y1))
+    inter = ix * iy
+    union = (a.x2 - a.x1) * (a.y2 - a.y1) + (b.x2 - b.x1) * (b.y2 - b.y1) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def compare_detections(ref, other):
+    """(pareadas, total, maior diferença de confiança): mesma classe e IoU >= PARITY_IOU."""
+    remaining = list(other)
+    matched, max_conf_diff = 0, 0.0
+    for d in ref:
+        best = max((o for o in remaining if o.cls == d.cls), key=lambda o: _iou(d, o), default=None)
+        if best is not None and _iou(d, best) >= PARITY_IOU:
+            remaining.remove(best)
+            matched += 1
+            max_conf_diff = max(max_conf_diff, abs(d.conf - best.conf))
+    return matched, max(len(ref), len(other)), max_conf_diff
+
+
+def _timed(backend, frames):
+    for frame in frames[:5]:
+        backend.detect(frame)
+    times, outputs = [], []
+    for frame in frames:
+        t0 = time.perf_counter()
+        outputs.append(backend.detect(frame))
+        times.append((time.perf_counter() - t0) * 1000)
+    times.sort()
+    return outputs, times[len(times) // 2], sum(times) / len(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta para ONNX e compara com o PyTorch (paridade e velocidade)")
+    parser.add_argument("pesos", help="best.pt")
+    parser.add_argument("--clipe", action="append", default=[], help="Vídeo com quadros de teste (repetível)")
+    parser.add_argument("--quadros", type=int, default=100)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--threads", type=int, help="Threads do ONNX Runtime")
+    args = parser.parse_args()
+
+    from sweep import load_clip_frames
+    onnx_path = export_onnx(args.pesos, args.imgsz)
+    frames = load_clip_frames(args.clipe, args.quadros)
+    if not frames:
+        sys.exit("Informe ao menos um --clipe com quadros legíveis.")
+    ref, torch_p50, torch_mean = _timed(UltralyticsBackend(args.pesos), frames)
+    out, onnx_p50, onnx_mean = _timed(OnnxBackend(onnx_path, threads=args.threads), frames)
+
+    matched = total = 0
+    max_conf_diff = 0.0
+    for a, b in zip(ref, out):
+        m, t, c = compare_detections(a, b)
+        matched, total, max_conf_diff = matched + m, total + t, max(max_conf_diff, c)
+    rate = matched / total if total else 1.0
+    print(f"Paridade: {matched}/{total} caixas pareadas ({rate:.1%}), "
+          f"maior diferença de confiança {max_conf_diff:.3f}")
+    print(f"PyTorch: {torch_p50:.1f} ms (mediana), {torch_mean:.1f} ms (média)")
+    print(f"ONNX:    {onnx_p50:.1f} ms (mediana), {onnx_mean:.1f} ms (média)  "
+          f"-> {torch_p50 / onnx_p50:.2f}x")
+    sys.exit(0 if rate >= PARITY_MIN_MATCH else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,27 @@
 import os
-import shutil
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 from PIL import Image, ImageTk
 import threading
 import webbrowser
 import datetime
-from ultralytics import YOLO
 import subprocess
-from pymongo import MongoClient
+from image_prefetch import ImagePrefetcher
+from thumbnail_browser import ThumbnailBrowser, scan_photo_dir
+from annotation_store import AnnotationStore
+from dataset_builder import build_dataset, write_data_yaml, split_image_paths, manifest_hash
+from prelabel import run_prelabel
+from active_learning import ActiveLearningQueue
+from dedup import group_photos, cluster_ids, collapse
+from training_monitor import TrainingMonitor
+from val_cache import cached_validation
+from train_process import BASE_MODEL
+from experiment_registry import ExperimentRegistry, LATENCY_BUDGET_MS, describe
+from model_manager import MODELS
+from startup import StartupLoader, import_heavy, connect_mongo
+from promotion import PROMOTED_WEIGHTS, load_promoted, benchmark_clips, evaluate_and_promote
+from incremental_training import (INCREMENTAL_PATIENCE, label_hashes, run_dir_of, load_run_meta, save_run_meta,
+                                  prepare_incremental, seconds_per_epoch_image, estimate_full_retrain)
 
 # Define o período de validade da versão beta
 BETA_DURATION = datetime.timedelta(days=3)
@@ -19,14 +32,11 @@ class LabelingApp(tk.Tk):
         self.title("Aplicação de Rotulação de Imagens - Vega Robotics")
         self.geometry("1000x700")
 
-        # Conexão com o MongoDB (ajuste a URI conforme necessário)
-        try:
-            self.mongo_client = MongoClient("mongodb://localhost:27017")
-            self.db = self.mongo_client["monitoramento"]  # Nome do banco
-            self.collection = self.db["deteccoes"]          # Nome da coleção
-        except Exception as e:
-            messagebox.showerror("Erro MongoDB", f"Não foi possível conectar ao MongoDB: {e}")
-            self.mongo_client = None
+        # Conexão com o MongoDB: feita em segundo plano (start_background_loading), com a janela já aberta
+        self.mongo_client = None
+        self.db = None
+        self.collection = None
+        self.startup_var = tk.StringVar(value="")   # Andamento da inicialização (rodapé)
 
         # Variáveis de configuração
         self.photo_dir = None           # Diretório das fotos (input)
@@ -40,30 +50,57 @@ class LabelingApp(tk.Tk):
         self.current_image = None       # Objeto PIL.Image
         self.photo_image = None         # Para exibição no Canvas
         self.img_width = self.img_height = 0
+        self.display_offset = (0, 0)    # Deslocamento da imagem no canvas (imagens menores que o canvas)
+        self.proposal_annotations = []  # Anotações vindas da pré-rotulagem (exibidas em amarelo)
+        self.prefetcher = ImagePrefetcher()  # Decodifica as próximas fotos em segundo plano
 
         # Armazenamento interno das anotações (para rotulagem)
         self.labeled_annotations = {}   # Mapeia <nome_base> -> conteúdo do TXT YOLO
         self.labeled_image_paths = []   # Lista dos caminhos das imagens rotuladas
+        self.annotation_store = None    # Diário em disco das anotações (retoma a sessão)
+        self.al_queue = None            # Notas de incerteza para ordenar a rotulagem
+        self.ranking_active = False     # Rotulagem na ordem de incerteza (aprendizado ativo)
 
         # Variáveis para desenho (bounding box)
         self.drawing = False
         self.start_x = self.start_y = 0
         self.current_rect = None
 
-        # Caminho do modelo treinado (best.pt) para uso futuro
-        self.best_model_path = None
+        # Caminho do modelo treinado (best.pt) em uso: começa pelo modelo promovido, se houver
+        self.best_model_path = self.promoted_model_path()
+        self.training_context = {}      # Modo e rótulos do treino em andamento (gravados em treino.json)
+        self.registry = ExperimentRegistry()  # Experimentos concluídos (diretório, métricas, latência)
 
         # Arquivo data.yaml gerado durante o treinamento (usado na validação)
         self.data_yaml_path = None
 
         # Tela inicial
         self.create_config_frame()
+        self.start_background_loading()
+
+    def start_background_loading(self):
+        """Bibliotecas pesadas, MongoDB e modelo promovido carregam em paralelo, sem atrasar a janela."""
+        loader = StartupLoader(lambda text: self.after(0, lambda: self.startup_var.set(text)))
+        loader.add("bibliotecas", import_heavy)
+        loader.add("MongoDB", connect_mongo, self.mongo_connected)
+        if self.best_model_path:
+            model_path = self.best_model_path
+            loader.add("modelo", lambda: MODELS.get(model_path))
+
+    def mongo_connected(self, client, error):
+        if error is not None:
+            print(f"Não foi possível conectar ao MongoDB: {error}")
+            return
+        self.db = client["monitoramento"]           # Nome do banco
+        self.collection = self.db["deteccoes"]      # Nome da coleção
+        self.mongo_client = client
 
     def add_footer(self, parent):
         """Adiciona um rodapé com o nome da empresa e informações do autor."""
         footer = tk.Frame(parent, bd=1, relief="sunken")
         footer.pack(side=tk.BOTTOM, fill=tk.X)
         tk.Label(footer, text="Vega Robotics", font=("Helvetica", 9)).pack(side=tk.LEFT, padx=5)
+        tk.Label(footer, textvariable=self.startup_var, font=("Helvetica", 9), fg="gray").pack(side=tk.LEFT, padx=10)
         autor = tk.Label(footer, text="saber mais sobre autor: Rafael Maciel", fg="blue", cursor="hand2", font=("Helvetica", 9, "italic"))
         autor.pack(side=tk.RIGHT, padx=5)
         autor.bind("<Button-1>", lambda e: webbrowser.open("https://www.linkedin.com/in/rafael-s-maciel/"))
@@ -161,13 +198,38 @@ class LabelingApp(tk.Tk):
         if len(self.classes) == 0:
             messagebox.showerror("Erro", "Nenhuma classe válida foi inserida.")
             return
-        valid_ext = ('.jpg', '.jpeg', '.png', '.bmp')
-        self.photo_list = [os.path.join(self.photo_dir, f) for f in os.listdir(self.photo_dir) if f.lower().endswith(valid_ext)]
+        self.photo_list = [path for path, _, _ in scan_photo_dir(self.photo_dir)]
         if not self.photo_list:
             messagebox.showerror("Erro", "Nenhuma imagem encontrada no diretório selecionado.")
             return
         if len(self.photo_list) < 3:
             messagebox.showwarning("Aviso", "Poucas imagens para treinamento. Recomenda-se pelo menos 3 para uma divisão mínima.")
+        # Retoma a sessão anterior desta pasta a partir do diário de anotações
+        if self.annotation_store:
+            self.annotation_store.close()
+        self.annotation_store = AnnotationStore(self.photo_dir)
+        if not self.annotation_store.compatible_classes(self.classes):
+            stored = self.annotation_store.classes
+            if not messagebox.askyesno(
+                    "Classes diferentes",
+                    f"As anotações desta pasta usam as classes: {', '.join(stored)}.\n"
+                    f"Informadas agora: {', '.join(self.classes)}.\n\n"
+                    "As caixas salvas guardam o índice da classe; trocar a lista mudaria o rótulo de todas.\n"
+                    "Continuar com as classes do diário?"):
+                self.annotation_store.close()
+                self.annotation_store = None
+                return
+            self.classes = list(stored)
+        self.annotation_store.start_session(self.classes)
+        self.al_queue = ActiveLearningQueue(self.annotation_store)
+        self.ranking_active = False
+        self.labeled_annotations = self.annotation_store.labeled_annotations()
+        self.labeled_image_paths = self.annotation_store.labeled_image_paths()
+        if self.labeled_annotations:
+            self.current_index = next((i for i, p in enumerate(self.photo_list)
+                                       if not self.annotation_store.is_labeled(p)), 0)
+            messagebox.showinfo("Sessão retomada", f"{len(self.labeled_annotations)} fotos já rotuladas nesta pasta. "
+                                                   "Continuando pela próxima não rotulada.")
         self.config_frame.destroy()
         self.create_labeling_frame()
         self.load_next_photo()
@@ -190,11 +252,18 @@ class LabelingApp(tk.Tk):
         self.canvas.bind("<ButtonPress-1>", self.on_button_press)
         self.canvas.bind("<B1-Motion>", self.on_move_press)
         self.canvas.bind("<ButtonRelease-1>", self.on_button_release)
+        self.canvas.bind("<ButtonPress-3>", self.on_right_click)  # Remove uma caixa (ex.: proposta errada)
         control_frame = tk.Frame(self.label_frame)
         control_frame.pack(pady=5)
         tk.Button(control_frame, text="Salvar e Próxima Foto", command=self.save_and_next).pack(side=tk.LEFT, padx=5)
+        tk.Button(control_frame, text="Miniaturas", command=self.open_thumbnail_browser).pack(side=tk.LEFT, padx=5)
+        tk.Button(control_frame, text="Pré-rotular com Modelo", command=self.start_prelabel).pack(side=tk.LEFT, padx=5)
+        tk.Button(control_frame, text="Ordenar por Incerteza", command=self.start_ranking).pack(side=tk.LEFT, padx=5)
+        tk.Button(control_frame, text="Ocultar Duplicadas", command=self.start_dedup).pack(side=tk.LEFT, padx=5)
         tk.Button(control_frame, text="Treinar Modelo", command=self.open_train_config_window).pack(side=tk.LEFT, padx=5)
         tk.Button(control_frame, text="Voltar ao Menu Inicial", command=self.return_to_main_menu).pack(side=tk.LEFT, padx=5)
+        self.prelabel_status = tk.Label(control_frame, text="")
+        self.prelabel_status.pack(side=tk.LEFT, padx=5)
         self.add_footer(self.label_frame)
 
     def load_next_photo(self):
@@ -204,8 +273,10 @@ class LabelingApp(tk.Tk):
         photo_path = self.photo_list[self.current_index]
         self.current_index += 1
         self.annotations = []  # Reseta as anotações para a foto atual
-        self.current_image = Image.open(photo_path)
-        self.img_width, self.img_height = self.current_image.size
+        # Nesta tela a imagem é exibida em resolução original (as caixas usam coordenadas da imagem),
+        # então o pré-carregamento só antecipa a decodificação completa
+        self.current_image, (self.img_width, self.img_height) = self.prefetcher.get(photo_path)
+        self.prefetcher.prefetch_around(self.photo_list, self.current_index - 1)
         canvas_width, canvas_height = 800, 600
         region_width = max(self.img_width, canvas_width)
         region_height = max(self.img_height, canvas_height)
@@ -215,6 +286,48 @@ class LabelingApp(tk.Tk):
         self.photo_image = ImageTk.PhotoImage(self.current_image)
         self.canvas.delete("all")
         self.canvas.create_image(offset_x, offset_y, image=self.photo_image, anchor=tk.NW)
+        self.display_offset = (offset_x, offset_y)
+        self.load_proposals(photo_path)
+
+    def load_proposals(self, photo_path):
+        """Desenha as caixas propostas pela pré-rotulagem e as adiciona às anotações da foto."""
+        self.proposal_annotations = []
+        if not self.annotation_store:
+            return
+        ox, oy = self.display_offset
+        for cls_id, xc, yc, bw, bh, conf in self.annotation_store.get_proposals(photo_path):
+            if not 0 <= cls_id < len(self.classes):
+                continue
+            box_w = bw * self.img_width
+            box_h = bh * self.img_height
+            x = xc * self.img_width - box_w / 2 + ox
+            y = yc * self.img_height - box_h / 2 + oy
+            annotation = (x, y, box_w, box_h, self.classes[cls_id])
+            self.annotations.append(annotation)
+            self.proposal_annotations.append(annotation)
+        self.redraw_annotations()
+
+    def redraw_annotations(self):
+        """Redesenha as caixas da foto atual (propostas em amarelo, manuais em verde)."""
+        self.canvas.delete("box")
+        for annotation in self.annotations:
+            x, y, box_w, box_h, classe = annotation
+            color = "yellow" if annotation in self.proposal_annotations else "green"
+            self.canvas.create_rectangle(x, y, x + box_w, y + box_h, outline=color, width=2, tags="box")
+            self.canvas.create_text(x + 3, y + 3, text=classe, anchor=tk.NW, fill=color, tags="box")
+
+    def on_right_click(self, event):
+        """Remove a menor caixa que contém o ponto clicado."""
+        cx = self.canvas.canvasx(event.x)
+        cy = self.canvas.canvasy(event.y)
+        hits = [a for a in self.annotations if a[0] <= cx <= a[0] + a[2] and a[1] <= cy <= a[1] + a[3]]
+        if not hits:
+            return
+        annotation = min(hits, key=lambda a: a[2] * a[3])
+        self.annotations.remove(annotation)
+        if annotation in self.proposal_annotations:
+            self.proposal_annotations.remove(annotation)
+        self.redraw_annotations()
 
     def on_button_press(self, event):
         self.drawing = True
@@ -242,7 +355,7 @@ class LabelingApp(tk.Tk):
             messagebox.showinfo("Aviso", "Caixa muito pequena, descartada.")
             return
         self.canvas.delete(self.current_rect)
-        self.canvas.create_rectangle(x1, y1, x2, y2, outline="green", width=2)
+        self.canvas.create_rectangle(x1, y1, x2, y2, outline="green", width=2, tags="box")
         self.open_class_selector(x1, y1, x2, y2)
 
     def open_class_selector(self, x1, y1, x2, y2):
@@ -273,20 +386,129 @@ class LabelingApp(tk.Tk):
         current_photo_path = self.photo_list[self.current_index - 1]
         base_name = os.path.splitext(os.path.basename(current_photo_path))[0]
         w, h = self.img_width, self.img_height
+        ox, oy = self.display_offset
         content = ""
         for (x, y, box_w, box_h, classe) in self.annotations:
-            x_center = (x + box_w / 2) / w
-            y_center = (y + box_h / 2) / h
+            # Desconta o deslocamento de centralização da imagem no canvas
+            x_center = (x - ox + box_w / 2) / w
+            y_center = (y - oy + box_h / 2) / h
             width_norm = box_w / w
             height_norm = box_h / h
             class_id = self.classes.index(classe) if classe in self.classes else 0
             content += f"{class_id} {x_center:.6f} {y_center:.6f} {width_norm:.6f} {height_norm:.6f}\n"
+        self.annotation_store.save(current_photo_path, content)
         self.labeled_annotations[base_name] = content
         self.labeled_image_paths.append(current_photo_path)
-        messagebox.showinfo("Salvo", f"Anotações para {base_name} salvas internamente.")
+        messagebox.showinfo("Salvo", f"Anotações para {base_name} salvas.")
 
     def save_and_next(self):
         self.save_annotation()
+        if self.ranking_active:
+            self.apply_ranking()  # O novo rótulo rebaixa os quadros vizinhos na fila
+        self.load_next_photo()
+
+    def is_photo_labeled(self, photo_path):
+        """Indica se a foto já tem anotações salvas."""
+        return self.annotation_store.is_labeled(photo_path)
+
+    def start_prelabel(self):
+        """Dispara a pré-rotulagem em lote das fotos não rotuladas com o modelo treinado."""
+        model_path = self.best_model_path or self.test_model_path
+        if not model_path or not os.path.exists(model_path):
+            messagebox.showerror("Erro", "Nenhum modelo treinado (best.pt) disponível para pré-rotular.")
+            return
+        self.prelabel_status.config(text="Pré-rotulagem iniciada...")
+        threading.Thread(target=self.prelabel_thread, args=(model_path,), daemon=True).start()
+
+    def prelabel_thread(self, model_path):
+        def progress(done, total):
+            self.after(0, lambda: self.prelabel_status.config(text=f"Pré-rotulagem: {done}/{total}"))
+        try:
+            total = run_prelabel(model_path, self.photo_list, self.annotation_store, progress_callback=progress)
+            self.after(0, lambda: self.prelabel_status.config(text=f"Pré-rotulagem concluída ({total} fotos)."))
+            self.after(0, self.refresh_current_proposals)
+        except Exception as e:
+            msg = str(e)
+            self.after(0, lambda: messagebox.showerror("Erro na Pré-rotulagem", msg))
+
+    def start_ranking(self):
+        """Pontua as fotos não rotuladas com o modelo atual e passa a rotular pela ordem de incerteza."""
+        model_path = self.best_model_path or self.test_model_path
+        if not model_path or not os.path.exists(model_path):
+            messagebox.showerror("Erro", "Nenhum modelo treinado (best.pt) disponível para ordenar a fila.")
+            return
+        self.ranking_active = True
+        self.apply_ranking()  # Notas de uma sessão anterior já valem enquanto a pontuação roda
+        self.prelabel_status.config(text="Pontuando incerteza...")
+        threading.Thread(target=self.ranking_thread, args=(model_path,), daemon=True).start()
+
+    def ranking_thread(self, model_path):
+        def progress(done, total):
+            self.after(0, lambda: self.prelabel_status.config(text=f"Incerteza: {done}/{total}"))
+            self.after(0, self.apply_ranking)
+        try:
+            total = self.al_queue.score(model_path, self.photo_list, progress_callback=progress)
+            self.after(0, lambda: self.prelabel_status.config(text=f"Fila ordenada por incerteza ({total} fotos pontuadas)."))
+            self.after(0, self.apply_ranking)
+        except Exception as e:
+            msg = str(e)
+            self.after(0, lambda: messagebox.showerror("Erro na Ordenação", msg))
+
+    def apply_ranking(self):
+        """Reordena as fotos ainda não vistas da lista pela fila de incerteza."""
+        head = self.photo_list[:self.current_index]
+        seen = set(head)
+        ranked = [p for p in self.al_queue.ranked(self.photo_list) if p not in seen]
+        seen.update(ranked)
+        self.photo_list = head + ranked + [p for p in self.photo_list if p not in seen]
+
+    def start_dedup(self):
+        """Agrupa as fotos quase iguais (rajadas) e deixa só um representante de cada grupo na fila."""
+        self.prelabel_status.config(text="Procurando duplicadas...")
+        threading.Thread(target=self.dedup_thread, args=(list(self.photo_list),), daemon=True).start()
+
+    def dedup_thread(self, photo_paths):
+        def progress(done, total):
+            self.after(0, lambda: self.prelabel_status.config(text=f"Hashes: {done}/{total}"))
+        try:
+            clusters = group_photos(photo_paths, progress_callback=progress)
+            self.after(0, lambda: self.apply_dedup(clusters))
+        except Exception as e:
+            msg = str(e)
+            self.after(0, lambda: messagebox.showerror("Erro nas Duplicadas", msg))
+
+    def apply_dedup(self, clusters):
+        """Remove da parte ainda não vista da lista as duplicatas não rotuladas."""
+        head = self.photo_list[:self.current_index]
+        tail = collapse(self.photo_list[self.current_index:], clusters, keep=self.labeled_image_paths)
+        removed = len(self.photo_list) - len(head) - len(tail)
+        self.photo_list = head + tail
+        self.prelabel_status.config(text=f"{len(clusters)} grupos de quase duplicadas; {removed} fotos ocultadas.")
+
+    def duplicate_groups(self):
+        """<nome_base> -> grupo de quase duplicadas das fotos rotuladas (para o split do dataset)."""
+        try:
+            clusters = group_photos(self.labeled_image_paths)
+        except Exception as e:
+            print("Não foi possível agrupar as fotos quase duplicadas:", e)
+            return None
+        base = lambda p: os.path.splitext(os.path.basename(p))[0]
+        return {base(p): base(g) for p, g in cluster_ids(clusters).items()}
+
+    def refresh_current_proposals(self):
+        """Exibe as propostas na foto aberta, se ela ainda não tiver caixas."""
+        if self.current_index > 0 and not self.annotations:
+            self.load_proposals(self.photo_list[self.current_index - 1])
+
+    def open_thumbnail_browser(self):
+        """Abre a grade de miniaturas da pasta para navegar direto até uma foto."""
+        ThumbnailBrowser(self, self.photo_dir, on_select=self.jump_to_photo, is_labeled=self.is_photo_labeled)
+
+    def jump_to_photo(self, photo_path):
+        """Carrega no canvas a foto escolhida no navegador de miniaturas."""
+        if photo_path not in self.photo_list:
+            self.photo_list.append(photo_path)
+        self.current_index = self.photo_list.index(photo_path)
         self.load_next_photo()
 
     def return_to_main_menu(self):
@@ -315,6 +537,9 @@ class LabelingApp(tk.Tk):
         self.workers_entry = tk.Entry(self.train_win, width=10)
         self.workers_entry.insert(0, "2")
         self.workers_entry.pack(pady=5)
+        self.incremental_var = tk.BooleanVar(value=self.previous_training_run() is not None)
+        tk.Checkbutton(self.train_win, text="Incremental (a partir do último best.pt)",
+                       variable=self.incremental_var).pack(pady=5)
         self.train_status_label = tk.Label(self.train_win, text="Aguardando início do treinamento...")
         self.train_status_label.pack(pady=5)
         tk.Button(self.train_win, text="Iniciar Treinamento", command=self.start_training).pack(pady=10)
@@ -333,72 +558,131 @@ class LabelingApp(tk.Tk):
         if not self.labeled_annotations:
             messagebox.showerror("Erro", "Nenhuma imagem rotulada para treinar.")
             return
-        self.train_status_label.config(text="Treinamento em andamento...")
+        self.train_status_label.config(text="Preparando o dataset...")
         self.progress.start(10)
         self.train_win.update_idletasks()
-        t = threading.Thread(target=self.train_model, args=(self.train_epochs, self.train_imgsz, self.train_workers))
+        t = threading.Thread(target=self.train_model, args=(self.train_epochs, self.train_imgsz, self.train_workers,
+                                                            self.incremental_var.get()), daemon=True)
         t.start()
 
     # -----------------------------------------
     # 4) Treinamento e Exibição dos Gráficos
     # -----------------------------------------
-    def train_model(self, epochs, imgsz, workers):
+    def train_model(self, epochs, imgsz, workers, incremental=False):
         all_images = list(self.labeled_annotations.keys())
         total = len(all_images)
         if total == 0:
             self.after(0, lambda: messagebox.showerror("Erro", "Nenhuma imagem rotulada para treinamento."))
             return
-        n_train = total // 3
-        n_val = total // 3
-        n_test = total - n_train - n_val
-        train_imgs = all_images[:n_train]
-        val_imgs = all_images[n_train:n_train+n_val]
-        test_imgs = all_images[n_train+n_val:]
+        # Materializa output/train|val|test de forma incremental (links + manifesto)
         output_dir = os.path.join(os.getcwd(), "output")
-        train_dir = os.path.join(output_dir, "train")
-        val_dir = os.path.join(output_dir, "val")
-        test_dir = os.path.join(output_dir, "test")
-        os.makedirs(train_dir, exist_ok=True)
-        os.makedirs(val_dir, exist_ok=True)
-        os.makedirs(test_dir, exist_ok=True)
-        def process_set(image_set, target_dir):
-            for base_name in image_set:
-                for path in self.labeled_image_paths:
-                    if os.path.splitext(os.path.basename(path))[0] == base_name:
-                        shutil.copy2(path, target_dir)
-                        txt_path = os.path.join(target_dir, base_name + ".txt")
-                        with open(txt_path, "w") as f:
-                            f.write(self.labeled_annotations[base_name])
-                        break
-        process_set(train_imgs, train_dir)
-        process_set(val_imgs, val_dir)
-        process_set(test_imgs, test_dir)
-        data_yaml_path = os.path.join(output_dir, "data.yaml")
-        with open(data_yaml_path, "w") as f:
-            f.write(f"train: {train_dir}\n")
-            f.write(f"val: {val_dir}\n")
-            f.write(f"test: {test_dir}\n")
-            f.write(f"nc: {len(self.classes)}\n")
-            f.write("names: " + str(self.classes) + "\n")
+        try:
+            dirs, _ = build_dataset(self.labeled_annotations, self.labeled_image_paths, output_dir,
+                                    groups=self.duplicate_groups())
+            data_yaml_path = write_data_yaml(output_dir, dirs, self.classes)
+            n_train = sum(1 for split, _ in split_image_paths(output_dir).values() if split == "train")
+            self.training_context = {"modo": "completo", "rotulos": label_hashes(self.labeled_annotations),
+                                     "epocas_pedidas": epochs, "imagens_treino": n_train, "imagens_completo": n_train,
+                                     "dataset_hash": manifest_hash(output_dir),
+                                     "hiperparametros": {"epochs": epochs, "imgsz": imgsz, "workers": workers}}
+            options = {}
+            previous = self.previous_training_run() if incremental else None
+            if incremental and previous is None:
+                print("Nenhum experimento anterior com treino.json; usando treino completo.")
+            if previous:
+                weights, meta = previous
+                plan = prepare_incremental(self.labeled_annotations, output_dir, dirs, self.classes, meta)
+                if plan is None:
+                    self.after(0, lambda: messagebox.showinfo("Treinamento", "Nenhuma imagem nova ou alterada "
+                                                                             "desde o último treino."))
+                    self.after(0, self.stop_progress)
+                    return
+                data_yaml_path, new, replay = plan
+                options = {"base_model": weights, "extra": {"patience": INCREMENTAL_PATIENCE}}
+                self.training_context["hiperparametros"]["patience"] = INCREMENTAL_PATIENCE
+                self.training_context.update(modo="incremental", base=weights, imagens_treino=len(new) + len(replay),
+                                             referencia=seconds_per_epoch_image(meta))
+                print(f"  incremental: {len(new)} imagens novas + {len(replay)} de reprodução, a partir de {weights}")
+        except Exception as e:
+            msg = str(e)
+            self.after(0, lambda: messagebox.showerror("Erro no Dataset", msg))
+            self.after(0, self.stop_progress)
+            return
         self.data_yaml_path = data_yaml_path
         print("Iniciando treinamento com os seguintes parâmetros:")
         print(f"  data: {data_yaml_path}")
         print(f"  epochs: {epochs}, imgsz: {imgsz}, workers: {workers}")
-        try:
-            modelo = YOLO('yolov8n.pt')
-            modelo.train(data=data_yaml_path, epochs=epochs, imgsz=imgsz, workers=workers)
-            self.after(0, lambda: messagebox.showinfo("Treinamento", "Treinamento finalizado!"))
-            self.after(0, self.plot_metrics)
+        self.after(0, lambda: self.launch_training(data_yaml_path, epochs, imgsz, workers, options))
+
+    def launch_training(self, data_yaml_path, epochs, imgsz, workers, options):
+        """Abre o monitor, que roda o YOLO.train em outro processo e mostra as métricas por época."""
+        self.stop_progress()
+        TrainingMonitor(self, data_yaml_path, epochs, imgsz, workers, on_finish=self.on_training_finished, **options)
+
+    def previous_training_run(self):
+        """(best.pt, treino.json) do último experimento, se houver os dois; senão None."""
+        weights = self.best_model_path
+        if not weights:
             exp_dir = self.get_latest_exp_dir()
-            if exp_dir:
-                self.best_model_path = os.path.join(exp_dir, "weights", "best.pt")
-                print("Modelo treinado salvo em:", self.best_model_path)
-            else:
-                print("Nenhum experimento YOLO encontrado em runs/detect/ ou runs/train/.")
+            weights = os.path.join(exp_dir, "weights", "best.pt") if exp_dir else None
+        if not weights or not os.path.exists(weights):
+            return None
+        meta = load_run_meta(run_dir_of(weights))
+        return (weights, meta) if meta else None
+
+    def on_training_finished(self, msg):
+        self.best_model_path = msg["best"]
+        print("Modelo treinado salvo em:", self.best_model_path)
+        ctx = dict(self.training_context, epocas=msg["epocas_executadas"], tempo_treino=msg["tempo_treino"])
+        if ctx["modo"] == "completo":
+            ctx["segundos_por_epoca_imagem"] = seconds_per_epoch_image(ctx)
+        else:
+            ctx["segundos_por_epoca_imagem"] = ctx.pop("referencia")
+        save_run_meta(msg["save_dir"], ctx)
+        self.registry.register(msg["save_dir"], msg["best"], hyperparams=ctx["hiperparametros"],
+                               dataset_hash=ctx["dataset_hash"], metrics=msg.get("metricas"),
+                               latency_ms=msg.get("latencia_ms"), mode=ctx["modo"],
+                               base_model=ctx.get("base", BASE_MODEL))
+        text = f"Treinamento finalizado! ({ctx['epocas']} épocas, {ctx['tempo_treino'] / 60:.1f} min)"
+        full = estimate_full_retrain(ctx["segundos_por_epoca_imagem"], ctx["imagens_completo"], ctx["epocas_pedidas"])
+        if ctx["modo"] == "incremental" and full:
+            text += (f"\nTreino completo estimado: {full / 60:.1f} min. "
+                     f"Economia: {(full - ctx['tempo_treino']) / 60:.1f} min.")
+        print(text)
+        messagebox.showinfo("Treinamento", text + "\nComparando com o modelo promovido antes de adotá-lo...")
+        self.plot_metrics()
+        threading.Thread(target=self.promotion_thread, args=(msg["best"], ctx["hiperparametros"]["imgsz"]),
+                         daemon=True).start()
+
+    def promoted_model_path(self):
+        """Pesos do modelo promovido (o best.pt de origem, se ainda existir)."""
+        promoted = load_promoted()
+        if not promoted:
+            return None
+        return promoted["origem"] if os.path.exists(promoted["origem"]) else PROMOTED_WEIGHTS
+
+    def promotion_thread(self, candidate, imgsz):
+        """Trava de regressão: o novo best.pt só é adotado se não ficar mais lento sem ganhar precisão."""
+        try:
+            labeled = self.annotation_store.labeled_image_paths() if self.annotation_store else None
+            promoted, reason, _ = evaluate_and_promote(candidate, self.data_yaml_path,
+                                                       benchmark_clips([self.test_video_path]), imgsz,
+                                                       labeled_paths=labeled)
         except Exception as e:
-            self.after(0, lambda: messagebox.showerror("Erro no Treinamento", str(e)))
-        finally:
-            self.after(0, self.stop_progress)
+            promoted, reason = False, f"Falha ao medir os modelos: {e}"
+        self.after(0, lambda: self.promotion_done(candidate, promoted, reason))
+
+    def promotion_done(self, candidate, promoted, reason):
+        if promoted:
+            self.best_model_path = candidate
+            MODELS.preload(candidate)  # Aquece o novo modelo para o próximo vídeo teste
+            messagebox.showinfo("Modelo Promovido", reason)
+            if self.ranking_active:
+                self.start_ranking()  # Novo modelo: repontua a fila
+        else:
+            self.best_model_path = self.promoted_model_path() or candidate
+            messagebox.showwarning("Promoção Recusada", reason + "\nO modelo anterior continua em uso; "
+                                   "o novo pode ser escolhido manualmente no seletor de modelos.")
 
     def stop_progress(self):
         self.progress.stop()
@@ -406,18 +690,9 @@ class LabelingApp(tk.Tk):
             self.train_win.destroy()
 
     def get_latest_exp_dir(self):
-        base_dirs = [
-            os.path.join(os.getcwd(), "runs", "detect"),
-            os.path.join(os.getcwd(), "runs", "train")
-        ]
-        exp_dirs = []
-        for base_dir in base_dirs:
-            if os.path.exists(base_dir):
-                exp_dirs.extend([os.path.join(base_dir, d) for d in os.listdir(base_dir) if os.path.isdir(os.path.join(base_dir, d))])
-        if exp_dirs:
-            latest_dir = max(exp_dirs, key=os.path.getmtime)
-            return latest_dir
-        return None
+        """Diretório do último treino concluído, segundo o registro de experimentos."""
+        exp = self.registry.latest()
+        return exp["run_dir"] if exp else None
 
     def plot_metrics(self):
         exp_dir = self.get_latest_exp_dir()
@@ -454,32 +729,13 @@ class LabelingApp(tk.Tk):
                 tk.Label(frame, text=explanation, wraplength=800, justify="left").pack(pady=5)
             else:
                 tk.Label(frame, text=f"Arquivo não encontrado: {filename}").pack(pady=5)
-        metrics_text = ""
-        try:
-            modelo_eval = YOLO(self.best_model_path)
-            val_results = modelo_eval.val(data=self.data_yaml_path, verbose=False)
-            cm = val_results[0].confusion_matrix
-            VP = cm[1, 1]
-            VN = cm[0, 0]
-            FP = cm[0, 1]
-            FN = cm[1, 0]
-            total_samples = cm.sum()
-            accuracy = (VP + VN) / total_samples if total_samples > 0 else 0
-            metrics_text = (
-                f"Cálculo da Taxa de Acurácia:\n"
-                f"Acurácia = (VP + VN) / Total de Amostras = ({VP} + {VN}) / {total_samples} = {accuracy:.2f}\n\n"
-                f"Extração dos Falsos Positivos (FP):\n"
-                f"FP = {FP} (casos em que a classe 0 foi predita como classe 1)\n"
-                f"Falsos Negativos (FN) = {FN} (casos em que a classe 1 foi predita como classe 0)\n\n"
-                f"Cálculo do R²: Não se aplica diretamente a problemas de classificação."
-            )
-        except Exception:
-            metrics_text = ""
-        if metrics_text:
-            metrics_frame = tk.Frame(graph_win, bd=1, relief="solid")
-            metrics_frame.pack(side=tk.BOTTOM, fill=tk.X, padx=10, pady=5)
-            tk.Label(metrics_frame, text="Métricas Calculadas", font=("Helvetica", 12, "bold")).pack(anchor="w", padx=5, pady=2)
-            tk.Label(metrics_frame, text=metrics_text, font=("Helvetica", 10), justify="left").pack(anchor="w", padx=5, pady=2)
+        # Métricas de validação: vêm do cache em disco se pesos, data.yaml e rótulos não mudaram
+        metrics_frame = tk.Frame(graph_win, bd=1, relief="solid")
+        metrics_frame.pack(side=tk.BOTTOM, fill=tk.X, padx=10, pady=5)
+        tk.Label(metrics_frame, text="Métricas Calculadas", font=("Helvetica", 12, "bold")).pack(anchor="w", padx=5, pady=2)
+        metrics_label = tk.Label(metrics_frame, text="Validando o modelo...", font=("Helvetica", 10), justify="left")
+        metrics_label.pack(anchor="w", padx=5, pady=2)
+        threading.Thread(target=self.validation_thread, args=(graph_win, metrics_label), daemon=True).start()
         frame.update_idletasks()
         canvas.configure(scrollregion=canvas.bbox("all"))
         button_frame = tk.Frame(graph_win)
@@ -489,6 +745,38 @@ class LabelingApp(tk.Tk):
         tk.Label(button_frame, text="Sugestão: Utilize o best.pt num vídeo teste.", font=("Helvetica", 10, "italic")).pack(pady=5)
         self.add_footer(graph_win)
 
+    def validation_thread(self, graph_win, metrics_label):
+        try:
+            result, from_cache = cached_validation(self.best_model_path, self.data_yaml_path)
+            text = self.format_metrics(result, from_cache)
+        except Exception as e:
+            text = f"Não foi possível validar o modelo: {e}"
+        self.after(0, lambda: graph_win.winfo_exists() and metrics_label.config(text=text))
+
+    def format_metrics(self, result, from_cache):
+        cm = result["matriz_confusao"]
+        VP = cm[1][1]
+        VN = cm[0][0]
+        FP = cm[0][1]
+        FN = cm[1][0]
+        total_samples = sum(sum(row) for row in cm)
+        accuracy = (VP + VN) / total_samples if total_samples > 0 else 0
+        text = (
+            f"Cálculo da Taxa de Acurácia:\n"
+            f"Acurácia = (VP + VN) / Total de Amostras = ({VP:g} + {VN:g}) / {total_samples:g} = {accuracy:.2f}\n\n"
+            f"Extração dos Falsos Positivos (FP):\n"
+            f"FP = {FP:g} (casos em que a classe 0 foi predita como classe 1)\n"
+            f"Falsos Negativos (FN) = {FN:g} (casos em que a classe 1 foi predita como classe 0)\n\n"
+            f"Cálculo do R²: Não se aplica diretamente a problemas de classificação.\n\n"
+        )
+        for classe, m in result["por_classe"].items():
+            text += (f"{classe}: P={m['precisao']:.3f}  R={m['recall']:.3f}  "
+                     f"mAP50={m['mAP50']:.3f}  mAP50-95={m['mAP50-95']:.3f}\n")
+        tempos = result["tempos_ms"]
+        text += ("Tempo por imagem: " + ", ".join(f"{k} {v:.1f} ms" for k, v in tempos.items())
+                 + ("  (resultado em cache)" if from_cache else ""))
+        return text
+
     # -----------------------------------------
     # 5) Seleção da Rede Neural e Execução do Vídeo Teste
     # -----------------------------------------
@@ -501,6 +789,11 @@ class LabelingApp(tk.Tk):
             options["Treinada (best.pt)"] = self.best_model_path
         if self.test_model_path:
             options["Selecionada no Menu"] = self.test_model_path
+        best = self.registry.best(LATENCY_BUDGET_MS)
+        if best:
+            options[f"Melhor até {LATENCY_BUDGET_MS} ms ({describe(best)})"] = best["weights"]
+        for exp in self.registry.recent(5):
+            options[describe(exp)] = exp["weights"]
         options["Selecionar outro arquivo..."] = "other"
         tk.Label(selector, text="Selecione a rede neural a ser utilizada:").pack(pady=5)
         for key, value in options.items():
@@ -540,7 +833,7 @@ class LabelingApp(tk.Tk):
 
     def video_test_thread(self, model_path):
         import cv2
-        modelo = YOLO(model_path)
+        modelo = MODELS.get(model_path)  # Carregado uma vez por processo e já aquecido
         video = cv2.VideoCapture(self.test_video_path)
         nomes_classes = self.classes if self.classes else ['Classe0']
         classes_ocultar = []  # Pode ser personalizada
@@ -548,33 +841,30 @@ class LabelingApp(tk.Tk):
             check, img = video.read()
             if not check:
                 break
-            resultado = modelo.predict(img, verbose=False)
-            for obj in resultado:
-                for item in obj.boxes:
-                    x1, y1, x2, y2 = item.xyxy[0]
-                    x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
-                    cls = int(item.cls[0])
-                    nomeClasse = nomes_classes[cls] if cls < len(nomes_classes) else "Classe"
-                    conf = round(float(item.conf[0]), 2)
-                    print(f"Detecção: {nomeClasse}, Confiança: {conf}%")
-                    # Persistência no MongoDB
-                    if self.mongo_client:
-                        from datetime import datetime
-                        doc = {
-                            "timestamp": datetime.now(),
-                            "classe": nomeClasse,
-                            "confianca": conf,
-                            "bounding_box": [x1, y1, x2, y2],
-                            "video": self.test_video_path
-                        }
-                        self.collection.insert_one(doc)
-                    # Chama outro script se a classe for "Alerta"
-                    if nomeClasse == "Alerta" and conf > 0.5:
-                        subprocess.Popen(["python", "outro_script.py", "--classe", nomeClasse])
-                    if nomeClasse in classes_ocultar or (nomeClasse == 'Tampa' and conf <= 0.30):
-                        continue
-                    cv2.putText(img, nomeClasse, (x1, y1-10), cv2.FONT_HERSHEY_COMPLEX, fontScale=1, color=(0,255,0), thickness=2)
-                    cv2.rectangle(img, (x1, y1), (x2, y2), (255,0,255), 2)
+            for item in modelo.detect(img):
+                x1, y1, x2, y2 = int(item.x1), int(item.y1), int(item.x2), int(item.y2)
+                cls = item.cls
+                nomeClasse = nomes_classes[cls] if cls < len(nomes_classes) else "Classe"
+                conf = round(item.conf, 2)
+                print(f"Detecção: {nomeClasse}, Confiança: {conf}%")
+                # Persistência no MongoDB
+                if self.mongo_client:
+                    from datetime import datetime
+                    doc = {
+                        "timestamp": datetime.now(),
+                        "classe": nomeClasse,
+                        "confianca": conf,
+                        "bounding_box": [x1, y1, x2, y2],
+                        "video": self.test_video_path
+                    }
+                    self.collection.insert_one(doc)
+                # Chama outro script se a classe for "Alerta"
+                if nomeClasse == "Alerta" and conf > 0.5:
+                    subprocess.Popen(["python", "outro_script.py", "--classe", nomeClasse])
+                if nomeClasse in classes_ocultar or (nomeClasse == 'Tampa' and conf <= 0.30):
+                    continue
+                cv2.putText(img, nomeClasse, (x1, y1-10), cv2.FONT_HERSHEY_COMPLEX, fontScale=1, color=(0,255,0), thickness=2)
+                cv2.rectangle(img, (x1, y1), (x2, y2), (255,0,255), 2)
             cv2.imshow('Vídeo Teste', img)
             if cv2.waitKey(1) == 27:
                 break
@@ -0,0 +1,228 @@
+"""
+Teste de carga da API (api.py) com base de dados semeada.
+
+1) Semear o MongoDB local com eventos realistas (mesmo formato de detect_objects):
+    python loadtest.py seed --eventos 2000000 --linhas 4 --meses 6
+
+2) Exercitar todos os endpoints com concorrência controlada:
+    python loadtest.py run --url http://localhost:8000 --concorrencia 16 \\
+        --duracao 30 --pid <PID do uvicorn> --saida resultado.json
+
+O resultado (JSON) traz vazão, percentis de latência, erros e memória do
+servidor por endpoint, para comparar antes/depois de uma mudança.
+"""
+import json
+import time
+import random
+import argparse
+import threading
+import urllib.request
+import urllib.error
+from urllib.parse import quote
+from datetime import datetime, timedelta
+import pytz
+from pymongo import MongoClient
+from event_store import make_count_event, compact_event, ensure_event_collection, ItemCatalog
+
+MONGO_URI = "mongodb://localhost:27017/"
+FUSO_BR = pytz.timezone("America/Sao_Paulo")
+
+# Endpoints exercitados: (nome, caminho, feed). {hoje}/{semana} são preenchidos na execução.
+# Nos feeds (SSE) mede-se o tempo até os cabeçalhos, sem consumir o fluxo.
+ENDPOINTS = [
+    ("eventos_dia", "/eventos?inicio={hoje}", False),
+    ("aprovados_semana", "/eventos/aprovados?inicio={semana}", False),
+    ("reprovados_semana", "/eventos/reprovados?inicio={semana}", False),
+    ("kpis_hoje", "/kpis/hoje", False),
+    ("eventos_todos", "/eventos", False),
+    ("aprovados_todos", "/eventos/aprovados", False),
+    ("reprovados_todos", "/eventos/reprovados", False),
+    ("stream_conexao", "/eventos/stream?linha=linha_1", True),
+]
+
+
+# ========================================================
+# ## 1. Gerador da base semeada
+# ========================================================
+def generate_events(n_eventos, n_linhas, meses, taxa_reprovacao=0.05, seed=42):
+    """
+    Gera eventos em ordem cronológica, distribuídos em turnos (06h-22h, dias
+    úteis) ao longo dos últimos 'meses', com 'total' crescente por linha como
+    no copilot. Os eventos são produzidos em fluxo, sem montar tudo na memória.
+    """
+    rng = random.Random(seed)
+    fim = datetime.now(FUSO_BR)
+    t = (fim - timedelta(days=30 * meses)).replace(hour=6, minute=0, second=0, microsecond=0)
+    dias_uteis = sum(1 for d in range(30 * meses) if (t + timedelta(days=d)).weekday() < 5)
+    intervalo_medio = dias_uteis * 16 * 3600 / n_eventos
+    totais = {}
+    gerados = 0
+    while gerados < n_eventos:
+        t += timedelta(seconds=rng.expovariate(1 / intervalo_medio))
+        if t.hour >= 22 or t.hour < 6 or t.weekday() >= 5:
+            # Fora do turno: pula para as 06h do próximo dia
+            t = (t + timedelta(days=1 if t.hour >= 6 else 0)).replace(hour=6, minute=0, second=0)
+            continue
+        if t >= fim:
+            break
+        linha = f"linha_{rng.randrange(n_linhas) + 1}"
+        totais[linha] = totais.get(linha, 0) + 1
+        classe = "Reprovado" if rng.random() < taxa_reprovacao else "Aprovado"
+        doc = make_count_event(classe=classe, nome_item="Placa Sextavada", codigo="1318",
+                               data_hora=t, total=totais[linha], linha=linha)
+        gerados += 1
+        yield doc
+
+
+def seed(args):
+    client = MongoClient(args.mongo)
+    collection = ensure_event_collection(client[args.banco])
+    if args.limpar:
+        collection.delete_many({})
+    item_id = ItemCatalog(client[args.banco]).item_id("1318", "Placa Sextavada")
+    lote, inseridos, t0 = [], 0, time.perf_counter()
+    for doc in generate_events(args.eventos, args.linhas, args.meses):
+        lote.append(compact_event(doc, item_id))
+        if len(lote) >= args.lote:
+            collection.insert_many(lote, ordered=False)
+            inseridos += len(lote)
+            lote = []
+            print(f"\r{inseridos}/{args.eventos} eventos inseridos", end="", flush=True)
+    if lote:
+        collection.insert_many(lote, ordered=False)
+        inseridos += len(lote)
+    print(f"\n{inseridos} eventos em {time.perf_counter() - t0:.1f}s.")
+
+
+# ========================================================
+# ## 2. Driver de carga
+# ========================================================
+def server_rss_mb(pid):
+    """Memória residente do servidor (MB). Usa psutil se disponível; senão /proc."""
+    if not pid:
+        return None
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss / 2**20
+    except ImportError:
+        pass
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, round(p / 100 * (len(values) - 1))))
+    return values[k]
+
+
+def run_endpoint(url, concorrencia, duracao, timeout, pid, feed=False):
+    """Dispara requisições em 'concorrencia' threads durante 'duracao' segundos."""
+    latencias, erros, bytes_lidos = [], 0, 0
+    lock = threading.Lock()
+    fim = time.perf_counter() + duracao
+    pico_rss = [server_rss_mb(pid)]
+
+    def worker():
+        nonlocal erros, bytes_lidos
+        while time.perf_counter() < fim:
+            t0 = time.perf_counter()
+            try:
+                with urllib.request.urlopen(url, timeout=timeout) as resp:
+                    n = 0 if feed else len(resp.read())
+                with lock:
+                    latencias.append(time.perf_counter() - t0)
+                    bytes_lidos += n
+            except (urllib.error.URLError, OSError):
+                with lock:
+                    erros += 1
+
+    def monitor():
+        while time.perf_counter() < fim:
+            rss = server_rss_mb(pid)
+            if rss is not None:
+                pico_rss[0] = max(pico_rss[0] or 0, rss)
+            time.sleep(0.5)
+
+    threads = [threading.Thread(target=worker) for _ in range(concorrencia)]
+    threads.append(threading.Thread(target=monitor))
+    t_inicio = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t_inicio
+    ms = [x * 1000 for x in latencias]
+    return {
+        "requisicoes": len(latencias),
+        "erros": erros,
+        "vazao_rps": len(latencias) / elapsed if elapsed else 0,
+        "bytes_por_resposta": bytes_lidos / len(latencias) if latencias else 0,
+        "latencia_ms": {"p50": percentile(ms, 50), "p90": percentile(ms, 90),
+                        "p99": percentile(ms, 99), "max": max(ms) if ms else None},
+        "rss_pico_mb": pico_rss[0],
+    }
+
+
+def run(args):
+    agora = datetime.now(FUSO_BR)
+    params = {
+        "hoje": quote(agora.replace(hour=0, minute=0, second=0, microsecond=0).isoformat(timespec="seconds")),
+        "semana": quote((agora - timedelta(days=7)).isoformat(timespec="seconds")),
+    }
+    selecionados = [e for e in ENDPOINTS if not args.endpoints or e[0] in args.endpoints]
+    resultado = {
+        "data": agora.isoformat(),
+        "url": args.url,
+        "concorrencia": args.concorrencia,
+        "duracao_s": args.duracao,
+        "rss_inicial_mb": server_rss_mb(args.pid),
+        "endpoints": {},
+    }
+    for nome, caminho, feed in selecionados:
+        url = args.url.rstrip("/") + caminho.format(**params)
+        print(f"-> {nome}: {url}")
+        r = run_endpoint(url, args.concorrencia, args.duracao, args.timeout, args.pid, feed)
+        resultado["endpoints"][nome] = r
+        print(f"   {r['vazao_rps']:.1f} req/s, p50={r['latencia_ms']['p50']} ms, "
+              f"p99={r['latencia_ms']['p99']} ms, erros={r['erros']}")
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"Resultado salvo em {args.saida}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Teste de carga da API do TDC")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_seed = sub.add_parser("seed", help="Semeia o MongoDB com eventos realistas")
+    p_seed.add_argument("--mongo", default=MONGO_URI)
+    p_seed.add_argument("--banco", default="tdc_workshop")
+    p_seed.add_argument("--eventos", type=int, default=1_000_000)
+    p_seed.add_argument("--linhas", type=int, default=4)
+    p_seed.add_argument("--meses", type=int, default=6)
+    p_seed.add_argument("--lote", type=int, default=10_000)
+    p_seed.add_argument("--limpar", action="store_true", help="Apaga os eventos existentes antes")
+
+    p_run = sub.add_parser("run", help="Exercita os endpoints e mede desempenho")
+    p_run.add_argument("--url", default="http://localhost:8000")
+    p_run.add_argument("--concorrencia", type=int, default=8)
+    p_run.add_argument("--duracao", type=float, default=20.0)
+    p_run.add_argument("--timeout", type=float, default=60.0)
+    p_run.add_argument("--pid", type=int, default=None, help="PID do servidor (memória)")
+    p_run.add_argument("--endpoints", nargs="*", help="Subconjunto de endpoints por nome")
+    p_run.add_argument("--saida", default="loadtest_result.json")
+
+    args = parser.parse_args()
+    if args.comando == "seed":
+        seed(args)
+    else:
+        run(args)
@@ -0,0 +1,252 @@
+"""
+Migração de event_logs para o esquema compacto (event_store).
+
+Documento antigo:
+    {"classe": "Aprovado", "nome_item": "Placa Sextavada", "codigo": "1318",
+     "data_hora": ISODate(...), "total": 812, "linha": "linha_1"}
+Documento novo:
+    {"t": 1743084000000, "c": 0, "n": 812, "m": {"l": "linha_1", "i": 1}}
+
+Os documentos são regravados no lugar (mesmo _id), em lotes, e só os que
+ainda têm 'data_hora' são lidos: a migração pode ser interrompida e
+executada de novo. As partes já arquivadas (archive/event_logs) também são
+convertidas, cada arquivo de forma atômica (tmp + rename). No fim, os
+índices completos do formato antigo são removidos e os novos criados
+(mongo_indexes; os parciais *_legado ficam, vazios).
+
+Os aplicativos e a API leem os dois formatos (event_store.event_query), então
+a migração pode rodar com tudo no ar; ela só libera espaço e índices.
+
+Uma time-series não pode trocar o campo de tempo no lugar. Nesse caso, com
+os aplicativos parados (eles recusam o formato antigo), a migração copia os
+eventos convertidos para uma coleção comum auxiliar (event_logs_migracao),
+recria event_logs como time-series no formato novo e copia tudo de volta.
+As duas fases podem ser interrompidas e executadas de novo; a time-series
+antiga só é removida depois que a cópia auxiliar estiver completa.
+
+    python migrate_events.py --dry-run     # só mede o ganho estimado
+    python migrate_events.py
+"""
+import os
+import sys
+import json
+import gzip
+import argparse
+from datetime import datetime
+
+from pymongo import MongoClient, ReplaceOne, ASCENDING
+import bson
+
+from event_store import (ItemCatalog, compact_event, ensure_event_collection, timeseries_options,
+                         EVENT_TIMESERIES, TIMESERIES_ENABLED, MONGO_URI, ARCHIVE_DIR, LINHA_PADRAO)
+from mongo_indexes import ensure_indexes, LEGACY_FILTER
+
+BATCH_SIZE = 5000           # Documentos regravados por bulk_write
+SAMPLE_SIZE = 1000          # Documentos usados na estimativa do --dry-run
+OLD_INDEXES = ("data_hora_1", "classe_1_data_hora_-1")    # Índices completos do formato antigo
+STAGING_SUFFIX = "_migracao"    # Coleção auxiliar da migração de uma time-series
+
+
+def legacy_to_compact(doc, item_id):
+    """Documento no formato antigo -> documento compacto (mesmo _id)."""
+    event = dict(doc, linha=doc.get("linha") or doc.get("meta", {}).get("linha") or LINHA_PADRAO)
+    if isinstance(event["data_hora"], str):     # Partes arquivadas guardam a data em ISO 8601
+        event["data_hora"] = datetime.fromisoformat(event["data_hora"])
+    return compact_event(event, item_id)
+
+
+def _item_id(doc, catalog):
+    return catalog.item_id(doc["codigo"], doc["nome_item"])
+
+
+def collection_stats(db, name):
+    """(documentos, tamanho dos dados, tamanho dos índices) em bytes."""
+    stats = db.command("collStats", name)
+    return stats.get("count", 0), stats.get("size", 0), stats.get("totalIndexSize", 0)
+
+
+def is_old_timeseries(db, name):
+    """Time-series no formato antigo (campo de tempo 'data_hora')."""
+    options = timeseries_options(db, name)
+    return options is not None and options.get("timeField") != EVENT_TIMESERIES["timeField"]
+
+
+def estimate(collection, sample=SAMPLE_SIZE):
+    """Tamanho médio (BSON) de uma amostra de documentos antigos, antes e depois da conversão."""
+    before = after = n = 0
+    for doc in collection.find(LEGACY_FILTER).limit(sample):
+        before += len(bson.encode(doc))
+        after += len(bson.encode(legacy_to_compact(doc, 1)))     # Sem gravar no catálogo
+        n += 1
+    return (before / n, after / n) if n else (0, 0)
+
+
+def migrate_collection(collection, catalog, batch_size=BATCH_SIZE):
+    """Regrava os documentos antigos em lotes. Retorna a quantidade migrada."""
+    migrated = 0
+    while True:
+        batch = list(collection.find(LEGACY_FILTER).limit(batch_size))
+        if not batch:
+            return migrated
+        collection.bulk_write([ReplaceOne({"_id": doc["_id"]}, legacy_to_compact(doc, _item_id(doc, catalog)))
+                               for doc in batch], ordered=False)
+        migrated += len(batch)
+        print(f"\r{migrated} eventos migrados", end="", flush=True)
+
+
+def copy_to_staging(source, staging, catalog, batch_size=BATCH_SIZE):
+    """
+    Fase 1 da migração de uma time-series: copia os eventos convertidos para a
+    coleção auxiliar (comum, com _id único: repetir um lote regrava os mesmos
+    documentos). Recomeça a partir do instante do último evento copiado.
+    """
+    last = staging.find_one(sort=[("t", -1)])
+    query = {"data_hora": {"$gte": last["t"]}} if last else {}
+    copied, batch = 0, []
+    for doc in source.find(query).sort("data_hora", 1):
+        batch.append(ReplaceOne({"_id": doc["_id"]}, legacy_to_compact(doc, _item_id(doc, catalog)), upsert=True))
+        if len(batch) >= batch_size:
+            staging.bulk_write(batch, ordered=False)
+            copied += len(batch)
+            batch = []
+            print(f"\r{copied} eventos copiados para {staging.name}", end="", flush=True)
+    if batch:
+        staging.bulk_write(batch, ordered=False)
+        copied += len(batch)
+    return copied
+
+
+def copy_from_staging(staging, target, batch_size=BATCH_SIZE):
+    """
+    Fase 2: grava a cópia auxiliar na time-series nova, em ordem de tempo e
+    com inserções ordenadas. Recomeça a partir do último instante gravado,
+    ignorando os _id desse instante que já estão lá (time-series não têm
+    índice único em _id).
+    """
+    last = target.find_one(sort=[("t", -1)])
+    query, done = {}, set()
+    if last:
+        query = {"t": {"$gte": last["t"]}}
+        done = {doc["_id"] for doc in target.find({"t": last["t"]}, {"_id": 1})}
+    copied, batch = 0, []
+    for doc in staging.find(query).sort("t", 1):
+        if doc["_id"] in done:
+            continue
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            target.insert_many(batch, ordered=True)
+            copied += len(batch)
+            batch = []
+            print(f"\r{copied} eventos gravados em {target.name}", end="", flush=True)
+    if batch:
+        target.insert_many(batch, ordered=True)
+        copied += len(batch)
+    return copied
+
+
+def migrate_timeseries(db, name, catalog, batch_size=BATCH_SIZE):
+    """
+    Converte uma time-series antiga: cópia auxiliar, remoção da coleção antiga,
+    recriação no formato novo (ensure_event_collection) e cópia de volta.
+    Retorna a quantidade de eventos gravados na coleção nova.
+    """
+    staging = db[name + STAGING_SUFFIX]
+    if is_old_timeseries(db, name):
+        staging.create_index([("t", ASCENDING)], name="t_1")
+        copy_to_staging(db[name], staging, catalog, batch_size)
+        expected, copied = db[name].count_documents({}), staging.count_documents({})
+        if copied < expected:
+            raise RuntimeError(f"Cópia incompleta ({copied} de {expected} eventos): execute a migração de novo.")
+        print(f"\n{copied} eventos copiados para {staging.name}; recriando {name}.")
+        db[name].drop()
+    migrated = copy_from_staging(staging, ensure_event_collection(db, name), batch_size)
+    staging.drop()
+    return migrated
+
+
+def migrate_archive(catalog, archive_dir=ARCHIVE_DIR):
+    """Converte as partes arquivadas que ainda têm documentos antigos. Retorna (arquivos, eventos)."""
+    files = events = 0
+    if not os.path.isdir(archive_dir):
+        return files, events
+    for day in sorted(os.listdir(archive_dir)):
+        day_dir = os.path.join(archive_dir, day)
+        for name in sorted(os.listdir(day_dir)):
+            if not name.endswith(".ndjson.gz"):
+                continue
+            path = os.path.join(day_dir, name)
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                docs = [json.loads(line) for line in f]
+            legacy = sum(1 for doc in docs if "data_hora" in doc)
+            if not legacy:
+                continue
+            tmp = path + ".tmp"
+            with gzip.open(tmp, "wt", encoding="utf-8") as f:
+                for doc in docs:
+                    if "data_hora" in doc:
+                        doc = legacy_to_compact(doc, _item_id(doc, catalog))
+                        if isinstance(doc["t"], datetime):
+                            doc["t"] = doc["t"].isoformat()
+                    f.write(json.dumps(doc, ensure_ascii=False) + "\n")
+            os.replace(tmp, path)
+            files += 1
+            events += legacy
+    return files, events
+
+
+def drop_legacy_indexes(collection, log_callback=print):
+    existing = collection.index_information()
+    for name in OLD_INDEXES:
+        if name in existing:
+            collection.drop_index(name)
+            log_callback(f"Índice antigo removido: {name}")
+
+
+def _mb(size):
+    return f"{size / 1024 / 1024:.1f} MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migra event_logs para o esquema compacto com catálogo de itens")
+    parser.add_argument("--mongo", default=MONGO_URI)
+    parser.add_argument("--banco", default="tdc_workshop")
+    parser.add_argument("--lote", type=int, default=BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="Só estima o ganho, sem alterar nada")
+    args = parser.parse_args()
+
+    client = MongoClient(args.mongo)
+    db = client[args.banco]
+    name = "event_logs"
+    timeseries = is_old_timeseries(db, name) or name + STAGING_SUFFIX in db.list_collection_names()
+    if timeseries and not TIMESERIES_ENABLED:
+        print(f"{args.banco}.{name} é uma coleção time-series: habilite TIMESERIES_ENABLED em event_store.py.")
+        sys.exit(1)
+    collection = db[name]
+    catalog = ItemCatalog(db)
+    pending = collection.count_documents(LEGACY_FILTER)
+    count, size, index_size = collection_stats(db, name)
+    print(f"Antes: {count} eventos, dados {_mb(size)}, índices {_mb(index_size)}; {pending} no formato antigo.")
+
+    if args.dry_run:
+        before, after = estimate(collection)
+        if before:
+            print(f"Documento médio: {before:.0f} -> {after:.0f} bytes ({1 - after / before:.0%} menor).")
+        return
+
+    if timeseries:
+        migrated = migrate_timeseries(db, name, catalog, args.lote)
+    else:
+        migrated = migrate_collection(collection, catalog, args.lote)
+    print(f"\n{migrated} eventos migrados.")
+    files, events = migrate_archive(catalog)
+    print(f"Arquivo: {events} eventos convertidos em {files} partes.")
+    if not timeseries:
+        drop_legacy_indexes(collection)
+    ensure_indexes(client, log_callback=print)
+    count, size, index_size = collection_stats(db, name)
+    print(f"Depois: {count} eventos, dados {_mb(size)}, índices {_mb(index_size)} "
+          "(o espaço livre volta ao sistema após compact ou resync).")
+
+
+if __name__ == "__main__":
+    main()
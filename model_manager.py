@@ -0,0 +1,185 @@
+"""
+Cache de modelos do processo, com aquecimento e troca a quente.
+
+Cada arquivo de pesos é carregado uma única vez (load_backend) e mantido
+num LRU de até MAX_LOADED_MODELS modelos; antes de ser entregue, o modelo
+roda algumas inferências com quadros vazios, para que a inicialização
+preguiçosa (alocação de buffers, otimização do grafo, threads) não caia
+nos primeiros quadros reais.
+
+A chave do cache inclui o mtime dos pesos e dos .onnx ao lado deles: pesos
+regravados no mesmo caminho (ex.: models/promoted.pt após uma promoção)
+viram um modelo novo.
+
+ModelSlot guarda o modelo ativo de um laço de detecção. A troca carrega e
+aquece o novo modelo numa thread e só então substitui a referência; o laço
+lê slot.model a cada quadro, sem parar o vídeo nem perder quadros.
+
+inference_pool() cria o pool de processos da inferência em lote na CPU
+(pré-rotulagem, active learning): cada processo carrega o modelo uma vez
+(init_worker) e as tarefas o obtêm com worker_model().
+"""
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from inference_backend import load_backend, onnx_path_for
+
+MAX_LOADED_MODELS = 3       # Modelos mantidos em memória (LRU)
+WARMUP_RUNS = 3             # Inferências de aquecimento com quadro vazio
+WATCH_INTERVAL = 2.0        # Segundos entre verificações de pesos regravados
+
+_worker_model = None        # Modelo carregado em cada processo do pool de inferência
+
+
+def signature(weights_path):
+    """Identifica a versão dos pesos: caminho + mtime do .pt e dos .onnx exportados."""
+    path = os.path.abspath(weights_path)
+    stem = os.path.splitext(path)[0]
+    mtimes = tuple(os.path.getmtime(p) if os.path.exists(p) else None
+                   for p in (path, onnx_path_for(path), stem + ".int8.onnx"))
+    return (path,) + mtimes
+
+
+def warmup(backend, runs=WARMUP_RUNS):
+    import numpy as np
+    h, w = getattr(backend, "imgsz", (640, 640))
+    frame = np.zeros((h, w, 3), dtype=np.uint8)
+    for _ in range(runs):
+        backend.detect(frame)
+
+
+class ModelManager:
+    """LRU de backends carregados e aquecidos, compartilhado pelo processo todo."""
+    def __init__(self, capacity=MAX_LOADED_MODELS):
+        self.capacity = capacity
+        self.models = OrderedDict()
+        self.lock = threading.Lock()        # Protege o dicionário
+        self.load_lock = threading.Lock()   # Uma carga por vez (evita carregar o mesmo modelo duas vezes)
+
+    def _cached(self, key):
+        with self.lock:
+            if key in self.models:
+                self.models.move_to_end(key)
+                return self.models[key]
+        return None
+
+    def get(self, weights_path):
+        """Backend carregado e aquecido para os pesos (carrega na primeira vez)."""
+        key = signature(weights_path)
+        backend = self._cached(key)
+        if backend is not None:
+            return backend
+        with self.load_lock:
+            backend = self._cached(key)
+            if backend is not None:
+                return backend
+            backend = load_backend(weights_path)
+            warmup(backend)
+            with self.lock:
+                self.models[key] = backend
+                while len(self.models) > self.capacity:
+                    self.models.popitem(last=False)
+        return backend
+
+    def preload(self, weights_path, callback=None):
+        """Carrega e aquece em segundo plano; callback(backend ou None, erro ou None) ao terminar."""
+        def run():
+            try:
+                backend = self.get(weights_path)
+            except Exception as e:
+                if callback:
+                    callback(None, e)
+                return
+            if callback:
+                callback(backend, None)
+        threading.Thread(target=run, daemon=True).start()
+
+
+MODELS = ModelManager()
+
+
+class ModelSlot:
+    """Modelo ativo de um laço de detecção, com troca a quente."""
+    def __init__(self, weights_path, manager=MODELS, log_callback=print):
+        self.manager = manager
+        self.log_callback = log_callback
+        self.weights_path = weights_path
+        self.signature = signature(weights_path)
+        self.model = manager.get(weights_path)
+        self.swapping = False
+        self.requested = None       # Troca pedida durante outra carga (vale a mais recente)
+        self.lock = threading.Lock()
+        self._last_check = 0.0
+
+    def swap(self, weights_path):
+        """
+        Carrega o novo modelo em segundo plano e troca a referência quando
+        estiver pronto. Um pedido feito durante outra carga é guardado e
+        atendido assim que ela termina.
+        """
+        with self.lock:
+            if self.swapping:
+                self.requested = weights_path
+                return
+            self.swapping = True
+        new_signature = signature(weights_path)
+
+        def ready(backend, error):
+            if error is not None:
+                if weights_path == self.weights_path:
+                    self.signature = new_signature  # Não tenta de novo o mesmo arquivo com defeito
+                self.log_callback(f"Falha ao carregar {os.path.basename(weights_path)}: {error}. "
+                                  "O modelo anterior continua ativo.")
+            else:
+                self.model = backend    # Troca atômica: o próximo quadro já usa o novo modelo
+                self.weights_path = weights_path
+                self.signature = new_signature
+                self.log_callback(f"Modelo trocado sem parar o vídeo: {os.path.basename(weights_path)} "
+                                  f"({backend.name})")
+            with self.lock:
+                self.swapping = False
+                next_path, self.requested = self.requested, None
+            if next_path and (next_path != self.weights_path or signature(next_path) != self.signature):
+                self.swap(next_path)
+
+        self.manager.preload(weights_path, ready)
+
+    def check_for_update(self, now):
+        """Troca o modelo se os pesos foram regravados no mesmo caminho (chamar a cada quadro)."""
+        if now - self._last_check < WATCH_INTERVAL or self.swapping:
+            return
+        self._last_check = now
+        if os.path.exists(self.weights_path) and signature(self.weights_path) != self.signature:
+            self.swap(self.weights_path)
+
+
+# ========================================================
+# Pool de processos para inferência em lote
+# ========================================================
+def pool_size(workers=None):
+    """(processos, threads por processo) para um pool de inferência na CPU."""
+    cpus = os.cpu_count() or 1
+    workers = workers or max(1, min(4, cpus // 2))
+    return workers, max(1, cpus // workers)
+
+
+def init_worker(model_path, threads):
+    """Inicializa o processo: limita as threads do torch e carrega o modelo uma vez."""
+    global _worker_model
+    import torch
+    from ultralytics import YOLO
+    torch.set_num_threads(threads)
+    _worker_model = YOLO(model_path)
+
+
+def worker_model():
+    """Modelo carregado por init_worker neste processo."""
+    return _worker_model
+
+
+def inference_pool(model_path, workers=None):
+    """ProcessPoolExecutor em que cada processo carrega model_path uma vez."""
+    workers, threads = pool_size(workers)
+    return ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(model_path, threads))
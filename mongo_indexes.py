@@ -0,0 +1,188 @@
+"""
+Gerenciamento automático de índices do MongoDB.
+
+Cria (de forma idempotente) os índices usados pelas consultas do copilot.py,
+treinamento.py e api.py, e permite verificar via explain() que nenhuma das
+consultas distribuídas faz varredura completa da coleção (COLLSCAN).
+
+Uso pela linha de comando:
+    python mongo_indexes.py            # cria os índices
+    python mongo_indexes.py --check    # cria os índices e valida os planos
+"""
+import sys
+from datetime import datetime, timedelta
+from pymongo import MongoClient, ASCENDING, DESCENDING
+from bson import ObjectId
+from event_store import (ensure_event_collection, event_query, to_t, EventLayoutError,
+                         CATALOG_COLLECTION, TIMESERIES_ENABLED)
+from counters import COUNTERS_COLLECTION
+
+MONGO_URI = "mongodb://localhost:27017/"
+
+# ========================================================
+# ## 1. Definição dos índices por banco/coleção
+# ========================================================
+# Cada entrada: (banco, coleção) -> lista de (chaves, nome do índice)
+INDEXES = {
+    ("tdc_workshop", "event_logs"): [
+        ([("t", ASCENDING)], "t_1"),
+        ([("c", ASCENDING), ("t", DESCENDING)], "c_1_t_-1"),
+    ],
+    ("monitoramento", "deteccoes"): [
+        ([("timestamp", ASCENDING)], "timestamp_1"),
+        ([("classe", ASCENDING), ("timestamp", DESCENDING)], "classe_1_timestamp_-1"),
+        ([("video", ASCENDING), ("timestamp", DESCENDING)], "video_1_timestamp_-1"),
+    ],
+    ("tdc_workshop", "counters"): [
+        ([("data", ASCENDING), ("linha", ASCENDING)], "data_1_linha_1"),
+    ],
+}
+
+# Índices únicos (garantem a consistência dos dados, além de acelerar a consulta)
+UNIQUE_INDEXES = {
+    ("tdc_workshop", CATALOG_COLLECTION): [
+        ([("codigo", ASCENDING)], "codigo_1"),
+    ],
+}
+
+# Índices parciais do formato antigo de event_logs (data_hora/classe): atendem
+# o ramo dos documentos ainda não migrados em event_query e ficam vazios
+# depois de migrate_events.py
+LEGACY_FILTER = {"data_hora": {"$exists": True}}
+LEGACY_INDEXES = {
+    ("tdc_workshop", "event_logs"): [
+        ([("data_hora", ASCENDING)], "data_hora_1_legado"),
+        ([("classe", ASCENDING), ("data_hora", DESCENDING)], "classe_1_data_hora_-1_legado"),
+    ],
+}
+
+
+def shipped_queries():
+    """
+    Retorna as consultas com filtro que os aplicativos de fato executam, no
+    formato (banco, coleção, filtro, descrição), montadas pelas mesmas funções
+    do código (event_query). A listagem sem filtro de /eventos é uma
+    varredura completa por definição e não entra na verificação;
+    'deteccoes' só recebe inserções.
+    """
+    agora = datetime.utcnow()
+    dia = agora.replace(hour=0, minute=0, second=0, microsecond=0)
+    queries = [
+        ("tdc_workshop", "event_logs", event_query(inicio=dia),
+         "GET /eventos?inicio=, KPIs do dia (API e feed ao vivo)"),
+        ("tdc_workshop", "event_logs", event_query(inicio=dia, fim=agora),
+         "GET /eventos?inicio=&fim="),
+        ("tdc_workshop", "event_logs", event_query(classe="Reprovado"),
+         "GET /eventos/reprovados"),
+        ("tdc_workshop", "event_logs", event_query(classe="Aprovado"),
+         "GET /eventos/aprovados"),
+        ("tdc_workshop", "event_logs", event_query(classe="Reprovado", inicio=dia),
+         "GET /eventos/reprovados?inicio="),
+        ("tdc_workshop", "event_logs", event_query(inicio=dia - timedelta(days=1), fim=dia),
+         "arquivamento de um dia"),
+        ("tdc_workshop", "event_logs", {"t": {"$lt": to_t(dia)}},
+         "arquivamento: evento mais antigo"),
+        ("tdc_workshop", CATALOG_COLLECTION, {"codigo": "1318"},
+         "item do catálogo por código"),
+        ("tdc_workshop", COUNTERS_COLLECTION, {"data": dia.date().isoformat()},
+         "GET /contadores"),
+        ("tdc_workshop", COUNTERS_COLLECTION, {"data": dia.date().isoformat(), "linha": "linha_1"},
+         "GET /contadores?linha="),
+    ]
+    if not TIMESERIES_ENABLED:    # Time-series não têm índice em _id nem os índices do formato antigo
+        queries += [
+            ("tdc_workshop", "event_logs", {"_id": {"$gte": ObjectId()}},
+             "novos eventos: monitor do copilot e feed da API (EventTail)"),
+            ("tdc_workshop", "event_logs", {"_id": {"$in": [ObjectId()]}},
+             "novos eventos: documentos completos (EventTail)"),
+            ("tdc_workshop", "event_logs", {"data_hora": {"$lt": dia}},
+             "arquivamento: evento mais antigo (formato antigo)"),
+        ]
+    return queries
+
+
+# ========================================================
+# ## 2. Criação idempotente
+# ========================================================
+def ensure_indexes(client, log_callback=None):
+    """
+    Cria todos os índices definidos em INDEXES. create_index é idempotente:
+    se o índice já existir com as mesmas chaves, nada é feito.
+    A coleção de eventos é criada antes (possivelmente como time-series),
+    pois create_index criaria uma coleção comum implicitamente.
+    """
+    ensure_event_collection(client["tdc_workshop"])
+    groups = [(INDEXES, {}), (UNIQUE_INDEXES, {"unique": True})]
+    if not TIMESERIES_ENABLED:    # Uma time-series nova nunca tem documentos no formato antigo
+        groups.append((LEGACY_INDEXES, {"partialFilterExpression": LEGACY_FILTER}))
+    for indexes, options in groups:
+        for (db_name, coll_name), specs in indexes.items():
+            collection = client[db_name][coll_name]
+            for keys, name in specs:
+                collection.create_index(keys, name=name, **options)
+            if log_callback:
+                log_callback(f"Índices verificados em {db_name}.{coll_name}: "
+                             f"{', '.join(name for _, name in specs)}")
+
+
+def ensure_indexes_safe(client, log_callback=None):
+    """
+    Versão tolerante a falhas usada na inicialização dos aplicativos:
+    um MongoDB indisponível não deve impedir a janela de abrir. Uma coleção
+    de eventos em formato incompatível (EventLayoutError) é repassada.
+    """
+    try:
+        ensure_indexes(client, log_callback)
+        return True
+    except EventLayoutError:
+        raise               # Não é uma falha passageira: gravar eventos nessa coleção falharia sempre
+    except Exception as e:
+        msg = f"Não foi possível criar os índices do MongoDB: {e}"
+        if log_callback:
+            log_callback(msg)
+        else:
+            print(msg)
+        return False
+
+
+# ========================================================
+# ## 3. Verificação dos planos de consulta
+# ========================================================
+def _plan_stages(plan):
+    """Percorre recursivamente um plano do explain() e gera os nomes dos estágios."""
+    if not isinstance(plan, dict):
+        return
+    if "stage" in plan:
+        yield plan["stage"]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from _plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+
+def check_query_plans(client):
+    """
+    Executa explain() em cada consulta distribuída e retorna a lista de
+    falhas (descrição, estágios) das que fazem COLLSCAN.
+    """
+    failures = []
+    for db_name, coll_name, query, description in shipped_queries():
+        explain = client[db_name][coll_name].find(query).explain()
+        winning = explain.get("queryPlanner", {}).get("winningPlan", {})
+        stages = list(_plan_stages(winning))
+        if "COLLSCAN" in stages:
+            failures.append((description, stages))
+    return failures
+
+
+if __name__ == "__main__":
+    client = MongoClient(MONGO_URI)
+    ensure_indexes(client, log_callback=print)
+    if "--check" in sys.argv:
+        failures = check_query_plans(client)
+        for description, stages in failures:
+            print(f"COLLSCAN em '{description}': {' -> '.join(stages)}")
+        if failures:
+            sys.exit(1)
+        print("Todas as consultas usam índices.")
@@ -0,0 +1,236 @@
+"""
+Várias câmeras/linhas num único copilot.
+
+Cada fonte (arquivo de vídeo, RTSP ou câmera local) tem a sua thread de
+leitura, o seu rastreador de centroides, a sua linha de contagem e os seus
+contadores. A inferência é uma só: um modelo compartilhado (ModelSlot, com
+troca a quente) recebe a cada ciclo um lote com o quadro mais recente de
+cada fonte (detect_batch).
+
+Configuração (streams.json), uma entrada por câmera:
+    [{"linha": "linha_1", "camera": "cam_1", "fonte": "Anexos/video.mp4", "loop": true},
+     {"linha": "linha_2", "camera": "cam_2", "fonte": "rtsp://10.0.0.12/stream1"},
+     {"linha": "linha_3", "camera": "cam_3", "fonte": 0, "posicao_linha": 0.6}]
+"""
+import json
+import math
+import time
+import queue
+import threading
+
+from event_store import LINHA_PADRAO
+
+STREAM_DEFAULTS = {"linha": LINHA_PADRAO, "camera": "cam_1", "loop": False, "posicao_linha": 0.5,
+                   "nome_item": "Placa Sextavada", "codigo": "1318"}
+FILE_BUFFER = 4             # Quadros lidos à frente nos arquivos (sem descarte)
+TRACK_TOLERANCE = 60        # Distância máxima (px) para associar uma detecção a um objeto
+TRACK_MAX_LOST = 5          # Quadros sem detecção antes de esquecer o objeto
+POLL_TIMEOUT = 0.05         # Espera máxima por um quadro de cada fonte, por ciclo
+RECONNECT_MIN = 1.0         # Espera inicial (s) para reabrir uma fonte ao vivo que parou de responder
+RECONNECT_MAX = 30.0        # Espera máxima entre tentativas (dobra a cada falha)
+
+
+def load_streams_config(path):
+    """Lista de configurações de câmera (com os valores padrão preenchidos)."""
+    with open(path, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    streams = []
+    for i, entry in enumerate(entries):
+        if "fonte" not in entry:
+            raise ValueError(f"Entrada {i + 1} de {path} sem 'fonte'.")
+        cfg = dict(STREAM_DEFAULTS, camera=f"cam_{i + 1}")
+        cfg.update(entry)
+        streams.append(cfg)
+    return streams
+
+
+def is_live(source):
+    """Câmeras locais e fluxos de rede: quadros antigos são descartados em vez de acumular."""
+    return isinstance(source, int) or str(source).isdigit() or "://" in str(source)
+
+
+def open_capture(source):
+    import cv2
+    return cv2.VideoCapture(int(source) if str(source).isdigit() else source)
+
+
+class CentroidTracker:
+    """Rastreador por centroide e contagem na travessia da linha (o mesmo critério do vídeo único)."""
+    def __init__(self, tolerance=TRACK_TOLERANCE, max_lost=TRACK_MAX_LOST):
+        self.tolerance = tolerance
+        self.max_lost = max_lost
+        self.objects = {}
+        self.next_id = 0
+
+    def update(self, detections, line_y, frame_h):
+        """detections: [((cx, cy), classe), ...]. Retorna os objetos que acabaram de ser contados."""
+        for obj in self.objects.values():
+            obj["prev_pos"] = obj["pos"]
+        updated = set()
+        for (cx, cy), classe in detections:
+            best_id, best_dist = None, self.tolerance + 1
+            for obj_id, obj in self.objects.items():
+                dist = math.hypot(cx - obj["pos"][0], cy - obj["pos"][1])
+                if dist < self.tolerance and dist < best_dist:
+                    best_dist = dist
+                    best_id = obj_id
+            if best_id is not None:
+                self.objects[best_id].update(pos=(cx, cy), classe=classe, lost=0)
+                updated.add(best_id)
+            else:
+                self.objects[self.next_id] = {"pos": (cx, cy), "prev_pos": (cx, cy), "contado": False,
+                                              "classe": classe, "lost": 0}
+                updated.add(self.next_id)
+                self.next_id += 1
+        for obj_id in list(self.objects):
+            if obj_id not in updated:
+                self.objects[obj_id]["lost"] += 1
+                if self.objects[obj_id]["lost"] > self.max_lost:
+                    del self.objects[obj_id]
+        counted = []
+        for obj in self.objects.values():
+            percent = int(round(((obj["pos"][1] - line_y) / frame_h) * 100))
+            if not obj["contado"] and percent == 0:
+                obj["contado"] = True
+                counted.append(obj)
+        return counted
+
+
+class StreamReader(threading.Thread):
+    """
+    Lê os quadros de uma fonte para uma fila; a fonte acaba quando a thread
+    termina e a fila esvazia. Fontes ao vivo (RTSP, câmera) não acabam por
+    falha de leitura: são reabertas com espera crescente até voltarem.
+    """
+    def __init__(self, cfg, log_callback=None):
+        super().__init__(daemon=True)
+        self.cfg = cfg
+        self.log_callback = log_callback
+        self.live = is_live(cfg["fonte"])
+        self.frames = queue.Queue(maxsize=1 if self.live else FILE_BUFFER)
+        self.running = True
+        self.stop_event = threading.Event()
+
+    def run(self):
+        cap = open_capture(self.cfg["fonte"])
+        backoff = RECONNECT_MIN
+        while self.running:
+            ok, frame = cap.read()
+            if not ok:
+                if self.live:
+                    cap.release()
+                    if self.log_callback:
+                        self.log_callback(f"[{self.cfg['camera']}] Sem sinal de {self.cfg['fonte']}; "
+                                          f"reconectando em {backoff:.0f} s.")
+                    if self.stop_event.wait(backoff):
+                        break
+                    backoff = min(backoff * 2, RECONNECT_MAX)
+                    cap = open_capture(self.cfg["fonte"])
+                    continue
+                if self.cfg["loop"]:
+                    cap.release()
+                    cap = open_capture(self.cfg["fonte"])
+                    continue
+                break
+            backoff = RECONNECT_MIN
+            if self.live:
+                try:
+                    self.frames.get_nowait()   # Descarta o quadro não processado: vale o mais recente
+                except queue.Empty:
+                    pass
+                self.frames.put(frame)
+            else:
+                while self.running:
+                    try:
+                        self.frames.put(frame, timeout=0.5)
+                        break
+                    except queue.Full:
+                        continue
+        cap.release()
+
+    def stop(self):
+        self.running = False
+        self.stop_event.set()
+
+
+class Stream:
+    """Estado de uma câmera: leitor, rastreador e contadores próprios."""
+    def __init__(self, index, cfg, log_callback=None):
+        self.index = index
+        self.cfg = cfg
+        self.reader = StreamReader(cfg, log_callback)
+        self.tracker = CentroidTracker()
+        self.total = 0
+        self.por_classe = {}
+        self.finished = False
+
+    @property
+    def label(self):
+        return f"{self.cfg['linha']}/{self.cfg['camera']}"
+
+
+class MultiStreamProcessor:
+    """
+    Laço de inferência compartilhado. A cada ciclo junta o quadro disponível
+    de cada fonte, roda um lote no modelo do slot e entrega, por fonte:
+      on_frame(stream, quadro_anotado) e on_count(stream, objeto) para cada peça contada.
+    """
+    def __init__(self, streams_cfg, slot, on_frame, on_count, classify=None, log_callback=None):
+        self.streams = [Stream(i, cfg, log_callback) for i, cfg in enumerate(streams_cfg)]
+        self.slot = slot
+        self.on_frame = on_frame
+        self.on_count = on_count
+        self.classify = classify or (lambda cls: "Aprovado" if cls == 0 else "Reprovado")
+        self.running = False
+
+    def run(self):
+        self.running = True
+        for stream in self.streams:
+            stream.reader.start()
+        while self.running and not all(s.finished for s in self.streams):
+            batch = []
+            for stream in self.streams:
+                if stream.finished:
+                    continue
+                try:
+                    frame = stream.reader.frames.get(timeout=POLL_TIMEOUT)
+                except queue.Empty:
+                    stream.finished = not stream.reader.is_alive() and stream.reader.frames.empty()
+                    continue
+                batch.append((stream, frame))
+            if not batch:
+                continue
+            self.slot.check_for_update(time.time())
+            results = self.slot.model.detect_batch([frame for _, frame in batch])
+            for (stream, frame), detections in zip(batch, results):
+                self._process(stream, frame, detections)
+        self.stop()
+
+    def _process(self, stream, frame, detections):
+        import cv2
+        h_frame, w_frame = frame.shape[:2]
+        line_y = int(h_frame * stream.cfg["posicao_linha"])
+        centroids = []
+        for box in detections:
+            x1, y1, x2, y2 = int(box.x1), int(box.y1), int(box.x2), int(box.y2)
+            classe = self.classify(box.cls)
+            cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
+            centroids.append(((cx, cy), classe))
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            cv2.putText(frame, classe, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
+            cv2.circle(frame, (cx, cy), 4, (255, 0, 0), -1)
+            percent = int(round(((cy - line_y) / h_frame) * 100))
+            cv2.putText(frame, f"{percent}%", (cx + 5, cy - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 0), 2)
+        for obj in stream.tracker.update(centroids, line_y, h_frame):
+            stream.total += 1
+            stream.por_classe[obj["classe"]] = stream.por_classe.get(obj["classe"], 0) + 1
+            self.on_count(stream, obj)
+        cv2.line(frame, (0, line_y), (w_frame, line_y), (0, 0, 255), 2)
+        cv2.putText(frame, f"{stream.label}  {stream.total}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8,
+                    (0, 255, 255), 2)
+        self.on_frame(stream, frame)
+
+    def stop(self):
+        self.running = False
+        for stream in self.streams:
+            stream.reader.stop()
@@ -0,0 +1,64 @@
+"""
+Pré-rotulagem em lote com o modelo treinado (best.pt).
+
+Roda o modelo sobre as fotos ainda não rotuladas da pasta, em um pool de
+processos (cada processo carrega o modelo uma vez) e com inferência em
+lotes (várias imagens por chamada de predict). As caixas propostas são
+gravadas no diário de anotações (AnnotationStore.save_proposal) e aparecem
+desenhadas no canvas quando a foto é aberta: o rotulador só aceita
+("Salvar e Próxima Foto") ou corrige (botão direito remove uma caixa).
+"""
+from concurrent.futures import as_completed
+
+from model_manager import inference_pool, worker_model
+
+BATCH_SIZE = 8          # Imagens por chamada de predict
+CONF_THRESHOLD = 0.25   # Confiança mínima para propor uma caixa
+
+
+def _predict_batch(paths, conf):
+    """
+    Executa o modelo sobre um lote de imagens (uma única chamada de predict).
+    Retorna [(caminho, [(classe, xc, yc, w, h, conf), ...]), ...] com
+    coordenadas normalizadas (formato YOLO).
+    """
+    import cv2
+    images, valid = [], []
+    for p in paths:
+        img = cv2.imread(p)
+        if img is not None:
+            images.append(img)
+            valid.append(p)
+    if not images:
+        return []
+    results = worker_model().predict(images, conf=conf, verbose=False)
+    out = []
+    for path, r in zip(valid, results):
+        boxes = []
+        for (xc, yc, w, h), cls, c in zip(r.boxes.xywhn.tolist(), r.boxes.cls.tolist(), r.boxes.conf.tolist()):
+            boxes.append((int(cls), xc, yc, w, h, round(c, 3)))
+        out.append((path, boxes))
+    return out
+
+
+def run_prelabel(model_path, photo_paths, store, workers=None, batch_size=BATCH_SIZE,
+                 conf=CONF_THRESHOLD, progress_callback=None):
+    """
+    Pré-rotula as fotos de photo_paths que ainda não têm rótulo nem proposta.
+    As propostas são gravadas no processo principal (único escritor do diário).
+    Retorna o número de fotos processadas.
+    """
+    pending = [p for p in photo_paths if not store.is_labeled(p) and not store.get_proposals(p)]
+    if not pending:
+        return 0
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    done = 0
+    with inference_pool(model_path, workers) as pool:
+        futures = {pool.submit(_predict_batch, batch, conf): len(batch) for batch in batches}
+        for future in as_completed(futures):
+            for path, boxes in future.result():
+                store.save_proposal(path, boxes, model_path)
+            done += futures[future]
+            if progress_callback:
+                progress_callback(done, len(pending))
+    return done
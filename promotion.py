@@ -0,0 +1,197 @@
+"""
+Promoção de modelos com trava de regressão de desempenho.
+
+Um best.pt recém-treinado só vira o modelo "promovido" (models/promoted.pt,
+usado no vídeo teste e copiado para o copilot) depois de comparado com o
+promovido atual, nas mesmas condições:
+- latência na CPU (p50 e p99) sobre um conjunto fixo de clipes;
+- pico de memória do processo de inferência;
+- mAP50-95 no split de teste.
+
+Cada modelo é medido num processo novo (pico de memória limpo). A promoção
+é recusada se a latência (ou a memória) piorar além da tolerância sem um
+ganho de mAP que compense, ou se o mAP cair sem o modelo ficar mais rápido.
+
+Um candidato aprovado também é quantizado para INT8 (quantization.py); o
+INT8 só acompanha a promoção se a queda de mAP50-95 em relação ao FP32
+ficar dentro da tolerância.
+
+    python promotion.py runs/detect/train7/weights/best.pt --data output/data.yaml
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+
+from experiment_registry import sha1_file
+from inference_backend import onnx_path_for
+from quantization import int8_path_for, report_path_for, quantize_and_evaluate
+
+MODELS_DIR = os.path.join(os.getcwd(), "models")
+PROMOTED_WEIGHTS = os.path.join(MODELS_DIR, "promoted.pt")
+PROMOTED_META = os.path.join(MODELS_DIR, "promoted.json")
+PROMOTED_ONNX = os.path.join(MODELS_DIR, "promoted.onnx")
+PROMOTED_INT8 = int8_path_for(PROMOTED_WEIGHTS)
+PROMOTED_INT8_REPORT = report_path_for(PROMOTED_WEIGHTS)
+BENCH_CLIPS_DIR = os.path.join(os.getcwd(), "Anexos", "benchmark")
+VIDEO_EXT = (".mp4", ".avi", ".mov", ".mkv")
+BENCH_FRAMES = 200          # Quadros (fixos) amostrados dos clipes
+MAX_LATENCY_REGRESSION = 0.10   # Piora tolerada em p50/p99 (10%)
+MAX_MEMORY_REGRESSION = 0.25    # Piora tolerada no pico de memória (25%)
+MIN_MAP_GAIN = 0.01             # Ganho de mAP50-95 que justifica um modelo mais lento
+MAX_MAP_DROP = 0.02             # Perda de mAP50-95 tolerada quando o modelo não fica mais rápido
+
+
+def benchmark_clips(extra=None):
+    """Clipes do conjunto fixo (Anexos/benchmark); 'extra' entra se a pasta não existir."""
+    if os.path.isdir(BENCH_CLIPS_DIR):
+        return sorted(os.path.join(BENCH_CLIPS_DIR, f) for f in os.listdir(BENCH_CLIPS_DIR)
+                      if f.lower().endswith(VIDEO_EXT))
+    return [p for p in (extra or []) if p and os.path.exists(p)]
+
+
+def _peak_memory_mb():
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+    except ImportError:
+        import psutil   # Windows: não há o módulo resource
+        return round(psutil.Process().memory_info().peak_wset / (1024 * 1024), 1)
+
+
+def _benchmark_job(weights, clips, data_yaml, imgsz):
+    """Roda num processo novo: latência, pico de memória e mAP no split de teste."""
+    import numpy as np
+    from ultralytics import YOLO
+    from sweep import load_clip_frames
+    model = YOLO(weights)
+    frames = load_clip_frames(clips, BENCH_FRAMES) if clips else []
+    if not frames:
+        frames = [np.zeros((imgsz, imgsz, 3), dtype=np.uint8)] * 50
+    for frame in frames[:5]:
+        model.predict(frame, imgsz=imgsz, device="cpu", verbose=False)
+    times = []
+    for frame in frames:
+        t0 = time.perf_counter()
+        model.predict(frame, imgsz=imgsz, device="cpu", verbose=False)
+        times.append((time.perf_counter() - t0) * 1000)
+    times.sort()
+    result = {"p50_ms": round(times[len(times) // 2], 2),
+              "p99_ms": round(times[min(len(times) - 1, int(len(times) * 0.99))], 2),
+              "quadros": len(frames)}
+    result["map5095"] = None
+    if data_yaml:
+        metrics = model.val(data=data_yaml, split="test", imgsz=imgsz, device="cpu", plots=False, verbose=False)
+        result["map5095"] = round(float(metrics.box.map), 4)
+    result["pico_memoria_mb"] = _peak_memory_mb()
+    return result
+
+
+def benchmark(weights, clips, data_yaml, imgsz=640):
+    with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn")) as pool:
+        return pool.submit(_benchmark_job, weights, clips, data_yaml, imgsz).result()
+
+
+def decide(candidate, current):
+    """(promover, motivo) comparando os resultados do candidato com os do promovido atual."""
+    if current is None:
+        return True, "Nenhum modelo promovido ainda."
+    gain = (candidate["map5095"] or 0.0) - (current["map5095"] or 0.0)
+    regressions = []
+    for key in ("p50_ms", "p99_ms"):
+        if candidate[key] > current[key] * (1 + MAX_LATENCY_REGRESSION):
+            regressions.append(f"{key} {current[key]:.1f} -> {candidate[key]:.1f}")
+    if candidate["pico_memoria_mb"] > current["pico_memoria_mb"] * (1 + MAX_MEMORY_REGRESSION):
+        regressions.append(f"memória {current['pico_memoria_mb']:.0f} -> {candidate['pico_memoria_mb']:.0f} MB")
+    if regressions and gain < MIN_MAP_GAIN:
+        return False, (f"Regressão de desempenho sem ganho de precisão (mAP50-95 {gain:+.3f}): "
+                       + "; ".join(regressions))
+    if regressions:
+        return True, f"Mais lento, mas o mAP50-95 subiu {gain:+.3f}: " + "; ".join(regressions)
+    if gain < -MAX_MAP_DROP and candidate["p50_ms"] >= current["p50_ms"]:
+        return False, f"mAP50-95 caiu {gain:+.3f} sem ganho de latência."
+    return True, f"Sem regressão de desempenho (mAP50-95 {gain:+.3f})."
+
+
+def load_promoted():
+    if not (os.path.exists(PROMOTED_META) and os.path.exists(PROMOTED_WEIGHTS)):
+        return None
+    with open(PROMOTED_META, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def promote(weights, report):
+    """
+    Copia os pesos para models/promoted.pt (tmp + rename), junto com o .onnx
+    exportado e o INT8 aprovado, se houver, e grava o relatório.
+    """
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    int8_ok = bool((report.get("int8") or {}).get("aprovado"))
+    copies = ((weights, PROMOTED_WEIGHTS), (onnx_path_for(weights), PROMOTED_ONNX),
+              (int8_path_for(weights) if int8_ok else "", PROMOTED_INT8),
+              (report_path_for(weights) if int8_ok else "", PROMOTED_INT8_REPORT))
+    for src, dst in copies:
+        if src and os.path.exists(src):
+            tmp = dst + ".tmp"
+            shutil.copy2(src, tmp)
+            os.replace(tmp, dst)
+        elif os.path.exists(dst):
+            os.remove(dst)  # .onnx/INT8 de um promovido anterior não vale para os novos pesos
+    meta = dict(report, origem=os.path.abspath(weights), sha1=sha1_file(weights), promovido_em=time.time())
+    tmp = PROMOTED_META + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, PROMOTED_META)
+    return meta
+
+
+def evaluate_and_promote(candidate, data_yaml, clips, imgsz=640, force=False, log_callback=print,
+                         labeled_paths=None):
+    """
+    Mede o candidato e o promovido atual e promove se passar na trava.
+    labeled_paths (fotos anotadas) calibram o INT8 quando o dataset não tem split de treino.
+    Retorna (promovido, motivo, relatório).
+    """
+    current_meta = load_promoted()
+    log_callback("Medindo o modelo candidato...")
+    cand = benchmark(candidate, clips, data_yaml, imgsz)
+    cur = None
+    if current_meta:
+        log_callback("Medindo o modelo promovido atual...")
+        cur = benchmark(PROMOTED_WEIGHTS, clips, data_yaml, imgsz)
+    ok, reason = decide(cand, cur)
+    report = {"candidato": cand, "atual": cur, "motivo": reason, "clipes": clips, "int8": None}
+    if (ok or force) and data_yaml and os.path.exists(onnx_path_for(candidate)):
+        log_callback("Quantizando para INT8 e comparando com o FP32...")
+        try:
+            report["int8"] = quantize_and_evaluate(candidate, data_yaml, imgsz, labeled_paths=labeled_paths)
+            reason += " " + report["int8"]["motivo"] + "."
+            report["motivo"] = reason
+        except Exception as e:
+            log_callback(f"Quantização INT8 não realizada: {e}")
+    if ok or force:
+        promote(candidate, report)
+    log_callback(("Promovido: " if ok or force else "Promoção recusada: ") + reason)
+    return ok or force, reason, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara um best.pt com o modelo promovido e promove se não regredir")
+    parser.add_argument("pesos", help="best.pt candidato")
+    parser.add_argument("--data", help="data.yaml (mAP no split de teste)")
+    parser.add_argument("--clipe", action="append", default=[], help="Clipe extra, se Anexos/benchmark não existir")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--forcar", action="store_true", help="Promove mesmo com regressão")
+    args = parser.parse_args()
+    ok, _, report = evaluate_and_promote(args.pesos, args.data, benchmark_clips(args.clipe), args.imgsz, args.forcar)
+    print(json.dumps(report, ensure_ascii=False, indent=1))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Quantização INT8 pós-treino (ONNX Runtime, CPU).
+
+Parte do best.onnx exportado ao fim do treino e gera best.int8.onnx com
+quantização estática (QDQ, pesos por canal), calibrada com imagens do
+nosso próprio dataset (output/train, ou as fotos anotadas do diário quando
+o dataset ainda não foi materializado). A cabeça de detecção final (DFL e
+decodificação das caixas) fica em FP32: é onde a quantização mais custa em
+precisão e quase nada rende em tempo.
+
+O modelo INT8 é comparado com o FP32 no split de teste (mAP50-95) e em
+latência na CPU. O relatório vai para best.int8.json; o INT8 só é aprovado
+(e só então usado pelo load_backend e copiado na promoção) se a queda de
+mAP50-95 ficar dentro de MAX_INT8_MAP_DROP.
+
+    python quantization.py runs/detect/train7/weights/best.pt --data output/data.yaml
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+
+from inference_backend import onnx_path_for, export_onnx
+
+CALIBRATION_IMAGES = 200    # Imagens usadas na calibração (espaçadas ao longo do split)
+LATENCY_FRAMES = 100        # Imagens do teste usadas na comparação de latência
+MAX_INT8_MAP_DROP = 0.01    # Queda de mAP50-95 tolerada no INT8 em relação ao FP32
+IMAGE_EXT = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def int8_path_for(weights_path):
+    return os.path.splitext(weights_path)[0] + ".int8.onnx"
+
+
+def report_path_for(weights_path):
+    return os.path.splitext(weights_path)[0] + ".int8.json"
+
+
+def load_report(weights_path):
+    path = report_path_for(weights_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def int8_approved(weights_path):
+    """True se existe um INT8 mais novo que os pesos e aprovado na comparação com o FP32."""
+    int8 = int8_path_for(weights_path)
+    if not (os.path.exists(int8) and os.path.exists(weights_path)):
+        return False
+    if os.path.getmtime(int8) < os.path.getmtime(weights_path):
+        return False
+    report = load_report(weights_path)
+    return bool(report and report.get("aprovado"))
+
+
+def _spaced(paths, limit):
+    paths = sorted(paths)
+    step = max(1, len(paths) // max(limit, 1))
+    return paths[::step][:limit]
+
+
+def calibration_images(output_dir, labeled_paths=None, limit=CALIBRATION_IMAGES):
+    """
+    Imagens do split de treino; sem dataset materializado, as fotos anotadas
+    do diário (labeled_paths, de AnnotationStore.labeled_image_paths()).
+    """
+    from dataset_builder import split_image_paths
+    paths = [p for split, p in split_image_paths(output_dir).values() if split == "train" and os.path.exists(p)]
+    if not paths and labeled_paths:
+        paths = [p for p in labeled_paths if os.path.exists(p)]
+    return _spaced(paths, limit)
+
+
+def split_images(output_dir, split="test", limit=LATENCY_FRAMES):
+    folder = os.path.join(output_dir, split)
+    if not os.path.isdir(folder):
+        return []
+    return _spaced([os.path.join(folder, f) for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXT)], limit)
+
+
+class _CalibrationReader:
+    """CalibrationDataReader do onnxruntime: entrega as imagens já no formato de entrada do modelo."""
+    def __init__(self, backend, image_paths):
+        self.backend = backend
+        self.paths = iter(image_paths)
+
+    def get_next(self):
+        import cv2
+        for path in self.paths:
+            frame = cv2.imread(path)
+            if frame is not None:
+                blob = self.backend._letterbox(frame)[0]
+                return {self.backend.input_name: blob}
+        return None
+
+    def rewind(self):
+        pass
+
+
+def _head_nodes(onnx_path):
+    """Nós da cabeça de detecção (exceto as convoluções), mantidos em FP32."""
+    import onnx
+    graph = onnx.load(onnx_path).graph
+    convs = [n.name for n in graph.node if n.op_type == "Conv"]
+    head = convs[-1].split("/")[1] if convs and convs[-1].startswith("/") else None
+    if head is None:
+        return []
+    return [n.name for n in graph.node if n.name.startswith(f"/{head}/") and n.op_type != "Conv"]
+
+
+def quantize_int8(weights_path, calib_paths, imgsz=640):
+    """Gera <pesos>.int8.onnx calibrado com calib_paths. Retorna o caminho."""
+    from onnxruntime.quantization import (quantize_static, QuantFormat, QuantType, CalibrationMethod)
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+    from inference_backend import OnnxBackend
+    if not calib_paths:
+        raise ValueError("Nenhuma imagem de calibração encontrada.")
+    fp32 = export_onnx(weights_path, imgsz)
+    target = int8_path_for(weights_path)
+    prepared = target + ".pre.onnx"
+    quant_pre_process(fp32, prepared, skip_symbolic_shape=True)
+    reader = _CalibrationReader(OnnxBackend(fp32), calib_paths)
+    tmp = target + ".tmp"
+    try:
+        quantize_static(prepared, tmp, reader, quant_format=QuantFormat.QDQ, per_channel=True,
+                        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+                        calibrate_method=CalibrationMethod.MinMax, nodes_to_exclude=_head_nodes(prepared))
+        os.replace(tmp, target)
+    finally:
+        for path in (prepared, tmp):
+            if os.path.exists(path):
+                os.remove(path)
+    return target
+
+
+def _latency(onnx_path, frames, threads=None):
+    from inference_backend import OnnxBackend
+    backend = OnnxBackend(onnx_path, threads=threads)
+    for frame in frames[:5]:
+        backend.detect(frame)
+    times = []
+    for frame in frames:
+        t0 = time.perf_counter()
+        backend.detect(frame)
+        times.append((time.perf_counter() - t0) * 1000)
+    times.sort()
+    return round(times[len(times) // 2], 2)
+
+
+def _map_test(onnx_path, data_yaml, imgsz):
+    from ultralytics import YOLO
+    metrics = YOLO(onnx_path, task="detect").val(data=data_yaml, split="test", imgsz=imgsz, device="cpu",
+                                                 plots=False, verbose=False)
+    return round(float(metrics.box.map), 4)
+
+
+def _quantize_job(weights_path, data_yaml, imgsz, threads, labeled_paths=None):
+    """Roda num processo novo: quantiza, mede mAP e latência de FP32 e INT8 e grava o relatório."""
+    import cv2
+    import numpy as np
+    output_dir = os.path.dirname(os.path.abspath(data_yaml))
+    calib = calibration_images(output_dir, labeled_paths)
+    int8 = quantize_int8(weights_path, calib, imgsz)
+    fp32 = onnx_path_for(weights_path)
+    frames = [f for f in (cv2.imread(p) for p in split_images(output_dir)) if f is not None]
+    if not frames:
+        frames = [np.zeros((imgsz, imgsz, 3), dtype=np.uint8)] * 50
+    report = {"fp32": {"map5095": _map_test(fp32, data_yaml, imgsz), "p50_ms": _latency(fp32, frames, threads)},
+              "int8": {"map5095": _map_test(int8, data_yaml, imgsz), "p50_ms": _latency(int8, frames, threads)},
+              "imagens_calibracao": len(calib), "quadros_latencia": len(frames)}
+    report["delta_map5095"] = round(report["int8"]["map5095"] - report["fp32"]["map5095"], 4)
+    report["ganho_latencia"] = round(report["fp32"]["p50_ms"] / report["int8"]["p50_ms"], 2)
+    report["aprovado"] = report["delta_map5095"] >= -MAX_INT8_MAP_DROP
+    report["motivo"] = (f"INT8: mAP50-95 {report['delta_map5095']:+.3f}, {report['ganho_latencia']:.2f}x mais rápido"
+                        + ("" if report["aprovado"] else f" (queda acima de {MAX_INT8_MAP_DROP}; INT8 recusado)"))
+    tmp = report_path_for(weights_path) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, report_path_for(weights_path))
+    return report
+
+
+def quantize_and_evaluate(weights_path, data_yaml, imgsz=640, threads=None, labeled_paths=None):
+    """
+    Quantização e comparação num processo separado (não carrega onnxruntime/torch
+    no chamador). labeled_paths: fotos anotadas, usadas na calibração se o
+    dataset não tiver split de treino.
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn")) as pool:
+        return pool.submit(_quantize_job, weights_path, data_yaml, imgsz, threads,
+                           list(labeled_paths or [])).result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantiza o modelo para INT8 e compara com o FP32 no split de teste")
+    parser.add_argument("pesos", help="best.pt (o best.onnx é exportado se faltar)")
+    parser.add_argument("--data", required=True, help="data.yaml do dataset (output/data.yaml)")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--threads", type=int, help="Threads do ONNX Runtime na medição de latência")
+    parser.add_argument("--fotos", help="Pasta de fotos cujo diário de anotações serve de calibração "
+                                        "se o dataset não tiver split de treino")
+    args = parser.parse_args()
+    labeled = None
+    if args.fotos:
+        from annotation_store import AnnotationStore
+        store = AnnotationStore(args.fotos)
+        labeled = store.labeled_image_paths()
+        store.close()
+    report = quantize_and_evaluate(args.pesos, args.data, args.imgsz, args.threads, labeled)
+    print(json.dumps(report, ensure_ascii=False, indent=1))
+    print(report["motivo"])
+    sys.exit(0 if report["aprovado"] else 1)
+
+
+if __name__ == "__main__":
+    main()
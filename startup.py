@@ -0,0 +1,156 @@
+"""
+Inicialização rápida dos aplicativos.
+
+Os módulos pesados (cv2, numpy, pymongo, e o backend do modelo: onnxruntime
+ou torch/ultralytics) não são importados no topo de copilot.py,
+treinamento.py e label_image.py. A janela abre primeiro; em seguida o
+StartupLoader roda em paralelo, em threads, as tarefas de inicialização
+(importar os módulos pesados, conectar ao MongoDB, carregar o modelo
+promovido) e informa o andamento para um rótulo da interface.
+
+O tempo de inicialização é acompanhado por um benchmark de importação, que
+grava o histórico em runs/startup_times.csv:
+    python startup.py [--janela] [--limite 1.5]
+"""
+import os
+import re
+import csv
+import sys
+import time
+import argparse
+import threading
+import subprocess
+import importlib
+import importlib.util
+
+MONGO_URI = "mongodb://localhost:27017/"
+MONGO_TIMEOUT_MS = 3000         # Tempo máximo para descobrir que o MongoDB está fora
+HEAVY_MODULES = ("numpy", "cv2", "pymongo")
+APPS = {"copilot": "VideoApp", "treinamento": "LabelingApp", "label_image": "LabelingApp"}
+BENCH_CSV = os.path.join(os.getcwd(), "runs", "startup_times.csv")
+
+
+def import_heavy(modules=HEAVY_MODULES):
+    """Importa os módulos pesados instalados (para que o primeiro uso não pague a importação)."""
+    loaded = []
+    for name in modules:
+        if importlib.util.find_spec(name) is not None:
+            importlib.import_module(name)
+            loaded.append(name)
+    return loaded
+
+
+def connect_mongo(uri=MONGO_URI, timeout_ms=MONGO_TIMEOUT_MS):
+    """MongoClient já verificado com um ping (levanta exceção se o servidor não responder)."""
+    from pymongo import MongoClient
+    client = MongoClient(uri, serverSelectionTimeoutMS=timeout_ms)
+    client.admin.command("ping")
+    return client
+
+
+class StartupLoader:
+    """
+    Tarefas de inicialização em paralelo, cada uma numa thread.
+    status_callback(texto) recebe o andamento ("Carregando: MongoDB, modelo"
+    ou "Pronto em 2.3 s") e é chamado das threads de trabalho: o aplicativo
+    deve repassá-lo à interface com after().
+    """
+    def __init__(self, status_callback=print):
+        self.status_callback = status_callback
+        self.pending = []
+        self.errors = {}
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+
+    def add(self, name, fn, on_done=None):
+        """Roda fn() em segundo plano; on_done(resultado, erro) ao terminar."""
+        with self.lock:
+            self.pending.append(name)
+        threading.Thread(target=self._run, args=(name, fn, on_done), daemon=True).start()
+        self._report()
+
+    def _run(self, name, fn, on_done):
+        result, error = None, None
+        try:
+            result = fn()
+        except Exception as e:
+            error = e
+        with self.lock:
+            self.pending.remove(name)
+            if error is not None:
+                self.errors[name] = error
+        if on_done:
+            on_done(result, error)
+        self._report()
+
+    def _report(self):
+        with self.lock:
+            pending = list(self.pending)
+            failed = list(self.errors)
+        if pending:
+            text = "Carregando: " + ", ".join(pending) + "..."
+        else:
+            text = f"Pronto em {time.perf_counter() - self.started:.1f} s"
+            if failed:
+                text += " (falhou: " + ", ".join(failed) + ")"
+        self.status_callback(text)
+
+
+# ========================================================
+# Benchmark de inicialização (linha de comando)
+# ========================================================
+def _time_import(module, window=False):
+    """(segundos até importar o módulo [e mostrar a janela], saída de -X importtime)."""
+    code = f"import time; t = time.perf_counter(); import {module}"
+    if window:
+        code += f"; app = {module}.{APPS[module]}(); app.update(); app.destroy()"
+    code += "; print(time.perf_counter() - t)"
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "falhou")
+    return float(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def slowest_imports(importtime_output, top=8):
+    """Pacotes de primeiro nível mais caros (tempo cumulativo, em segundos)."""
+    totals = {}
+    for line in importtime_output.splitlines():
+        m = re.match(r"import time:\s+\d+\s+\|\s+(\d+)\s+\|( *)(\S+)", line)
+        if m and len(m.group(2)) <= 1:     # Só importações de primeiro nível
+            name = m.group(3).split(".")[0]
+            totals[name] = totals.get(name, 0) + int(m.group(1)) / 1e6
+    return sorted(totals.items(), key=lambda kv: -kv[1])[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede o tempo de importação (e de abertura) dos aplicativos")
+    parser.add_argument("--apps", default=",".join(APPS), help="Módulos a medir")
+    parser.add_argument("--janela", action="store_true", help="Inclui a criação da janela (precisa de display)")
+    parser.add_argument("--limite", type=float, help="Falha (código 1) se algum app passar deste tempo, em s")
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(BENCH_CSV), exist_ok=True)
+    new_file = not os.path.exists(BENCH_CSV)
+    over = False
+    with open(BENCH_CSV, "a", newline="") as f:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(["data", "app", "janela", "segundos"])
+        for module in args.apps.split(","):
+            try:
+                seconds, trace = _time_import(module, args.janela)
+            except RuntimeError as e:
+                print(f"{module}: erro ({e})")
+                continue
+            writer.writerow([time.strftime("%Y-%m-%d %H:%M:%S"), module, int(args.janela), round(seconds, 3)])
+            over = over or (args.limite is not None and seconds > args.limite)
+            print(f"{module}: {seconds:.2f} s")
+            for name, cost in slowest_imports(trace):
+                print(f"    {name:<24}{cost:>8.3f} s")
+    print(f"Histórico em {BENCH_CSV}")
+    sys.exit(1 if over else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Varredura de tamanho de modelo (YOLOv8 n/s/m) e imgsz na CPU.
+
+Treina e valida cada combinação da grade em processos paralelos, dentro de
+um orçamento de núcleos (cada processo recebe cpus // paralelo threads do
+torch e o dataloader roda sem workers extras). Depois, com a máquina livre,
+mede em sequência a latência real de inferência na CPU (mediana, p95) e a
+vazão sobre quadros dos nossos clipes, e imprime a tabela de Pareto
+(latência x mAP50-95): o modelo mais barato que ainda atinge a precisão
+desejada é a escolha.
+
+    python sweep.py --data output/data.yaml --modelos n,s,m --imgsz 320,480,640 \\
+        --epocas 50 --cpus 8 --paralelo 2 --clipe Anexos/video.mp4 --map-min 0.6
+
+Cada combinação vira um experimento no registro (experiment_registry.py,
+modo "sweep"), e a tabela é gravada em runs/sweep/pareto.csv.
+"""
+import os
+import csv
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from experiment_registry import ExperimentRegistry, METRIC_KEYS
+
+SWEEP_DIR = os.path.join(os.getcwd(), "runs", "sweep")
+DEFAULT_DATA = os.path.join(os.getcwd(), "output", "data.yaml")
+MEASURE_FRAMES = 200        # Quadros dos clipes usados na medição de latência
+WARMUP_FRAMES = 5
+
+
+def _train_job(size, imgsz, data, epochs, threads):
+    """Treina e valida uma combinação (roda num processo do pool)."""
+    import torch
+    from ultralytics import YOLO
+    torch.set_num_threads(threads)
+    start = time.time()
+    model = YOLO(f"yolov8{size}.pt")
+    model.train(data=data, epochs=epochs, imgsz=imgsz, workers=0, device="cpu",
+                project=SWEEP_DIR, name=f"{size}-{imgsz}", exist_ok=True, plots=False, verbose=False)
+    save_dir = str(model.trainer.save_dir)
+    return {"modelo": size, "imgsz": imgsz, "run_dir": save_dir,
+            "weights": os.path.join(save_dir, "weights", "best.pt"),
+            "metricas": {k: float(v) for k, v in (model.trainer.metrics or {}).items()},
+            "tempo_treino": round(time.time() - start, 1)}
+
+
+def load_clip_frames(paths, max_frames=MEASURE_FRAMES):
+    """Quadros espaçados uniformemente ao longo dos clipes (no máximo max_frames)."""
+    import cv2
+    frames = []
+    per_clip = max(1, max_frames // max(len(paths), 1))
+    for path in paths:
+        cap = cv2.VideoCapture(path)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or per_clip
+        step = max(1, total // per_clip)
+        for i in range(0, total, step):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, i)
+            ok, frame = cap.read()
+            if not ok or len(frames) >= max_frames:
+                break
+            frames.append(frame)
+        cap.release()
+    return frames
+
+
+def measure_inference(weights, imgsz, frames, threads):
+    """Latência (mediana e p95, ms por quadro) e vazão (quadros/s) na CPU."""
+    import numpy as np
+    import torch
+    from ultralytics import YOLO
+    torch.set_num_threads(threads)
+    model = YOLO(weights)
+    if not frames:
+        frames = [np.zeros((imgsz, imgsz, 3), dtype=np.uint8)] * 50
+    for frame in frames[:WARMUP_FRAMES]:
+        model.predict(frame, imgsz=imgsz, device="cpu", verbose=False)
+    times = []
+    start = time.perf_counter()
+    for frame in frames:
+        t0 = time.perf_counter()
+        model.predict(frame, imgsz=imgsz, device="cpu", verbose=False)
+        times.append((time.perf_counter() - t0) * 1000)
+    elapsed = time.perf_counter() - start
+    times.sort()
+    return {"latencia_ms": round(times[len(times) // 2], 2),
+            "p95_ms": round(times[min(len(times) - 1, int(len(times) * 0.95))], 2),
+            "fps": round(len(frames) / elapsed, 1)}
+
+
+def pareto_front(rows, cost="latencia_ms", gain="map5095"):
+    """Marca em cada linha se ela é ótima de Pareto (nenhuma outra é mais barata e mais precisa)."""
+    for row in rows:
+        row["pareto"] = not any(
+            other is not row and other[cost] <= row[cost] and other[gain] >= row[gain]
+            and (other[cost] < row[cost] or other[gain] > row[gain])
+            for other in rows)
+    return rows
+
+
+def print_table(rows, map_min=None):
+    header = f"{'':2}{'modelo':>7}{'imgsz':>7}{'mAP50':>8}{'mAP50-95':>10}{'ms/quadro':>11}{'p95':>8}{'fps':>7}"
+    print(header)
+    print("-" * len(header))
+    for r in rows:
+        print(f"{'*' if r['pareto'] else ' ':2}{r['modelo']:>7}{r['imgsz']:>7}{r['map50']:>8.3f}"
+              f"{r['map5095']:>10.3f}{r['latencia_ms']:>11.1f}{r['p95_ms']:>8.1f}{r['fps']:>7.1f}")
+    print("* = fronteira de Pareto (latência x mAP50-95)")
+    if map_min is not None:
+        ok = [r for r in rows if r["map5095"] >= map_min]
+        if ok:
+            best = min(ok, key=lambda r: r["latencia_ms"])
+            print(f"Mais barato com mAP50-95 >= {map_min}: yolov8{best['modelo']} imgsz={best['imgsz']} "
+                  f"({best['latencia_ms']:.1f} ms/quadro) -> {best['weights']}")
+        else:
+            print(f"Nenhuma combinação atingiu mAP50-95 >= {map_min}.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Varredura de modelo/imgsz na CPU com tabela de Pareto")
+    parser.add_argument("--data", default=DEFAULT_DATA, help="data.yaml do dataset")
+    parser.add_argument("--modelos", default="n,s,m", help="Tamanhos do YOLOv8 (n,s,m,l,x)")
+    parser.add_argument("--imgsz", default="320,480,640", help="Valores de imgsz")
+    parser.add_argument("--epocas", type=int, default=50)
+    parser.add_argument("--cpus", type=int, default=os.cpu_count() or 1, help="Núcleos disponíveis")
+    parser.add_argument("--paralelo", type=int, default=2, help="Treinos simultâneos")
+    parser.add_argument("--clipe", action="append", default=[], help="Vídeo para medir latência (repetível)")
+    parser.add_argument("--map-min", type=float, help="mAP50-95 mínimo aceitável")
+    args = parser.parse_args()
+
+    grid = [(m.strip(), int(i)) for m in args.modelos.split(",") for i in args.imgsz.split(",")]
+    parallel = max(1, min(args.paralelo, args.cpus, len(grid)))
+    threads = max(1, args.cpus // parallel)
+    print(f"{len(grid)} combinações, {parallel} em paralelo, {threads} threads cada.")
+
+    trained = []
+    with ProcessPoolExecutor(max_workers=parallel) as pool:
+        futures = {pool.submit(_train_job, m, i, args.data, args.epocas, threads): (m, i) for m, i in grid}
+        for future in as_completed(futures):
+            m, i = futures[future]
+            try:
+                trained.append(future.result())
+                print(f"  treinado: yolov8{m} imgsz={i}")
+            except Exception as e:
+                print(f"  falhou: yolov8{m} imgsz={i}: {e}")
+
+    # Medição em sequência, com a máquina livre e o orçamento inteiro de núcleos
+    frames = load_clip_frames(args.clipe) if args.clipe else []
+    registry = ExperimentRegistry()
+    rows = []
+    for job in sorted(trained, key=lambda j: (j["modelo"], j["imgsz"])):
+        speed = measure_inference(job["weights"], job["imgsz"], frames, args.cpus)
+        row = dict(job, **speed)
+        for column, key in METRIC_KEYS.items():
+            row[column] = job["metricas"].get(key, 0.0)
+        rows.append(row)
+        registry.register(job["run_dir"], job["weights"], mode="sweep", base_model=f"yolov8{job['modelo']}.pt",
+                          hyperparams={"epochs": args.epocas, "imgsz": job["imgsz"], "workers": 0},
+                          metrics=job["metricas"], latency_ms=speed["latencia_ms"])
+
+    rows = pareto_front(sorted(rows, key=lambda r: r["latencia_ms"]))
+    print_table(rows, args.map_min)
+    os.makedirs(SWEEP_DIR, exist_ok=True)
+    fields = ["pareto", "modelo", "imgsz", "map50", "map5095", "precisao", "recall",
+              "latencia_ms", "p95_ms", "fps", "tempo_treino", "weights"]
+    with open(os.path.join(SWEEP_DIR, "pareto.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
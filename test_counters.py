@@ -0,0 +1,155 @@
+"""Testes dos contadores compartilhados (counters.py): turnos, numeração e reenvio idempotente."""
+from datetime import datetime
+
+import pytest
+
+from counters import shift_of, counter_key, number_events, batch_total, CounterService
+from event_store import make_count_event
+
+
+@pytest.mark.parametrize("hora, esperado", [
+    (datetime(2025, 3, 27, 6, 0), ("2025-03-27", "T1")),
+    (datetime(2025, 3, 27, 13, 59), ("2025-03-27", "T1")),
+    (datetime(2025, 3, 27, 14, 0), ("2025-03-27", "T2")),
+    (datetime(2025, 3, 27, 21, 59), ("2025-03-27", "T2")),
+    (datetime(2025, 3, 27, 22, 0), ("2025-03-27", "T3")),
+    (datetime(2025, 3, 28, 0, 30), ("2025-03-27", "T3")),
+    (datetime(2025, 3, 28, 5, 59), ("2025-03-27", "T3")),
+    (datetime(2025, 3, 1, 2, 0), ("2025-02-28", "T3")),
+])
+def test_shift_of(hora, esperado):
+    assert shift_of(hora) == esperado
+
+
+def test_counter_key_usa_o_dia_do_turno():
+    assert counter_key("linha_1", "1318", datetime(2025, 3, 28, 3, 0)) == "linha_1|1318|2025-03-27|T3"
+
+
+def test_number_events_numera_ate_o_total():
+    eventos = [{"classe": "Aprovado"}] * 3
+    assert [e["total"] for e in number_events(eventos, 10)] == [8, 9, 10]
+
+
+def test_batch_total():
+    doc = {"lotes": [{"id": "a", "total": 5}, {"id": "b", "total": 9}]}
+    assert batch_total(doc, "b") == 9
+    assert batch_total(doc, "c") is None
+    assert batch_total(None, "a") is None
+
+
+# ---------- CounterService com um MongoDB simulado ----------
+class FakeCounters:
+    """
+    Simula o contrato do find_one_and_update com o filtro por id de lote:
+    um lote já registrado não casa com o filtro, e o upsert falha com chave
+    duplicada. 'perder_respostas' aplica a soma e então falha (resposta perdida).
+    """
+    def __init__(self, falhas_antes=0, perder_respostas=0):
+        self.docs = {}
+        self.falhas_antes = falhas_antes
+        self.perder_respostas = perder_respostas
+
+    def find_one_and_update(self, filtro, update, upsert, return_document):
+        from pymongo.errors import DuplicateKeyError
+        if self.falhas_antes:
+            self.falhas_antes -= 1
+            raise ConnectionError("MongoDB fora")
+        batch_id = filtro["lotes.id"]["$ne"]
+        n = update[0]["$set"]["total"]["$add"][1]
+        doc = self.docs.setdefault(filtro["_id"], {"_id": filtro["_id"], "total": 0, "lotes": []})
+        if batch_total(doc, batch_id) is not None:
+            raise DuplicateKeyError("E11000")
+        doc["total"] += n
+        doc["lotes"].append({"id": batch_id, "total": doc["total"]})
+        if self.perder_respostas:
+            self.perder_respostas -= 1
+            raise ConnectionError("resposta perdida")
+        return doc
+
+    def find_one(self, filtro):
+        return self.docs.get(filtro["_id"])
+
+
+class FakeCatalog:
+    def __init__(self):
+        self.docs = []
+
+    def find_one(self, filtro=None, sort=None):
+        if sort:
+            return max(self.docs, key=lambda d: d["_id"]) if self.docs else None
+        return next((d for d in self.docs if all(d.get(k) == v for k, v in filtro.items())), None)
+
+    def insert_one(self, doc):
+        self.docs.append(doc)
+
+
+class FakeEvents:
+    def __init__(self):
+        self.docs = []
+
+    def insert_many(self, docs, ordered):
+        self.docs.extend(dict(d) for d in docs)
+
+
+def _service(counters):
+    pytest.importorskip("pymongo")
+    db = {"counters": counters, "event_logs": FakeEvents(), "catalog": FakeCatalog()}
+    return CounterService(db, log_callback=lambda msg: None), db
+
+
+def _evento(hora=datetime(2025, 3, 27, 9, 0)):
+    return make_count_event("Aprovado", "Placa Sextavada", "1318", hora, None)
+
+
+def test_lote_numera_os_eventos_gravados():
+    service, db = _service(FakeCounters())
+    for _ in range(3):
+        service.record(_evento())
+    service.flush()
+    assert [d["n"] for d in db["event_logs"].docs] == [1, 2, 3]
+    assert service.record(_evento()) == 4      # Estimativa: total confirmado + fila
+
+
+@pytest.mark.parametrize("counters", [FakeCounters(falhas_antes=1), FakeCounters(perder_respostas=1)])
+def test_reenvio_nao_soma_o_lote_duas_vezes(counters):
+    service, db = _service(counters)
+    for _ in range(3):
+        service.record(_evento())
+    service.flush()                             # Falha: o lote fica pendente
+    assert db["event_logs"].docs == []
+    service.record(_evento())
+    service.flush()
+    assert counters.docs["linha_1|1318|2025-03-27|T1"]["total"] == 4
+    assert [d["n"] for d in db["event_logs"].docs] == [1, 2, 3, 4]
+
+
+def test_fila_limitada_com_o_mongodb_fora(monkeypatch):
+    import counters
+    monkeypatch.setattr(counters, "MAX_PENDING", 10)
+    service, db = _service(FakeCounters(falhas_antes=1000))
+    for _ in range(5):
+        for _ in range(4):
+            service.record(_evento())
+        service.flush()
+    retidos = len(service.pending) + sum(len(evs) for _, _, evs in service.inflight) + len(service.ready)
+    assert retidos == service.size == 10
+    assert len(service.inflight) == 1                # Sem lotes novos enquanto o anterior não é confirmado
+
+
+def test_conecta_sob_demanda_sem_perder_eventos():
+    pytest.importorskip("pymongo")
+    db = {"counters": FakeCounters(), "event_logs": FakeEvents(), "catalog": FakeCatalog()}
+    tentativas = []
+
+    def connect():
+        tentativas.append(1)
+        if len(tentativas) == 1:
+            raise ConnectionError("MongoDB fora")
+        return db
+
+    service = CounterService(connect=connect, log_callback=lambda msg: None)
+    service.record(_evento())
+    service.flush()
+    service.record(_evento())
+    service.flush()
+    assert [d["n"] for d in db["event_logs"].docs] == [1, 2]
@@ -0,0 +1,277 @@
+"""
+Navegador de miniaturas para pastas grandes de fotos.
+
+- A pasta é varrida de forma preguiçosa com os.scandir, em segundo plano.
+- As miniaturas ficam num índice SQLite persistente, chaveado por caminho,
+  mtime e tamanho: ao reabrir a pasta, nada precisa ser decodificado de novo.
+- A grade é virtualizada: só as linhas visíveis do canvas têm itens e
+  PhotoImages, então dezenas de milhares de fotos não pesam na interface.
+- Cada miniatura mostra se a foto já foi rotulada (verde) ou não (vermelho).
+"""
+import io
+import os
+import queue
+import sqlite3
+import threading
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageTk
+
+VALID_EXT = ('.jpg', '.jpeg', '.png', '.bmp')
+THUMB_SIZE = 128
+CELL_W = THUMB_SIZE + 16
+CELL_H = THUMB_SIZE + 30
+THUMB_DB = os.path.join(os.getcwd(), "cache", "thumbnails.sqlite")
+
+
+def scan_photo_dir(photo_dir):
+    """Gera (caminho, mtime_ns, tamanho) das imagens da pasta, sem listar tudo antes."""
+    with os.scandir(photo_dir) as it:
+        for entry in it:
+            if entry.is_file() and entry.name.lower().endswith(VALID_EXT):
+                st = entry.stat()
+                yield entry.path, st.st_mtime_ns, st.st_size
+
+
+class ThumbnailIndex:
+    """Cache persistente de miniaturas (JPEG) em SQLite."""
+    def __init__(self, db_path=THUMB_DB):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS thumbs ("
+                " path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, data BLOB)")
+            self.conn.commit()
+
+    def get(self, path, mtime_ns, size):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT data FROM thumbs WHERE path = ? AND mtime_ns = ? AND size = ?",
+                (path, mtime_ns, size)).fetchone()
+        return row[0] if row else None
+
+    def put(self, path, mtime_ns, size, data):
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO thumbs VALUES (?, ?, ?, ?)",
+                              (path, mtime_ns, size, data))
+            self.conn.commit()
+
+    def get_or_create(self, path, mtime_ns, size):
+        """Retorna a miniatura do índice ou gera (com decodificação reduzida) e grava."""
+        data = self.get(path, mtime_ns, size)
+        if data is not None:
+            return data
+        img = Image.open(path)
+        img.draft("RGB", (THUMB_SIZE, THUMB_SIZE))
+        img = img.convert("RGB")
+        img.thumbnail((THUMB_SIZE, THUMB_SIZE), Image.Resampling.LANCZOS)
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=80)
+        data = buf.getvalue()
+        self.put(path, mtime_ns, size, data)
+        return data
+
+
+class ThumbnailBrowser(tk.Toplevel):
+    """
+    Janela com a grade de miniaturas da pasta.
+    on_select(caminho) é chamado ao clicar numa miniatura;
+    is_labeled(caminho) informa o estado de rotulagem de cada foto.
+    """
+    def __init__(self, master, photo_dir, on_select, is_labeled, index=None):
+        super().__init__(master)
+        self.title("Navegador de Miniaturas - Vega Robotics")
+        self.geometry("900x700")
+        self.configure(bg="#2e2e2e")
+        self.on_select = on_select
+        self.is_labeled = is_labeled
+        self.index = index or ThumbnailIndex()
+
+        self.entries = []               # (caminho, mtime_ns, tamanho) na ordem da varredura
+        self.rendered = {}              # posição -> ids dos itens no canvas
+        self.photos = {}                # posição -> PhotoImage (apenas células visíveis)
+        self.requested = set()          # posições com miniatura já solicitada
+        self.results = queue.Queue()    # Resultados das threads de fundo para o loop do Tk
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="thumbs")
+        self.selected = -1
+        self.grid_size = None           # (colunas, linhas) do scrollregion atual
+        self.closed = False
+
+        top = tk.Frame(self, bg="#2e2e2e")
+        top.pack(fill=tk.X)
+        self.status_label = tk.Label(top, text="Varrendo pasta...", bg="#2e2e2e", fg="white")
+        self.status_label.pack(side=tk.LEFT, padx=10, pady=5)
+        tk.Button(top, text="Próxima não rotulada", command=self.jump_to_next_unlabeled,
+                  bg="#3e3e3e", fg="white", activebackground="#5a5a5a").pack(side=tk.RIGHT, padx=10, pady=5)
+
+        body = tk.Frame(self, bg="#2e2e2e")
+        body.pack(fill=tk.BOTH, expand=True)
+        self.canvas = tk.Canvas(body, bg="#2e2e2e", highlightthickness=0)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.vbar = tk.Scrollbar(body, orient=tk.VERTICAL, command=self.on_scrollbar)
+        self.vbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.config(yscrollcommand=self.on_yscroll)
+        self.canvas.bind("<Configure>", lambda e: self.redraw())
+        self.canvas.bind("<MouseWheel>", self.on_mousewheel)
+        self.canvas.bind("<Button-4>", lambda e: self.scroll_units(-3))
+        self.canvas.bind("<Button-5>", lambda e: self.scroll_units(3))
+        self.canvas.bind("<Button-1>", self.on_click)
+        self.protocol("WM_DELETE_WINDOW", self.close)
+
+        threading.Thread(target=self.scan_worker, args=(photo_dir,), daemon=True).start()
+        self.after(50, self.process_results)
+        self.after(1000, self.refresh_labels)
+
+    # ---------- Threads de fundo ----------
+    def scan_worker(self, photo_dir):
+        chunk = []
+        for entry in scan_photo_dir(photo_dir):
+            if self.closed:
+                return
+            chunk.append(entry)
+            if len(chunk) >= 500:
+                self.results.put(("scan", chunk))
+                chunk = []
+        self.results.put(("scan", chunk))
+        self.results.put(("scan_done", None))
+
+    def thumb_worker(self, pos, entry):
+        # Células que já saíram da tela antes da vez delas não são decodificadas
+        if self.closed or pos not in self.requested:
+            return
+        try:
+            data = self.index.get_or_create(*entry)
+        except Exception:
+            data = None
+        self.results.put(("thumb", (pos, data)))
+
+    def process_results(self):
+        """Aplica no Tk os resultados das threads (varredura e miniaturas)."""
+        if self.closed:
+            return
+        changed = False
+        try:
+            while True:
+                kind, payload = self.results.get_nowait()
+                if kind == "scan":
+                    self.entries.extend(payload)
+                    self.status_label.config(text=f"{len(self.entries)} fotos encontradas...")
+                    changed = True
+                elif kind == "scan_done":
+                    self.status_label.config(text=f"{len(self.entries)} fotos")
+                elif kind == "thumb":
+                    pos, data = payload
+                    if pos in self.rendered and data:
+                        self.photos[pos] = ImageTk.PhotoImage(Image.open(io.BytesIO(data)))
+                        self.canvas.itemconfig(self.rendered[pos][1], image=self.photos[pos])
+        except queue.Empty:
+            pass
+        if changed:
+            self.redraw()
+        self.after(50, self.process_results)
+
+    # ---------- Grade virtualizada ----------
+    def columns(self):
+        return max(1, self.canvas.winfo_width() // CELL_W)
+
+    def redraw(self):
+        """Cria itens só para as linhas visíveis e remove os que saíram da tela."""
+        cols = self.columns()
+        rows = (len(self.entries) + cols - 1) // cols
+        if (cols, rows) != self.grid_size:
+            # Só quando a grade muda: cada config do canvas agenda um yscrollcommand
+            self.grid_size = (cols, rows)
+            self.canvas.config(scrollregion=(0, 0, cols * CELL_W, max(rows * CELL_H, 1)))
+        y0 = self.canvas.canvasy(0)
+        first_row = int(y0 // CELL_H)
+        last_row = int((y0 + self.canvas.winfo_height()) // CELL_H) + 1
+        visible = set(range(first_row * cols, min(len(self.entries), (last_row + 1) * cols)))
+
+        for pos in list(self.rendered):
+            if pos not in visible or self.rendered[pos][3] != cols:
+                for item in self.rendered.pop(pos)[:3]:
+                    self.canvas.delete(item)
+                self.photos.pop(pos, None)
+                self.requested.discard(pos)
+        for pos in sorted(visible - set(self.rendered)):
+            self.draw_cell(pos, cols)
+
+    def draw_cell(self, pos, cols):
+        path = self.entries[pos][0]
+        x = (pos % cols) * CELL_W + 8
+        y = (pos // cols) * CELL_H + 4
+        border = self.canvas.create_rectangle(x - 2, y - 2, x + THUMB_SIZE + 2, y + THUMB_SIZE + 2,
+                                              outline=self.cell_color(pos), width=2)
+        image = self.canvas.create_image(x + THUMB_SIZE // 2, y + THUMB_SIZE // 2, anchor=tk.CENTER)
+        name = os.path.basename(path)
+        label = self.canvas.create_text(x + THUMB_SIZE // 2, y + THUMB_SIZE + 12,
+                                        text=name if len(name) <= 18 else name[:15] + "...",
+                                        fill="white", font=("Arial", 8))
+        self.rendered[pos] = (border, image, label, cols)
+        if pos not in self.requested:
+            self.requested.add(pos)
+            self.executor.submit(self.thumb_worker, pos, self.entries[pos])
+
+    def cell_color(self, pos):
+        if pos == self.selected:
+            return "yellow"
+        return "lime" if self.is_labeled(self.entries[pos][0]) else "red"
+
+    def update_cell_colors(self):
+        for pos, (border, _, _, _) in self.rendered.items():
+            self.canvas.itemconfig(border, outline=self.cell_color(pos))
+
+    def refresh_labels(self):
+        """Atualiza as cores das células visíveis conforme a rotulagem avança."""
+        if self.closed:
+            return
+        self.update_cell_colors()
+        self.after(1000, self.refresh_labels)
+
+    # ---------- Rolagem e seleção ----------
+    def on_yscroll(self, first, last):
+        self.vbar.set(first, last)
+
+    def on_scrollbar(self, *args):
+        self.canvas.yview(*args)
+        self.redraw()
+
+    def scroll_units(self, units):
+        self.canvas.yview_scroll(units, "units")
+        self.redraw()
+
+    def on_mousewheel(self, event):
+        self.scroll_units(-1 if event.delta > 0 else 1)
+
+    def on_click(self, event):
+        cols = self.columns()
+        col = int(self.canvas.canvasx(event.x) // CELL_W)
+        row = int(self.canvas.canvasy(event.y) // CELL_H)
+        pos = row * cols + col
+        if col < cols and 0 <= pos < len(self.entries):
+            self.select(pos)
+
+    def select(self, pos):
+        self.selected = pos
+        self.on_select(self.entries[pos][0])
+        self.update_cell_colors()
+
+    def jump_to_next_unlabeled(self):
+        """Rola até a próxima foto não rotulada após a seleção atual e a abre."""
+        n = len(self.entries)
+        for k in range(1, n + 1):
+            pos = (self.selected + k) % n
+            if not self.is_labeled(self.entries[pos][0]):
+                rows = (n + self.columns() - 1) // self.columns()
+                self.canvas.yview_moveto((pos // self.columns()) / max(rows, 1))
+                self.redraw()
+                self.select(pos)
+                return
+        self.status_label.config(text="Todas as fotos estão rotuladas.")
+
+    def close(self):
+        self.closed = True
+        self.executor.shutdown(wait=False)
+        self.destroy()
@@ -0,0 +1,136 @@
+"""
+Treinamento YOLO em um processo separado.
+
+O YOLO.train roda num processo filho (contexto "spawn", sem herdar o Tk),
+então não disputa o GIL com a interface. A cada época o filho envia pelo
+pipe um dicionário com as métricas:
+    {"tipo": "epoca", "epoca": 12, "epocas": 150, "perdas": {...},
+     "metricas": {...}, "tempo_epoca": 8.4, "eta": 1160.0}
+e ao final uma das mensagens "fim", "pausado", "cancelado" ou "erro". A
+mensagem "fim" traz as métricas finais do best.pt, a latência dele na CPU e
+o caminho do best.onnx exportado, tudo feito ainda no processo filho.
+
+Pausar e cancelar são cooperativos: o pai liga um Event e o filho, no fim
+da época corrente (depois de gravar o last.pt), interrompe o treino. Na
+pausa o checkpoint é copiado para weights/pause.pt antes da avaliação
+final (que remove o otimizador do last.pt), e o treino é retomado dele
+com resume=True.
+"""
+import os
+import time
+import shutil
+import multiprocessing as mp
+
+BASE_MODEL = "yolov8n.pt"
+PAUSE_CHECKPOINT = "pause.pt"
+
+
+def _training_main(conn, pause_event, cancel_event, data_yaml, epochs, imgsz, workers, resume_from,
+                   base_model, extra):
+    """Corpo do processo filho: treina e envia as métricas pelo pipe."""
+    from ultralytics import YOLO
+    from experiment_registry import measure_cpu_latency
+    from inference_backend import export_onnx
+    state = {"epoca_inicio": time.time(), "tempos": []}
+
+    def on_train_epoch_start(trainer):
+        state["epoca_inicio"] = time.time()
+
+    def on_fit_epoch_end(trainer):
+        elapsed = time.time() - state["epoca_inicio"]
+        state["tempos"].append(elapsed)
+        epoch = trainer.epoch + 1
+        total = trainer.epochs
+        mean = sum(state["tempos"]) / len(state["tempos"])
+        losses = trainer.label_loss_items(trainer.tloss, prefix="train") if trainer.tloss is not None else {}
+        conn.send({"tipo": "epoca", "epoca": epoch, "epocas": total,
+                   "perdas": {k: round(float(v), 5) for k, v in losses.items()},
+                   "metricas": {k: round(float(v), 5) for k, v in (trainer.metrics or {}).items()},
+                   "tempo_epoca": round(elapsed, 2), "eta": round(mean * (total - epoch), 1)})
+        if pause_event.is_set() or cancel_event.is_set():
+            if pause_event.is_set() and os.path.exists(trainer.last):
+                shutil.copy2(trainer.last, os.path.join(trainer.wdir, PAUSE_CHECKPOINT))
+            trainer.stop = True
+
+    try:
+        model = YOLO(resume_from or base_model)
+        model.add_callback("on_train_epoch_start", on_train_epoch_start)
+        model.add_callback("on_fit_epoch_end", on_fit_epoch_end)
+        if resume_from:
+            model.train(resume=True)
+        else:
+            model.train(data=data_yaml, epochs=epochs, imgsz=imgsz, workers=workers, **extra)
+        save_dir = str(model.trainer.save_dir)
+        if cancel_event.is_set():
+            conn.send({"tipo": "cancelado", "save_dir": save_dir})
+        elif pause_event.is_set():
+            conn.send({"tipo": "pausado", "save_dir": save_dir,
+                       "checkpoint": os.path.join(save_dir, "weights", PAUSE_CHECKPOINT)})
+        else:
+            best = os.path.join(save_dir, "weights", "best.pt")
+            try:
+                onnx_path = export_onnx(best, imgsz=model.trainer.args.imgsz)  # Para o backend ONNX Runtime
+            except Exception as e:
+                print("Falha na exportação ONNX:", e)
+                onnx_path = None
+            try:
+                latency = measure_cpu_latency(best, imgsz=model.trainer.args.imgsz)
+            except Exception:
+                latency = None
+            conn.send({"tipo": "fim", "save_dir": save_dir, "best": best, "onnx": onnx_path, "latencia_ms": latency,
+                       "metricas": {k: float(v) for k, v in (model.trainer.metrics or {}).items()}})
+    except Exception as e:
+        conn.send({"tipo": "erro", "mensagem": str(e)})
+    finally:
+        conn.close()
+
+
+class TrainingJob:
+    """
+    Processo de treinamento e o canal de mensagens com ele (lado da interface).
+    base_model: pesos de partida (yolov8n.pt ou o best.pt anterior, no treino incremental);
+    extra: argumentos adicionais do YOLO.train (ex.: patience).
+    """
+    def __init__(self, data_yaml, epochs, imgsz, workers, resume_from=None, base_model=BASE_MODEL, extra=None):
+        ctx = mp.get_context("spawn")
+        self.conn, child_conn = ctx.Pipe(duplex=False)
+        self.pause_event = ctx.Event()
+        self.cancel_event = ctx.Event()
+        # Não-daemon: o treino cria seus próprios processos (workers do dataloader)
+        self.process = ctx.Process(target=_training_main, name="yolo-train",
+                                   args=(child_conn, self.pause_event, self.cancel_event,
+                                         data_yaml, epochs, imgsz, workers, resume_from,
+                                         base_model, extra or {}))
+        self._child_conn = child_conn
+        self.finished = False
+
+    def start(self):
+        self.process.start()
+        self._child_conn.close()    # Só o filho escreve; assim o EOF chega quando ele terminar
+
+    def pause(self):
+        self.pause_event.set()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def terminate(self):
+        """Encerra à força (ex.: o aplicativo está fechando)."""
+        if self.process.is_alive():
+            self.process.terminate()
+
+    def messages(self):
+        """Mensagens já recebidas, sem bloquear. Um filho que morreu sem avisar vira 'erro'."""
+        out = []
+        try:
+            while self.conn.poll():
+                msg = self.conn.recv()
+                out.append(msg)
+                if msg["tipo"] != "epoca":
+                    self.finished = True
+        except EOFError:
+            if not self.finished:
+                self.finished = True
+                out.append({"tipo": "erro",
+                            "mensagem": f"Processo de treinamento terminou (código {self.process.exitcode})."})
+        return out
@@ -0,0 +1,167 @@
+"""
+Janela de acompanhamento do treinamento (processo separado, train_process.py).
+
+Mostra época, tempo por época e ETA, desenha no canvas as curvas de perda
+de treino e de mAP por época, e oferece Pausar / Retomar / Cancelar. As
+mensagens do processo são lidas com after() a cada POLL_MS, então a
+interface continua responsiva durante as 150 épocas.
+"""
+import tkinter as tk
+from tkinter import messagebox
+
+from train_process import TrainingJob
+
+POLL_MS = 250
+CHART_W, CHART_H = 560, 260
+MAP_KEY = "metrics/mAP50-95(B)"
+MAP50_KEY = "metrics/mAP50(B)"
+
+
+def _format_seconds(seconds):
+    seconds = int(seconds)
+    h, rest = divmod(seconds, 3600)
+    m, s = divmod(rest, 60)
+    return f"{h}h{m:02d}m{s:02d}s" if h else f"{m}m{s:02d}s"
+
+
+class TrainingMonitor(tk.Toplevel):
+    """
+    Inicia o TrainingJob e acompanha suas mensagens.
+    on_finish(mensagem) é chamado com a mensagem final "fim" (treino concluído),
+    acrescida de "epocas_executadas" e "tempo_treino" (soma dos tempos das épocas).
+    job_options vai para o TrainingJob (base_model, extra).
+    """
+    def __init__(self, master, data_yaml, epochs, imgsz, workers, on_finish=None, **job_options):
+        super().__init__(master)
+        self.title("Treinamento em Andamento - Vega Robotics")
+        self.configure(bg="#2e2e2e")
+        self.params = dict(data_yaml=data_yaml, epochs=epochs, imgsz=imgsz, workers=workers, **job_options)
+        self.on_finish = on_finish
+        self.history = []           # Mensagens "epoca" recebidas
+        self.checkpoint = None      # pause.pt da última pausa
+        self.job = None
+
+        self.status_label = tk.Label(self, text="Iniciando processo de treinamento...",
+                                     bg="#2e2e2e", fg="white", font=("Arial", 12, "bold"))
+        self.status_label.pack(pady=5)
+        self.detail_label = tk.Label(self, text="", bg="#2e2e2e", fg="white")
+        self.detail_label.pack()
+        self.canvas = tk.Canvas(self, width=CHART_W, height=CHART_H, bg="#1e1e1e", highlightthickness=0)
+        self.canvas.pack(padx=10, pady=10)
+
+        buttons = tk.Frame(self, bg="#2e2e2e")
+        buttons.pack(pady=5)
+        self.btn_pause = tk.Button(buttons, text="Pausar", command=self.pause,
+                                   bg="#3e3e3e", fg="white", activebackground="#5a5a5a")
+        self.btn_pause.pack(side=tk.LEFT, padx=5)
+        self.btn_cancel = tk.Button(buttons, text="Cancelar", command=self.cancel,
+                                    bg="#3e3e3e", fg="white", activebackground="#5a5a5a")
+        self.btn_cancel.pack(side=tk.LEFT, padx=5)
+
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.bind("<Destroy>", self.on_destroy)
+        self.start_job()
+
+    # ---------- Processo ----------
+    def start_job(self, resume_from=None):
+        self.job = TrainingJob(resume_from=resume_from, **self.params)
+        self.job.start()
+        self.btn_pause.config(text="Pausar", command=self.pause, state=tk.NORMAL)
+        self.btn_cancel.config(state=tk.NORMAL)
+        self.after(POLL_MS, self.poll)
+
+    def poll(self):
+        if not self.winfo_exists() or self.job is None:
+            return
+        for msg in self.job.messages():
+            self.handle(msg)
+        if not self.job.finished:
+            self.after(POLL_MS, self.poll)
+
+    def handle(self, msg):
+        tipo = msg["tipo"]
+        if tipo == "epoca":
+            self.history.append(msg)
+            self.status_label.config(text=f"Época {msg['epoca']}/{msg['epocas']}")
+            m = msg["metricas"]
+            self.detail_label.config(
+                text=f"perda: {sum(msg['perdas'].values()):.4f}   "
+                     f"mAP50: {m.get(MAP50_KEY, 0):.3f}   mAP50-95: {m.get(MAP_KEY, 0):.3f}   "
+                     f"época: {msg['tempo_epoca']:.1f}s   ETA: {_format_seconds(msg['eta'])}")
+            self.draw_chart()
+        elif tipo == "pausado":
+            self.checkpoint = msg["checkpoint"]
+            self.status_label.config(text="Treinamento pausado (checkpoint salvo).")
+            self.btn_pause.config(text="Retomar", command=self.resume, state=tk.NORMAL)
+            self.btn_cancel.config(state=tk.DISABLED)
+        elif tipo == "cancelado":
+            self.status_label.config(text="Treinamento cancelado.")
+            self.btn_pause.config(state=tk.DISABLED)
+            self.btn_cancel.config(state=tk.DISABLED)
+        elif tipo == "erro":
+            self.status_label.config(text="Erro no treinamento.")
+            self.btn_pause.config(state=tk.DISABLED)
+            self.btn_cancel.config(state=tk.DISABLED)
+            messagebox.showerror("Erro no Treinamento", msg["mensagem"], parent=self)
+        elif tipo == "fim":
+            self.status_label.config(text="Treinamento finalizado!")
+            self.btn_pause.config(state=tk.DISABLED)
+            self.btn_cancel.config(state=tk.DISABLED)
+            msg["epocas_executadas"] = len(self.history)
+            msg["tempo_treino"] = sum(m["tempo_epoca"] for m in self.history)
+            if self.on_finish:
+                self.on_finish(msg)
+
+    def pause(self):
+        self.job.pause()
+        self.btn_pause.config(state=tk.DISABLED)
+        self.status_label.config(text="Pausando ao fim da época atual...")
+
+    def resume(self):
+        self.start_job(resume_from=self.checkpoint)
+        self.status_label.config(text="Retomando treinamento...")
+
+    def cancel(self):
+        self.job.cancel()
+        self.btn_pause.config(state=tk.DISABLED)
+        self.btn_cancel.config(state=tk.DISABLED)
+        self.status_label.config(text="Cancelando ao fim da época atual...")
+
+    def on_close(self):
+        if self.job and not self.job.finished:
+            if not messagebox.askyesno("Treinamento", "Cancelar o treinamento em andamento?", parent=self):
+                return
+            self.job.cancel()
+        self.destroy()
+
+    def on_destroy(self, event):
+        # Janela destruída (ou o aplicativo fechando): não deixa o processo de treino órfão.
+        # Uma pausa pedida termina sozinha no fim da época, gravando o checkpoint.
+        if event.widget is self and self.job and not self.job.finished and not self.job.pause_event.is_set():
+            self.job.terminate()
+
+    # ---------- Gráfico ----------
+    def draw_chart(self):
+        """Perda de treino (vermelho) e mAP50-95 (verde) por época, cada uma na sua escala."""
+        self.canvas.delete("all")
+        pad = 30
+        w, h = CHART_W - 2 * pad, CHART_H - 2 * pad
+        self.canvas.create_rectangle(pad, pad, pad + w, pad + h, outline="#5a5a5a")
+        if not self.history:
+            return
+        total = self.history[-1]["epocas"]
+        series = (
+            ("perda", "#ff5555", [sum(m["perdas"].values()) for m in self.history]),
+            ("mAP50-95", "#55ff55", [m["metricas"].get(MAP_KEY, 0.0) for m in self.history]),
+        )
+        for row, (name, color, values) in enumerate(series):
+            top = max(values) or 1.0
+            points = []
+            for m, v in zip(self.history, values):
+                points.extend((pad + w * m["epoca"] / max(total, 1), pad + h - h * v / top))
+            if len(points) >= 4:
+                self.canvas.create_line(*points, fill=color, width=2)
+            self.canvas.create_text(pad + 5, pad + 5 + 14 * row, anchor=tk.NW, fill=color,
+                                    text=f"{name} (máx. {top:.3f})")
+        self.canvas.create_text(pad + w, pad + h + 12, anchor=tk.E, fill="white",
+                                text=f"época {self.history[-1]['epoca']}/{total}")
@@ -0,0 +1,81 @@
+"""
+Cache em disco dos resultados de validação (YOLO.val).
+
+A validação completa só é refeita quando algo que influencia o resultado
+mudou. A chave é um SHA-1 de:
+- bytes do arquivo de pesos (best.pt);
+- conteúdo do data.yaml;
+- nomes e conteúdo dos rótulos .txt do split de validação.
+
+O resultado guardado (cache/validation/<chave>.json) tem a matriz de
+confusão, P/R/mAP por classe, as métricas gerais e os tempos por imagem.
+"""
+import os
+import json
+import hashlib
+import yaml
+
+VAL_CACHE_DIR = os.path.join(os.getcwd(), "cache", "validation")
+CHUNK = 1 << 20
+
+
+def _hash_file(h, path):
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK), b""):
+            h.update(block)
+
+
+def validation_key(weights_path, data_yaml_path):
+    """SHA-1 dos pesos, do data.yaml e dos rótulos de validação."""
+    h = hashlib.sha1()
+    _hash_file(h, weights_path)
+    with open(data_yaml_path, "rb") as f:
+        content = f.read()
+    h.update(content)
+    val_dir = (yaml.safe_load(content) or {}).get("val")
+    if val_dir and os.path.isdir(val_dir):
+        labels = sorted(e.name for e in os.scandir(val_dir) if e.name.endswith(".txt"))
+        for name in labels:
+            h.update(name.encode("utf-8"))
+            _hash_file(h, os.path.join(val_dir, name))
+    return h.hexdigest()
+
+
+def run_validation(weights_path, data_yaml_path):
+    """Roda o YOLO.val e reduz o resultado a um dicionário serializável em JSON."""
+    from ultralytics import YOLO
+    metrics = YOLO(weights_path).val(data=data_yaml_path, verbose=False)
+    names = metrics.names
+    per_class = {}
+    for i, cls in enumerate(metrics.ap_class_index):
+        p, r, map50, map5095 = metrics.box.class_result(i)
+        per_class[names[int(cls)]] = {"precisao": float(p), "recall": float(r),
+                                      "mAP50": float(map50), "mAP50-95": float(map5095)}
+    return {
+        "matriz_confusao": metrics.confusion_matrix.matrix.tolist(),
+        "classes": [names[i] for i in sorted(names)],
+        "por_classe": per_class,
+        "geral": {k: float(v) for k, v in metrics.results_dict.items()},
+        "tempos_ms": {k: float(v) for k, v in metrics.speed.items()},
+    }
+
+
+def cached_validation(weights_path, data_yaml_path, cache_dir=VAL_CACHE_DIR):
+    """Retorna (resultado, veio_do_cache). Só valida de novo se a chave mudou."""
+    key = validation_key(weights_path, data_yaml_path)
+    path = os.path.join(cache_dir, key + ".json")
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f), True
+        except (OSError, json.JSONDecodeError):
+            pass
+    result = run_validation(weights_path, data_yaml_path)
+    result["chave"] = key
+    result["pesos"] = os.path.abspath(weights_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+    return result, False